@@ -0,0 +1,206 @@
+"""
+Benchmark reproducible de DocumentPipeline sobre pdf_examples más PDFs
+sintéticos (largos, escaneados y mixtos), con un LLM simulado determinista.
+
+Uso (desde Binder/):
+    python benchmarks/bench_pipeline.py --save benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json
+
+Reporta docs/s, p50/p95 por etapa y pico de RSS; con --baseline compara y
+termina con código 1 si alguna métrica empeora más que --tolerance.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+BINDER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BINDER_DIR))
+
+from document_processor.config import Config  # noqa: E402
+from document_processor.llm.fake import FakeLLMClient  # noqa: E402
+from document_processor.pipeline import DocumentPipeline  # noqa: E402
+from document_processor.utils.pdf import load_pymupdf  # noqa: E402
+
+# Como en el pipeline: `pymupdf` si está disponible y los avisos de MuPDF al log
+fitz = load_pymupdf()
+
+LOREM = (
+    "CONTRATO DE PRESTACIÓN DE SERVICIOS que celebran por una parte la empresa "
+    "y por la otra el prestador, al tenor de las siguientes declaraciones y "
+    "cláusulas. PRIMERA. Objeto del contrato. SEGUNDA. Contraprestación. "
+)
+
+
+def _text_page(doc: "fitz.Document", n: int) -> None:
+    page = doc.new_page()
+    rect = fitz.Rect(72, 72, page.rect.width - 72, page.rect.height - 72)
+    page.insert_textbox(rect, f"Página {n}\n" + LOREM * 12, fontsize=10)
+
+
+def _scanned_page(doc: "fitz.Document", n: int, dpi: int = 150) -> None:
+    src = fitz.open()
+    _text_page(src, n)
+    pix = src[0].get_pixmap(dpi=dpi)
+    page = doc.new_page()
+    page.insert_image(page.rect, stream=pix.tobytes("png"))
+    src.close()
+
+
+def generate_pdfs(target: Path, large_pages: int, scanned: int, mixed: int) -> None:
+    """PDFs sintéticos deterministas para cubrir los tres caminos de extracción."""
+    large = fitz.open()
+    for n in range(1, large_pages + 1):
+        _text_page(large, n)
+    large.save(str(target / "synthetic_large.pdf"))
+
+    for k in range(scanned):
+        doc = fitz.open()
+        for n in range(1, 4):
+            _scanned_page(doc, n)
+        doc.save(str(target / f"synthetic_scanned_{k}.pdf"))
+
+    for k in range(mixed):
+        doc = fitz.open()
+        for n in range(1, 5):
+            (_text_page if n % 2 else _scanned_page)(doc, n)
+        doc.save(str(target / f"synthetic_mixed_{k}.pdf"))
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    scale = 1 if platform.system() == "Darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) * scale / 1048576
+
+
+def run_once(input_dir: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    config = Config(base_dir=BINDER_DIR)
+    config.input_dir = input_dir
+    config.max_pages = args.max_pages
+    config.workers = args.workers
+    config.print_stdout = False
+    config.output_file = None
+    config.checkpoint_file = None
+    config.metrics_file = None
+    config.cache_enabled = False
+
+    pipeline = DocumentPipeline(config, client=FakeLLMClient(latency=args.llm_latency))
+    pipeline.run()
+    return pipeline.metrics.to_dict()
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stages: Dict[str, Dict[str, float]] = {}
+    names = sorted({name for r in runs for name in r["stages_seconds"]})
+    for name in names:
+        seen = [r["stages_seconds"][name] for r in runs if name in r["stages_seconds"]]
+        stages[name] = {
+            q: statistics.median(s[q] for s in seen) for q in ("p50", "p95")
+        }
+    return {
+        "documents": sum(runs[0]["documents"].values()),
+        "docs_per_second": statistics.median(r["docs_per_second"] for r in runs),
+        "stages_seconds": stages,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    tolerance: float,
+    min_delta: float,
+) -> bool:
+    """
+    Imprime las diferencias y devuelve True si no hay regresiones. Las
+    etapas cuya diferencia absoluta no supera `min_delta` segundos se
+    consideran ruido.
+    """
+    ok = True
+    if current["documents"] != baseline["documents"]:
+        print(
+            f"Aviso: el baseline tiene {baseline['documents']} documentos "
+            f"y esta corrida {current['documents']}."
+        )
+
+    def check(
+        label: str, new: float, old: float, higher_is_better: bool, floor: float = 0.0
+    ) -> None:
+        nonlocal ok
+        if not old:
+            return
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        noisy = abs(new - old) <= floor
+        flag = "REGRESIÓN" if worse > tolerance and not noisy else ""
+        ok = ok and not flag
+        print(f"  {label:<28} {old:>10.4f} -> {new:>10.4f} ({change:+.1%}) {flag}")
+
+    print("Comparación con baseline:")
+    check("docs_per_second", current["docs_per_second"], baseline["docs_per_second"], True)
+    check("peak_rss_mb", current["peak_rss_mb"], baseline["peak_rss_mb"], False)
+    for stage, values in current["stages_seconds"].items():
+        old = baseline["stages_seconds"].get(stage)
+        if old is None:
+            continue
+        for q in ("p50", "p95"):
+            check(f"{stage}.{q}", values[q], old[q], False, min_delta)
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--max-pages", type=int, default=100)
+    parser.add_argument("--large-pages", type=int, default=60)
+    parser.add_argument("--scanned", type=int, default=2)
+    parser.add_argument("--mixed", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--save", type=Path, help="guarda el resultado como baseline")
+    parser.add_argument("--baseline", type=Path, help="compara contra este baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--min-delta", type=float, default=0.005)
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="binder-bench-"))
+    try:
+        for pdf in sorted((BINDER_DIR / "pdf_examples").glob("*.pdf")):
+            shutil.copy(pdf, work / pdf.name)
+        generate_pdfs(work, args.large_pages, args.scanned, args.mixed)
+
+        runs = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            runs.append(run_once(work, args))
+            print(
+                f"corrida {len(runs)}: {time.perf_counter() - start:.2f}s, "
+                f"{runs[-1]['docs_per_second']:.2f} docs/s",
+                file=sys.stderr,
+            )
+        result = summarize(runs)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.save:
+        args.save.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        ok = compare(result, baseline, args.tolerance, args.min_delta)
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Benchmark del arranque del CLI: importación en frío del pipeline y una
+ejecución completa sobre pdf_examples con todo en caché, cada una en un
+intérprete nuevo, con un LLM simulado.
+
+Uso (desde Binder/):
+    python benchmarks/bench_startup.py --save benchmarks/startup_baseline.json
+    python benchmarks/bench_startup.py --baseline benchmarks/startup_baseline.json
+
+Reporta la mediana de segundos (descontado el arranque de Python) y qué
+dependencias pesadas quedaron cargadas; con --baseline compara y termina
+con código 1 si algún tiempo empeora más que --tolerance.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+BINDER_DIR = Path(__file__).resolve().parent.parent
+
+# Dependencias que solo deberían cargarse cuando una etapa las necesita
+HEAVY_MODULES = (
+    "openai", "pymupdf", "pdfplumber", "PIL", "pdf2image", "pytesseract", "PyPDF2", "dotenv",
+)
+
+IMPORT_SCRIPT = """
+import json, sys
+sys.path.insert(0, {binder!r})
+import document_processor.pipeline
+print(json.dumps([m for m in {heavy!r} if m in sys.modules]))
+"""
+
+RUN_SCRIPT = """
+import json, sys
+from pathlib import Path
+sys.path.insert(0, {binder!r})
+from document_processor.config import Config
+from document_processor.llm.fake import FakeLLMClient
+from document_processor.pipeline import DocumentPipeline
+
+config = Config(base_dir=Path({binder!r}))
+config.input_dir = Path({work!r})
+config.cache_dir = Path({work!r}) / ".cache"
+config.print_stdout = False
+config.output_file = None
+config.checkpoint_file = None
+config.metrics_file = None
+DocumentPipeline(config, client=FakeLLMClient()).run()
+print(json.dumps([m for m in {heavy!r} if m in sys.modules]))
+"""
+
+
+def timed(script: str) -> Dict[str, Any]:
+    """Segundos de un intérprete nuevo ejecutando `script` y su salida JSON."""
+    # Sin clave: con un LLM simulado el pipeline no debe pedirla
+    env = {k: v for k, v in os.environ.items() if k != "OPENAI_API_KEY"}
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=BINDER_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "loaded": json.loads(proc.stdout.strip().splitlines()[-1])}
+
+
+def measure(work: Path, repeat: int) -> Dict[str, Any]:
+    fmt = {"binder": str(BINDER_DIR), "work": str(work), "heavy": HEAVY_MODULES}
+    # Primera corrida: llena la caché de texto y etiquetas
+    timed(RUN_SCRIPT.format(**fmt))
+
+    python, imports, runs = [], [], []
+    for _ in range(repeat):
+        python.append(timed("print('[]')")["seconds"])
+        imports.append(timed(IMPORT_SCRIPT.format(**fmt)))
+        runs.append(timed(RUN_SCRIPT.format(**fmt)))
+    base = statistics.median(python)
+    return {
+        "documents": len(list(work.glob("*.pdf"))),
+        "python_seconds": round(base, 4),
+        "import_seconds": round(statistics.median(r["seconds"] for r in imports) - base, 4),
+        "cached_run_seconds": round(statistics.median(r["seconds"] for r in runs) - base, 4),
+        "loaded_on_import": imports[-1]["loaded"],
+        "loaded_on_cached_run": runs[-1]["loaded"],
+    }
+
+
+def compare(
+    current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, min_delta: float
+) -> bool:
+    """Imprime las diferencias y devuelve True si no hay regresiones."""
+    ok = True
+    print("Comparación con baseline:")
+    for label in ("import_seconds", "cached_run_seconds"):
+        new, old = current[label], baseline.get(label)
+        if not old:
+            continue
+        change = (new - old) / old
+        noisy = abs(new - old) <= min_delta
+        flag = "REGRESIÓN" if change > tolerance and not noisy else ""
+        ok = ok and not flag
+        print(f"  {label:<28} {old:>10.4f} -> {new:>10.4f} ({change:+.1%}) {flag}")
+    added = sorted(set(current["loaded_on_import"]) - set(baseline.get("loaded_on_import", [])))
+    if added:
+        print(f"  nuevas dependencias al importar: {', '.join(added)} REGRESIÓN")
+        ok = False
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--save", type=Path, help="guarda el resultado como baseline")
+    parser.add_argument("--baseline", type=Path, help="compara contra este baseline")
+    parser.add_argument("--tolerance", type=float, default=0.20)
+    parser.add_argument("--min-delta", type=float, default=0.02)
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="binder-startup-"))
+    try:
+        for pdf in sorted((BINDER_DIR / "pdf_examples").glob("*.pdf")):
+            shutil.copy(pdf, work / pdf.name)
+        result = measure(work, args.repeat)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.save:
+        args.save.write_text(json.dumps(result, indent=2), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        ok = compare(result, baseline, args.tolerance, args.min_delta)
+        return 0 if ok else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,248 @@
 from pathlib import Path
-from dataclasses import dataclass
-from typing import Union
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Union
 
-from .extractor import TextExtractor
-from .utils.pdf import read_pdf_bytes, count_pages
+from .cache import ResultCache, sha256_file, text_key
+from .document import PDFDocument
+from .extractor import Extraction, TextExtractor
+from .metrics import stage_timer
+from .utils.pdf import preflight_page_count
 
 
 @dataclass
 class AnalysisResult:
     file: str
     text: str = ""
+    pages: List[str] = field(default_factory=list)
     error: str = ""
+    # Código fijado por quien detecta el error (p. ej. TIMEOUT); si falta,
+    # el pipeline lo deduce del mensaje
+    error_code: str = ""
+    file_size_bytes: int = 0
+    page_count: int = 0
+    has_images: bool = False
+    sha256: str = ""
+    text_cached: bool = False
+    # Documento largo del que solo se extrajeron las primeras `max_pages` páginas
+    truncated: bool = False
+    ocr_confidence: Dict[int, float] = field(default_factory=dict)
+    pages_by_engine: Dict[str, int] = field(default_factory=dict)
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    page_plan: List[Dict[str, Any]] = field(default_factory=list)
 
 
 class PDFAnalyzer:
-    def __init__(self, max_pages: int = 5):
+    """
+    Análisis de un PDF: controles previos, metadatos y extracción de texto
+    (con caché). Los documentos con más de `max_pages` páginas se rechazan,
+    o con `long_documents="truncate"` se extraen solo sus primeras páginas.
+    Con caché, un PDF ya analizado se resuelve por su hash sin abrirlo.
+    """
+
+    LONG_DOCUMENT_POLICIES = ("reject", "truncate")
+
+    def __init__(
+        self,
+        max_pages: int = 5,
+        long_documents: str = "reject",
+        max_file_bytes: int = 0,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = 0,
+        ocr_workers: int = 4,
+        ocr_page_timeout: float = 60,
+        ocr_min_dpi: int = 150,
+        ocr_max_dpi: int = 400,
+        ocr_min_confidence: float = 60.0,
+        ocr_blank_pages: bool = False,
+    ):
+        if long_documents not in self.LONG_DOCUMENT_POLICIES:
+            raise ValueError(f"Política de documentos largos desconocida: {long_documents}")
         self.max_pages = max_pages
-        self.extractor = TextExtractor()
+        self.truncate_long = long_documents == "truncate"
+        self.max_file_bytes = max_file_bytes
+        self.extractor = TextExtractor(
+            ocr_workers=ocr_workers,
+            ocr_page_timeout=ocr_page_timeout,
+            ocr_min_dpi=ocr_min_dpi,
+            ocr_max_dpi=ocr_max_dpi,
+            ocr_min_confidence=ocr_min_confidence,
+            ocr_blank_pages=ocr_blank_pages,
+        )
+        self.cache = ResultCache(cache_dir, cache_max_bytes) if cache_dir else None
+
+    def close(self) -> None:
+        """Libera los hilos de OCR; el siguiente análisis los vuelve a crear."""
+        self.extractor.close()
+
+    def analyze(self, source: Union[Path, PDFDocument]) -> AnalysisResult:
+        if isinstance(source, PDFDocument):
+            return self._analyze_document(source)
+        timings: Dict[str, float] = {}
+        try:
+            # Tamaño, caché y páginas, en ese orden: un PDF en caché ni se
+            # abre ni se cuenta, y uno enorme se rechaza antes de hashearlo
+            with stage_timer(timings, "preflight"):
+                size = source.stat().st_size
+                rejected = self._check_size(source, size)
+            sha256 = None
+            if rejected is None and self.cache is not None:
+                with stage_timer(timings, "cache"):
+                    sha256 = sha256_file(source)
+                    cached = self._cached_analysis(source, sha256, size)
+                if cached is not None:
+                    cached.timings_ms = timings
+                    return cached
+            if rejected is None:
+                with stage_timer(timings, "preflight"):
+                    rejected = self._check_pages(source, size)
+            if rejected is not None:
+                rejected.timings_ms = timings
+                return rejected
+            with stage_timer(timings, "open"):
+                doc = PDFDocument(source, sha256=sha256)
+            with doc:
+                result = self._analyze_document(doc)
+            result.timings_ms = {**timings, **result.timings_ms}
+            return result
+        except Exception as e:
+            return AnalysisResult(file=source.name, error=str(e), timings_ms=timings)
+
+    def preflight(self, path: Path) -> Optional[AnalysisResult]:
+        """
+        Control barato de tamaño y páginas antes de leer o parsear el PDF.
+        Devuelve el resultado de rechazo, o None si el archivo puede pasar.
+        """
+        size = path.stat().st_size
+        return self._check_size(path, size) or self._check_pages(path, size)
 
-    def analyze(self, pdf_path: Path) -> AnalysisResult:
-        name = pdf_path.name
+    def _check_size(self, path: Path, size: int) -> Optional[AnalysisResult]:
+        if self.max_file_bytes and size > self.max_file_bytes:
+            return AnalysisResult(
+                file=path.name,
+                file_size_bytes=size,
+                error=(
+                    f"{path.name} tiene un tamaño de {size / 1048576:.1f} MB "
+                    f"(> {self.max_file_bytes / 1048576:.1f} MB)"
+                ),
+            )
+        return None
+
+    def _check_pages(self, path: Path, size: int) -> Optional[AnalysisResult]:
+        if self.truncate_long:
+            return None
+        pages = preflight_page_count(path)
+        if pages > self.max_pages:
+            return AnalysisResult(
+                file=path.name,
+                file_size_bytes=size,
+                page_count=pages,
+                error=f"{path.name} tiene {pages} páginas (> {self.max_pages})",
+            )
+        return None
+
+    def text_version(self, truncated: bool = False) -> str:
+        """Versión de las claves de texto en caché para esta configuración."""
+        version = self.extractor.VERSION
+        if self.extractor.ocr_blank_pages:
+            version += "-ocrblank"  # el texto puede incluir páginas "en blanco"
+        if truncated:
+            version += f"-first{self.max_pages}"  # texto parcial: entrada aparte
+        return version
+
+    def _cached_analysis(
+        self, path: Path, sha256: str, size: int
+    ) -> Optional[AnalysisResult]:
+        """
+        Resultado completo desde la caché de texto, sin abrir el PDF (ni
+        importar PyMuPDF). None si no está o se guardó sin metadatos.
+        """
+        candidates = [False, True] if self.truncate_long else [False]
+        for truncated in candidates:
+            cached = self.cache.get(text_key(sha256, self.text_version(truncated)))
+            if cached is None or "page_count" not in cached:
+                continue
+            # Una entrada completa de un documento que ahora excede max_pages no vale
+            if truncated != (cached["page_count"] > self.max_pages):
+                continue
+            result = AnalysisResult(
+                file=path.name,
+                file_size_bytes=size,
+                page_count=cached["page_count"],
+                has_images=cached["has_images"],
+                sha256=sha256,
+                text_cached=True,
+                truncated=truncated,
+            )
+            self._apply(result, self._from_cache(cached))
+            return result
+        return None
+
+    @staticmethod
+    def _from_cache(cached: Dict[str, Any]) -> Extraction:
+        page_plan = cached.get("page_plan", [])
+        pages_by_engine = cached.get("pages_by_engine")
+        if pages_by_engine is None:
+            # Entradas anteriores: se reconstruye con el motor usado en el plan
+            pages_by_engine = {"pymupdf": 0, "pdfplumber": 0, "ocr": 0}
+            for page in page_plan:
+                if page["used"]:
+                    pages_by_engine[page["used"]] += 1
+        return Extraction(
+            text=cached["text"],
+            pages=cached.get("pages") or [cached["text"]],
+            ocr_confidence={page: conf for page, conf in cached["ocr_confidence"]},
+            pages_by_engine=pages_by_engine,
+            page_plan=page_plan,
+        )
+
+    @staticmethod
+    def _apply(result: AnalysisResult, extraction: Extraction) -> None:
+        result.text = extraction.text
+        result.pages = extraction.pages
+        result.ocr_confidence = extraction.ocr_confidence
+        result.pages_by_engine = extraction.pages_by_engine
+        result.page_plan = extraction.page_plan
+        result.timings_ms.update(extraction.timings_ms)
+
+    def _analyze_document(self, doc: PDFDocument) -> AnalysisResult:
+        result = AnalysisResult(file=doc.name, file_size_bytes=doc.size)
         try:
-            data = read_pdf_bytes(pdf_path)
-            pages = count_pages(data)
-            if pages > self.max_pages:
-                raise ValueError(f"{name} tiene {pages} páginas (> {self.max_pages})")
-            text = self.extractor.extract(data)
-            return AnalysisResult(file=name, text=text)
+            with stage_timer(result.timings_ms, "metadata"):
+                result.page_count = doc.page_count
+                result.has_images = doc.has_images
+            if result.page_count > self.max_pages:
+                if not self.truncate_long:
+                    raise ValueError(
+                        f"{doc.name} tiene {result.page_count} páginas (> {self.max_pages})"
+                    )
+                result.truncated = True
+            self._apply(result, self._extract(doc, result))
         except Exception as e:
-            return AnalysisResult(file=name, error=str(e))
+            result.error = str(e)
+        return result
+
+    def _extract(self, doc: PDFDocument, result: AnalysisResult) -> Extraction:
+        max_pages = self.max_pages if result.truncated else None
+        if self.cache is None:
+            return self.extractor.extract_detailed(doc, max_pages=max_pages)
+        with stage_timer(result.timings_ms, "cache"):
+            result.sha256 = doc.sha256
+            key = text_key(doc.sha256, self.text_version(result.truncated))
+            cached = self.cache.get(key)
+        if cached is not None:
+            result.text_cached = True
+            return self._from_cache(cached)
+        extraction = self.extractor.extract_detailed(doc, max_pages=max_pages)
+        self.cache.put(
+            key,
+            {
+                "text": extraction.text,
+                "pages": extraction.pages,
+                "ocr_confidence": sorted(extraction.ocr_confidence.items()),
+                "page_plan": extraction.page_plan,
+                "pages_by_engine": extraction.pages_by_engine,
+                "page_count": result.page_count,
+                "has_images": result.has_images,
+            },
+        )
+        return extraction
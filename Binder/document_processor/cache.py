@@ -0,0 +1,183 @@
+# document_processor/cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+CACHE_DB_NAME = "cache.sqlite3"
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash de un archivo leído por bloques, sin cargarlo entero en memoria."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def text_key(content_hash: str, extractor_version: str) -> str:
+    return f"text:{extractor_version}:{content_hash}"
+
+
+def labels_key(
+    content_hash: str, model: str, instructions: str, variant: str = ""
+) -> str:
+    """`variant` distingue entradas construidas distinto (p. ej. presupuesto)."""
+    instructions_hash = sha256_hex((instructions + variant).encode("utf-8"))[:16]
+    return f"labels:{model}:{instructions_hash}:{content_hash}"
+
+
+def signature_key(content_hash: str, params: str) -> str:
+    """Firma MinHash de un texto; `params` cambia si cambia su construcción."""
+    return f"minhash:{params}:{content_hash}"
+
+
+def fastpath_key(labels_prefix: str, params: str) -> str:
+    """Clasificador local entrenado con las etiquetas de `labels_prefix`."""
+    return f"fastpath:{params}:{labels_prefix}"
+
+
+class ResultCache:
+    """
+    Caché persistente direccionada por contenido (SQLite en disco).
+    Guarda valores JSON y, al superar `max_bytes`, expulsa las entradas
+    menos usadas recientemente. El tamaño total se lleva en la tabla `meta`
+    y se actualiza en la misma transacción que cada escritura, así `put` no
+    recorre la tabla. Cada proceso abre su propia conexión.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.path = self.directory / CACHE_DB_NAME
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # Una conexión heredada por fork no debe reutilizarse
+        if self._conn is None or self._pid != os.getpid():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.path), timeout=30, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access"
+                " ON entries (last_access)"
+            )
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS meta ("
+                    " name TEXT PRIMARY KEY,"
+                    " value INTEGER NOT NULL)"
+                )
+                # Cachés anteriores al contador: se suma una sola vez
+                conn.execute(
+                    "INSERT OR IGNORE INTO meta (name, value)"
+                    " SELECT 'total_size', COALESCE(SUM(size), 0) FROM entries"
+                )
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            with conn:
+                conn.execute(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # Reserva la escritura ya: otro proceso no puede cambiar el
+                # tamaño previo de la clave entre la lectura y el reemplazo
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute(
+                    "SELECT size FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, size, last_access)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, payload, size, time.time()),
+                )
+                total = self._add_size(conn, size - (row[0] if row else 0))
+                if total > self.max_bytes:
+                    self._evict(conn, total)
+
+    def items(self, prefix: str) -> Iterator[Tuple[str, Any]]:
+        """Entradas cuya clave empieza por `prefix`, sin tocar su `last_access`."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT key, value FROM entries WHERE key >= ? AND key < ?",
+                (prefix, prefix + "\uffff"),
+            ).fetchall()
+        for key, value in rows:
+            yield key, json.loads(value)
+
+    def count(self, prefix: str) -> int:
+        """Número de entradas con ese prefijo (recorre el índice, no los valores)."""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM entries WHERE key >= ? AND key < ?",
+                (prefix, prefix + "\uffff"),
+            ).fetchone()[0]
+
+    @staticmethod
+    def _add_size(conn: sqlite3.Connection, delta: int) -> int:
+        """Suma `delta` al tamaño total y devuelve el nuevo total."""
+        conn.execute(
+            "UPDATE meta SET value = value + ? WHERE name = 'total_size'", (delta,)
+        )
+        return conn.execute(
+            "SELECT value FROM meta WHERE name = 'total_size'"
+        ).fetchone()[0]
+
+    def _evict(self, conn: sqlite3.Connection, total: int) -> None:
+        rows = conn.execute("SELECT key, size FROM entries ORDER BY last_access")
+        stale = []
+        freed = 0
+        for key, size in rows:
+            if total - freed <= self.max_bytes:
+                break
+            stale.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+        self._add_size(conn, -freed)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
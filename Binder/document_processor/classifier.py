@@ -1,12 +1,46 @@
 # document_processor/classifier.py
 
+import asyncio
 import logging
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
-from .llm.client import OpenAIClient, ServiceUnavailableError
-from .llm.engine import LegalDocumentEngine
+from .cache import ResultCache, fastpath_key, labels_key, signature_key, text_key
+from .dedup import MinHashIndex, cached_signatures
+from .extractor import TextExtractor
+from .fastpath import RETRAIN_GROWTH, LocalClassifier, cached_samples
+from .llm.client import (
+    BudgetExceededError,
+    CircuitOpenError,
+    LLMAuthError,
+    LLMClient,
+    LLMRequestError,
+    OpenAIClient,
+    ServiceUnavailableError,
+)
+from .llm.governor import TokenGovernor, estimate_tokens
+from .llm.retry import CircuitBreaker
+from .llm.async_client import AsyncLLMClient, AsyncOpenAIClient
+from .llm.batch import (
+    MANIFEST_SUFFIX,
+    TERMINAL_STATES,
+    BatchBackend,
+    BatchOutput,
+    discard_job,
+    parse_output,
+    read_manifest,
+    wait_for,
+    write_manifest,
+    write_requests,
+)
+from .llm.engine import LegalDocumentEngine, add_usage
+from .llm.json_repair import parse_json_lenient
 from .analyzer import AnalysisResult
+from .normalize import TextNormalizer
+from .prompt import Prompt, PromptBuilder
 
 
 @dataclass
@@ -14,55 +48,796 @@ class ClassificationResult:
     file: str
     labels: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
+    error_code: str = ""
     tokens_usage: Optional[Dict[str, int]] = None
+    from_cache: bool = False
+    llm_latency_ms: float = 0.0
+    llm_retries: int = 0
+    # Tokens enviados y páginas recortadas u omitidas por el presupuesto
+    prompt: Optional[Dict[str, Any]] = None
+    # Caracteres y tokens antes/después de quitar membretes y ruido
+    normalization: Optional[Dict[str, Any]] = None
+    # Documentos que compartieron la petición al LLM (1 = individual)
+    batch_size: int = 1
+    # Origen de las etiquetas: "llm", "cache", "duplicate" o "local" ("" si hubo error)
+    classified_by: str = "llm"
+    confidence: Optional[float] = None
+    # Archivo ya clasificado del que se reutilizaron las etiquetas
+    duplicate_of: Optional[str] = None
+
+
+@dataclass
+class _BatchPlan:
+    # Un resultado por análisis (None mientras esté pendiente)
+    results: List[Optional[ClassificationResult]]
+    prepared: Dict[int, Tuple[Prompt, Optional[Dict[str, Any]]]] = field(
+        default_factory=dict
+    )
+    groups: List[List[int]] = field(default_factory=list)
+    singles: List[int] = field(default_factory=list)
+    # Parte del uso de un lote fallido que se suma al reintento individual
+    spent: Dict[int, Dict[str, int]] = field(default_factory=dict)
+
+    def settle(self, i: int, result: ClassificationResult) -> None:
+        spent = self.spent.pop(i, None)
+        if spent and result.tokens_usage is not None:
+            add_usage(result.tokens_usage, spent)
+        self.results[i] = result
 
 
 class DocumentClassifier:
     """
     Encapsula la llamada al LLM para clasificar documentos.
+    Con `async_llm=True` (o un `async_client`) expone también `aclassify`
+    y `classify_many`, que mantienen muchas peticiones en vuelo.
+    Con `batch_size > 1`, `classify_batch`/`aclassify_batch` agrupan
+    documentos cortos en una sola petición.
     """
 
-    def __init__(self, instructions: str, api_key: str, model: str):
+    UNAVAILABLE_MSG = "Servicio OpenAI no disponible. Intenta de nuevo más tarde."
+    AUTH_MSG = "Credenciales de OpenAI rechazadas. Revisa OPENAI_API_KEY."
+    BUDGET_MSG = "Presupuesto de tokens de la ejecución agotado; se reintentará."
+
+    def __init__(
+        self,
+        instructions: str,
+        api_key: Optional[str],
+        model: str,
+        client: Optional[LLMClient] = None,
+        async_client: Optional[AsyncLLMClient] = None,
+        async_llm: bool = False,
+        max_concurrency: int = 16,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 200_000,
+        cache: Optional[ResultCache] = None,
+        json_mode: str = "json_object",
+        prompt_max_tokens: int = 0,
+        normalize_text: bool = True,
+        max_retries: int = 3,
+        retry_delay: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+        governor: Optional[TokenGovernor] = None,
+        batch_size: int = 1,
+        batch_max_tokens: int = 6000,
+        batch_doc_max_tokens: int = 1500,
+        fastpath: bool = False,
+        fastpath_min_confidence: float = 0.8,
+        fastpath_min_examples: int = 20,
+        dedup: bool = False,
+        dedup_threshold: float = 0.85,
+        text_version: str = TextExtractor.VERSION,
+    ):
         self.logger = logging.getLogger(self.__class__.__name__)
-        self.client = OpenAIClient(api_key=api_key, model=model)
-        self.engine = LegalDocumentEngine(instructions=instructions, client=self.client)
+        self.model = model
+        self.raw_instructions = instructions
+        self.batch_size = batch_size
+        self.batch_max_tokens = batch_max_tokens
+        self.batch_doc_max_tokens = batch_doc_max_tokens
+        self.cache = cache
+        self.prompt_builder = PromptBuilder(prompt_max_tokens, model=model)
+        self.normalizer = (
+            TextNormalizer(counter=self.prompt_builder.counter) if normalize_text else None
+        )
+        # Un único disyuntor para los clientes síncrono y asíncrono
+        self.breaker = breaker or CircuitBreaker()
+        # Contabilidad de tokens, topes y concurrencia adaptativa de la ejecución
+        self.governor = governor or TokenGovernor(max_concurrency=max_concurrency)
+        self.client = client or OpenAIClient(
+            api_key=api_key,
+            model=model,
+            max_retries=max_retries,
+            retry_delay=retry_delay,
+            breaker=self.breaker,
+            governor=self.governor,
+        )
+        if async_client is None and async_llm:
+            async_client = AsyncOpenAIClient(
+                api_key=api_key,
+                model=model,
+                max_concurrency=max_concurrency,
+                requests_per_minute=requests_per_minute,
+                tokens_per_minute=tokens_per_minute,
+                max_retries=max_retries,
+                retry_delay=retry_delay,
+                breaker=self.breaker,
+                governor=self.governor,
+            )
+        self.async_client = async_client
+        self.engine = LegalDocumentEngine(
+            instructions=instructions,
+            client=self.client,
+            async_client=async_client,
+            json_mode=json_mode,
+            governor=self.governor,
+        )
+        # Se entrena con el primer documento que no está en caché, no al arrancar
+        self.fastpath: Optional[LocalClassifier] = None
+        self._fastpath_pending = fastpath and cache is not None
+        self._fastpath_lock = threading.Lock()
+        # Versión de las claves de texto del analizador (`PDFAnalyzer.text_version`)
+        self.text_version = text_version
+        self._fastpath_options = {
+            "min_confidence": fastpath_min_confidence,
+            "min_examples": fastpath_min_examples,
+        }
+        self.dedup: Optional[MinHashIndex] = None
+        if dedup:
+            self.dedup = MinHashIndex(threshold=dedup_threshold)
+            self._load_dedup()
 
-    def classify(self, analysis: AnalysisResult) -> ClassificationResult:
+    @property
+    def is_async(self) -> bool:
+        return self.async_client is not None
+
+    @staticmethod
+    def _zero_usage() -> Dict[str, int]:
+        return {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+        }
+
+    def _error_result(self, file: str, msg: str, code: str = "") -> ClassificationResult:
+        return ClassificationResult(
+            file=file,
+            error=msg,
+            error_code=code,
+            tokens_usage=self._zero_usage(),
+            classified_by="",
+        )
+
+    @staticmethod
+    def _with_stats(
+        result: ClassificationResult, start: float, stats: Dict[str, int]
+    ) -> ClassificationResult:
+        result.llm_latency_ms = round((time.perf_counter() - start) * 1000, 1)
+        result.llm_retries = stats.get("retries", 0)
+        return result
+
+    def classify_timed(
+        self, analysis: AnalysisResult
+    ) -> Tuple[ClassificationResult, float]:
+        """Clasifica y devuelve además los segundos empleados."""
+        start = time.perf_counter()
+        result = self.classify(analysis)
+        return result, time.perf_counter() - start
+
+    @property
+    def _cache_variant(self) -> str:
+        return (
+            f"max_tokens={self.prompt_builder.max_tokens}"
+            f";normalize={self.normalizer is not None}"
+        )
+
+    def _cache_key(self, analysis: AnalysisResult) -> Optional[str]:
+        if self.cache is None or not analysis.sha256:
+            return None
+        variant = self._cache_variant
+        if analysis.truncated:
+            # Etiquetas de un texto parcial: no valen para el documento completo
+            variant += f";first_pages={len(analysis.pages)}"
+        return labels_key(analysis.sha256, self.model, self.raw_instructions, variant=variant)
+
+    def _fastpath_model(self) -> Optional[LocalClassifier]:
+        if self._fastpath_pending:
+            with self._fastpath_lock:
+                if self._fastpath_pending:
+                    self.fastpath = self._train_fastpath(
+                        LocalClassifier(**self._fastpath_options)
+                    )
+                    self._fastpath_pending = False
+        return self.fastpath
+
+    def _train_fastpath(self, model: LocalClassifier) -> Optional[LocalClassifier]:
+        """
+        Entrena con las etiquetas del LLM en caché para este modelo e
+        instrucciones. El modelo se guarda en la caché y solo se reentrena
+        cuando las etiquetas disponibles crecen más de `RETRAIN_GROWTH`.
+        """
+        start = time.perf_counter()
+        prefix = labels_key("", self.model, self.raw_instructions, self._cache_variant)
+        available = self.cache.count(prefix)
+        key = fastpath_key(prefix, f"{model.params};text={self.text_version}")
+        saved = self.cache.get(key)
+        if saved and available <= saved["examples"] * (1 + RETRAIN_GROWTH):
+            model.load(saved["model"])
+            if not model.trained:
+                return None
+            self.logger.info(
+                "Clasificador local cargado de la caché (%d tipos) en %.0f ms",
+                len(model.labels),
+                (time.perf_counter() - start) * 1000,
+            )
+            return model
+        samples = list(cached_samples(self.cache, prefix, text_key("", self.text_version)))
+        model.fit(samples)
+        self.cache.put(key, {"examples": available, "model": model.to_dict()})
+        if not model.trained:
+            self.logger.info(
+                "Clasificador local sin datos suficientes (%d ejemplos en caché)",
+                len(samples),
+            )
+            return None
+        self.logger.info(
+            "Clasificador local entrenado con %d ejemplos y %d tipos en %.0f ms",
+            len(samples),
+            len(model.labels),
+            (time.perf_counter() - start) * 1000,
+        )
+        return model
+
+    def _signature_key(self, analysis: AnalysisResult) -> Optional[str]:
+        if self.cache is None or not analysis.sha256:
+            return None
+        return signature_key(analysis.sha256, self.dedup.params)
+
+    def _load_dedup(self) -> None:
+        """Indexa las firmas guardadas de documentos con etiquetas en caché."""
+        if self.cache is None:
+            return
+        start = time.perf_counter()
+        for file, signature, labels in cached_signatures(
+            self.cache,
+            signature_key("", self.dedup.params),
+            labels_key("", self.model, self.raw_instructions, self._cache_variant),
+        ):
+            self.dedup.add(signature, file, labels)
+        if len(self.dedup):
+            self.logger.info(
+                "Índice de casi duplicados cargado con %d documentos en %.0f ms",
+                len(self.dedup),
+                (time.perf_counter() - start) * 1000,
+            )
+
+    def _duplicate(self, analysis: AnalysisResult) -> Optional[ClassificationResult]:
+        if self.dedup is None or not analysis.text:
+            return None
+        signature = self.dedup.signature(analysis.text)
+        match = self.dedup.query(signature) if signature else None
+        if match is None:
+            return None
+        return ClassificationResult(
+            file=analysis.file,
+            labels=match.labels,
+            tokens_usage=self._zero_usage(),
+            classified_by="duplicate",
+            confidence=match.similarity,
+            duplicate_of=match.file,
+        )
+
+    def _remember(self, analysis: AnalysisResult, labels: Dict[str, Any]) -> None:
+        """Añade al índice de casi duplicados un documento clasificado por el LLM."""
+        if self.dedup is None or not analysis.text:
+            return
+        signature = self.dedup.signature(analysis.text)
+        if signature is None:
+            return
+        self.dedup.add(signature, analysis.file, labels)
+        key = self._signature_key(analysis)
+        if key:
+            self.cache.put(key, {"file": analysis.file, "signature": list(signature)})
+
+    def _local(self, analysis: AnalysisResult) -> Optional[ClassificationResult]:
+        if not analysis.text:
+            return None
+        model = self._fastpath_model()
+        if model is None:
+            return None
+        prediction = model.predict(analysis.text)
+        if prediction is None:
+            return None
+        tipo, confidence = prediction
+        return ClassificationResult(
+            file=analysis.file,
+            labels={
+                "tipo_documento": tipo,
+                "justificacion": (
+                    "Clasificado localmente por similitud con documentos ya "
+                    f"etiquetados (confianza {confidence})."
+                ),
+            },
+            tokens_usage=self._zero_usage(),
+            classified_by="local",
+            confidence=confidence,
+        )
+
+    def build_prompt(
+        self, analysis: AnalysisResult
+    ) -> Tuple[Prompt, Optional[Dict[str, Any]]]:
+        """Normaliza (si está activo) y recorta al presupuesto de tokens."""
+        pages = analysis.pages or [analysis.text]
+        if self.normalizer is None:
+            return self.prompt_builder.build(pages), None
+        normalized = self.normalizer.normalize(pages)
+        return self.prompt_builder.build(normalized.pages), normalized.report()
+
+    def _cached(self, analysis: AnalysisResult) -> Optional[ClassificationResult]:
+        key = self._cache_key(analysis)
+        labels = self.cache.get(key) if key else None
+        if labels is None:
+            return None
+        return ClassificationResult(
+            file=analysis.file,
+            labels=labels,
+            tokens_usage=self._zero_usage(),
+            from_cache=True,
+            classified_by="cache",
+        )
+
+    def _store(self, analysis: AnalysisResult, labels: Dict[str, Any]) -> None:
+        key = self._cache_key(analysis)
+        if key:
+            self.cache.put(key, labels)
+        self._remember(analysis, labels)
+
+    def _failure(self, file: str, error: Exception) -> ClassificationResult:
+        if isinstance(error, BudgetExceededError):
+            self.logger.debug("%s (%s)", error, file)
+            return self._error_result(file, self.BUDGET_MSG)
+        if isinstance(error, CircuitOpenError):
+            # Una línea por archivo bastaría para inundar el log durante una caída
+            self.logger.debug("%s para %s: %s", self.UNAVAILABLE_MSG, file, error)
+            return self._error_result(file, self.UNAVAILABLE_MSG)
+        if isinstance(error, ServiceUnavailableError):
+            self.logger.error(self.UNAVAILABLE_MSG + " para %s", file)
+            return self._error_result(file, self.UNAVAILABLE_MSG)
+        if isinstance(error, LLMAuthError):
+            self.logger.error("%s (%s)", self.AUTH_MSG, error)
+            return self._error_result(file, self.AUTH_MSG)
+        if isinstance(error, LLMRequestError):
+            self.logger.error("Petición rechazada para %s: %s", file, error)
+            return self._error_result(file, str(error))
+        self.logger.error("Error clasificando %s: %s", file, error)
+        return self._error_result(file, str(error))
+
+    def _early(self, analysis: AnalysisResult) -> Optional[ClassificationResult]:
+        """
+        Resultado sin llamar al LLM: error de análisis, caché, casi duplicado
+        de un documento ya clasificado o clasificador local.
+        """
         if analysis.error:
-            return ClassificationResult(
-                file=analysis.file,
-                error=analysis.error,
-                tokens_usage={
-                    "prompt_tokens": 0,
-                    "completion_tokens": 0,
-                    "total_tokens": 0,
-                },
+            return self._error_result(analysis.file, analysis.error, analysis.error_code)
+        return (
+            self._cached(analysis)
+            or self._duplicate(analysis)
+            or self._local(analysis)
+        )
+
+    def _prepare(
+        self, analysis: AnalysisResult
+    ) -> Tuple[
+        Optional[ClassificationResult], Optional[Tuple[Prompt, Optional[Dict[str, Any]]]]
+    ]:
+        """
+        Resultado sin LLM o prompt listo para enviar. Un fallo aquí (caché,
+        índice de duplicados, clasificador local o normalización) queda como
+        error de ese documento, igual que un fallo del LLM.
+        """
+        try:
+            early = self._early(analysis)
+            if early is not None:
+                return early, None
+            return None, self.build_prompt(analysis)
+        except Exception as e:
+            return self._failure(analysis.file, e), None
+
+    def _finish(
+        self,
+        result: ClassificationResult,
+        prepared: Tuple[Prompt, Optional[Dict[str, Any]]],
+        start: float,
+        stats: Dict[str, int],
+    ) -> ClassificationResult:
+        prompt, normalization = prepared
+        result.prompt = prompt.report()
+        result.normalization = normalization
+        return self._with_stats(result, start, stats)
+
+    def classify(self, analysis: AnalysisResult) -> ClassificationResult:
+        early, prepared = self._prepare(analysis)
+        if early is not None:
+            return early
+        return self._classify_prepared(analysis, prepared)
+
+    def _classify_prepared(
+        self, analysis: AnalysisResult, prepared: Tuple[Prompt, Optional[Dict[str, Any]]]
+    ) -> ClassificationResult:
+        stats: Dict[str, int] = {}
+        start = time.perf_counter()
+        try:
+            labels, usage = self.engine.classify(prepared[0].text, stats=stats)
+            self._store(analysis, labels)
+            result = ClassificationResult(
+                file=analysis.file, labels=labels, tokens_usage=usage
             )
+        except Exception as e:
+            result = self._failure(analysis.file, e)
+        return self._finish(result, prepared, start, stats)
+
+    async def aclassify_timed(
+        self, analysis: AnalysisResult
+    ) -> Tuple[ClassificationResult, float]:
+        start = time.perf_counter()
+        result = await self.aclassify(analysis)
+        return result, time.perf_counter() - start
+
+    async def aclassify(self, analysis: AnalysisResult) -> ClassificationResult:
+        early, prepared = self._prepare(analysis)
+        if early is not None:
+            return early
+        return await self._aclassify_prepared(analysis, prepared)
+
+    async def _aclassify_prepared(
+        self, analysis: AnalysisResult, prepared: Tuple[Prompt, Optional[Dict[str, Any]]]
+    ) -> ClassificationResult:
+        stats: Dict[str, int] = {}
+        start = time.perf_counter()
         try:
-            labels, usage = self.engine.classify(analysis.text)
-            return ClassificationResult(
+            labels, usage = await self.engine.aclassify(prepared[0].text, stats=stats)
+            self._store(analysis, labels)
+            result = ClassificationResult(
                 file=analysis.file, labels=labels, tokens_usage=usage
             )
-        except ServiceUnavailableError:
-            msg = "Servicio OpenAI no disponible. Intenta de nuevo más tarde."
-            self.logger.error(msg + " para %s", analysis.file)
-            return ClassificationResult(
-                file=analysis.file,
-                error=msg,
-                tokens_usage={
-                    "prompt_tokens": 0,
-                    "completion_tokens": 0,
-                    "total_tokens": 0,
-                },
+        except Exception as e:
+            result = self._failure(analysis.file, e)
+        return self._finish(result, prepared, start, stats)
+
+    def classify_many(
+        self, analyses: List[AnalysisResult]
+    ) -> List[ClassificationResult]:
+        """Clasifica un lote concurrentemente, conservando el orden de entrada."""
+
+        async def _gather():
+            return await asyncio.gather(*(self.aclassify(a) for a in analyses))
+
+        return list(asyncio.run(_gather()))
+
+    # --- Lotes: varios documentos cortos por petición ---------------------
+
+    def _plan_batches(self, analyses: List[AnalysisResult]) -> _BatchPlan:
+        """
+        Resuelve errores y caché, prepara los prompts y agrupa en orden los
+        documentos cortos (hasta `batch_doc_max_tokens`) en lotes de a lo
+        sumo `batch_size` documentos y `batch_max_tokens` tokens.
+        """
+        plan = _BatchPlan(results=[None] * len(analyses))
+        group: List[int] = []
+        group_tokens = 0
+        for i, analysis in enumerate(analyses):
+            plan.results[i], prepared = self._prepare(analysis)
+            if prepared is None:
+                continue
+            plan.prepared[i] = prepared
+            tokens = prepared[0].tokens
+            if self.batch_size < 2 or tokens > self.batch_doc_max_tokens:
+                plan.singles.append(i)
+                continue
+            if group and (
+                len(group) >= self.batch_size
+                or group_tokens + tokens > self.batch_max_tokens
+            ):
+                plan.groups.append(group)
+                group, group_tokens = [], 0
+            group.append(i)
+            group_tokens += tokens
+        if group:
+            plan.groups.append(group)
+        # Un lote de un solo documento no ahorra nada
+        plan.singles.extend(g[0] for g in plan.groups if len(g) == 1)
+        plan.groups = [g for g in plan.groups if len(g) > 1]
+        return plan
+
+    def _apply_batch(
+        self,
+        analyses: List[AnalysisResult],
+        plan: _BatchPlan,
+        group: List[int],
+        labels_by_id: Dict[str, Dict[str, Any]],
+        usage: Dict[str, int],
+        start: float,
+        stats: Dict[str, int],
+    ) -> List[int]:
+        """Reparte etiquetas y uso del lote; devuelve los índices sin respuesta válida."""
+        weights = {i: max(1, plan.prepared[i][0].tokens) for i in group}
+        total_weight = sum(weights.values())
+        missing = []
+        for i in group:
+            share = weights[i] / total_weight
+            doc_usage = {k: round(v * share) for k, v in usage.items()}
+            labels = labels_by_id.get(str(i))
+            if labels is None:
+                plan.spent[i] = doc_usage
+                missing.append(i)
+                continue
+            self._store(analyses[i], labels)
+            result = ClassificationResult(
+                file=analyses[i].file,
+                labels=labels,
+                tokens_usage=doc_usage,
+                batch_size=len(group),
+            )
+            plan.results[i] = self._finish(result, plan.prepared[i], start, stats)
+        if missing:
+            self.logger.warning(
+                "Respuesta de lote incompleta: %d de %d documentos se reintentan solos",
+                len(missing),
+                len(group),
+            )
+        return missing
+
+    def _batch_failed(
+        self,
+        analyses: List[AnalysisResult],
+        plan: _BatchPlan,
+        group: List[int],
+        error: Exception,
+    ) -> List[int]:
+        """Si el servicio no está disponible falla el lote; si no, se reintenta por documento."""
+        if isinstance(error, (ServiceUnavailableError, LLMAuthError)):
+            for i in group:
+                plan.results[i] = self._failure(analyses[i].file, error)
+            return []
+        self.logger.warning(
+            "Lote de %d documentos falló (%s); se clasifican por separado",
+            len(group),
+            error,
+        )
+        return list(group)
+
+    def classify_batch(
+        self, analyses: List[AnalysisResult]
+    ) -> List[ClassificationResult]:
+        """
+        Clasifica varios análisis agrupando los documentos cortos en una
+        misma petición; lo que el lote no resuelve se clasifica por separado.
+        Conserva el orden de entrada.
+        """
+        plan = self._plan_batches(analyses)
+        singles = list(plan.singles)
+        for group in plan.groups:
+            stats: Dict[str, int] = {}
+            start = time.perf_counter()
+            docs = [(str(i), plan.prepared[i][0].text) for i in group]
+            try:
+                labels_by_id, usage = self.engine.classify_batch(docs, stats=stats)
+                singles += self._apply_batch(
+                    analyses, plan, group, labels_by_id, usage, start, stats
+                )
+            except Exception as e:
+                singles += self._batch_failed(analyses, plan, group, e)
+        for i in singles:
+            plan.settle(i, self._classify_prepared(analyses[i], plan.prepared[i]))
+        return plan.results
+
+    async def aclassify_batch(
+        self, analyses: List[AnalysisResult]
+    ) -> List[ClassificationResult]:
+        plan = self._plan_batches(analyses)
+
+        async def run_group(group: List[int]) -> List[int]:
+            stats: Dict[str, int] = {}
+            start = time.perf_counter()
+            docs = [(str(i), plan.prepared[i][0].text) for i in group]
+            try:
+                labels_by_id, usage = await self.engine.aclassify_batch(
+                    docs, stats=stats
+                )
+                return self._apply_batch(
+                    analyses, plan, group, labels_by_id, usage, start, stats
+                )
+            except Exception as e:
+                return self._batch_failed(analyses, plan, group, e)
+
+        missing = await asyncio.gather(*(run_group(g) for g in plan.groups))
+        singles = plan.singles + [i for group in missing for i in group]
+
+        async def run_single(i: int) -> None:
+            plan.settle(i, await self._aclassify_prepared(analyses[i], plan.prepared[i]))
+
+        await asyncio.gather(*(run_single(i) for i in singles))
+        return plan.results
+
+    def classify_batch_timed(
+        self, analyses: List[AnalysisResult]
+    ) -> Tuple[List[ClassificationResult], float]:
+        start = time.perf_counter()
+        results = self.classify_batch(analyses)
+        return results, time.perf_counter() - start
+
+    async def aclassify_batch_timed(
+        self, analyses: List[AnalysisResult]
+    ) -> Tuple[List[ClassificationResult], float]:
+        start = time.perf_counter()
+        results = await self.aclassify_batch(analyses)
+        return results, time.perf_counter() - start
+
+    # --- Modo offline: Batch API ------------------------------------------
+
+    def classify_offline(
+        self,
+        analyses: List[AnalysisResult],
+        backend: BatchBackend,
+        path: Path,
+        poll_seconds: float = 60,
+        timeout: float = 0,
+    ) -> List[ClassificationResult]:
+        """
+        Escribe en `path` una petición por documento pendiente, la envía por
+        `backend`, espera a que el trabajo termine y devuelve los resultados
+        en el orden de entrada.
+
+        Cada trabajo enviado deja un manifiesto junto a `path`; antes de
+        enviar nada se retoman los trabajos de manifiestos previos (un
+        reinicio durante la espera no reenvía ni paga dos veces el lote) y
+        sus respuestas se aplican a los documentos que no han cambiado. De
+        un trabajo expirado o cancelado se aprovechan las respuestas que sí
+        terminaron. Al cerrarse un trabajo se borran su manifiesto y su
+        archivo de peticiones. Las peticiones que no caben en
+        `run_token_cap` no se envían. Los documentos sin respuesta quedan
+        como LLM_UNAVAILABLE (o sin presupuesto) para reintentarse.
+        """
+        results: List[Optional[ClassificationResult]] = [None] * len(analyses)
+        prepared: Dict[int, Tuple[Prompt, Optional[Dict[str, Any]]]] = {}
+        for i, analysis in enumerate(analyses):
+            results[i], prompt = self._prepare(analysis)
+            if prompt is not None:
+                prepared[i] = prompt
+        if not prepared:
+            return results
+
+        start = time.perf_counter()
+        outputs: Dict[int, BatchOutput] = {}
+        # Estado del trabajo de cada documento sin respuesta
+        states: Dict[int, str] = {}
+        for manifest_path in sorted(Path(path).parent.glob("*" + MANIFEST_SUFFIX)):
+            self._resume_offline(
+                manifest_path, backend, analyses, prepared, outputs, states, poll_seconds, timeout
             )
+
+        requests = [
+            (str(i), self.engine.request_body(prep[0].text))
+            for i, prep in prepared.items()
+            if i not in outputs and i not in states
+        ]
+        admitted = self.governor.admit_batch(
+            [estimate_tokens(body["messages"]) for _, body in requests]
+        )
+        for custom_id, _ in requests[admitted:]:
+            states[int(custom_id)] = "budget"
+        requests = requests[:admitted]
+        if requests:
+            files = {
+                custom_id: [analyses[int(custom_id)].file, analyses[int(custom_id)].sha256]
+                for custom_id, _ in requests
+            }
+            write_requests(path, self.model, requests)
+            try:
+                job_id = backend.submit(path)
+            except Exception as e:
+                self.logger.error("Error enviando el lote offline: %s", e)
+                Path(path).unlink(missing_ok=True)
+                job_id = None
+                states.update((int(custom_id), "error") for custom_id in files)
+            if job_id is not None:
+                manifest_path = write_manifest(path, job_id, files)
+                self.logger.info("Lote %s enviado con %d peticiones", job_id, len(requests))
+                state, outs = self._collect_offline(backend, job_id, poll_seconds, timeout)
+                for custom_id in files:
+                    if custom_id in outs:
+                        outputs[int(custom_id)] = outs[custom_id]
+                    else:
+                        states[int(custom_id)] = state
+                if state in TERMINAL_STATES:
+                    discard_job(manifest_path, {"input_file": str(path)})
+
+        for i, prep in prepared.items():
+            analysis = analyses[i]
+            out = outputs.get(i)
+            if out is None:
+                state = states.get(i, "error")
+                msg = (
+                    self.BUDGET_MSG
+                    if state == "budget"
+                    else f"{self.UNAVAILABLE_MSG} (lote: {state})"
+                )
+                result = self._error_result(analysis.file, msg)
+            elif out.error:
+                result = self._error_result(analysis.file, out.error)
+            else:
+                self.governor.record(out.tokens_usage or {})
+                labels = parse_json_lenient(out.content)
+                if labels is None:
+                    result = self._error_result(
+                        analysis.file, "No se pudo obtener JSON válido del lote."
+                    )
+                else:
+                    self._store(analysis, labels)
+                    result = ClassificationResult(
+                        file=analysis.file, labels=labels, tokens_usage=out.tokens_usage
+                    )
+            results[i] = self._finish(result, prep, start, {})
+        return results
+
+    def _collect_offline(
+        self, backend: BatchBackend, job_id: str, poll_seconds: float, timeout: float
+    ) -> Tuple[str, Dict[str, BatchOutput]]:
+        """Espera el trabajo y devuelve su estado y las respuestas por custom_id."""
+        try:
+            state = wait_for(backend, job_id, poll_seconds, timeout)
+            if state not in TERMINAL_STATES:
+                return state, {}
+            outs = {out.custom_id: out for out in map(parse_output, backend.results(job_id))}
         except Exception as e:
-            self.logger.error("Error clasificando %s: %s", analysis.file, e)
-            return ClassificationResult(
-                file=analysis.file,
-                error=str(e),
-                tokens_usage={
-                    "prompt_tokens": 0,
-                    "completion_tokens": 0,
-                    "total_tokens": 0,
-                },
+            self.logger.error("Error en el lote offline %s: %s", job_id, e)
+            return "error", {}
+        if state != "completed":
+            self.logger.warning(
+                "Lote %s terminó en estado %s; se aprovechan %d respuestas",
+                job_id,
+                state,
+                len(outs),
             )
+        return state, outs
+
+    def _resume_offline(
+        self,
+        manifest_path: Path,
+        backend: BatchBackend,
+        analyses: List[AnalysisResult],
+        prepared: Dict[int, Tuple[Prompt, Optional[Dict[str, Any]]]],
+        outputs: Dict[int, BatchOutput],
+        states: Dict[int, str],
+        poll_seconds: float,
+        timeout: float,
+    ) -> None:
+        """Retoma el trabajo de un manifiesto previo para los documentos que coinciden."""
+        manifest = read_manifest(manifest_path)
+        if manifest is None:
+            return
+        job_id = manifest["batch_id"]
+        wanted = {tuple(doc): custom_id for custom_id, doc in manifest["files"].items()}
+        matched = {
+            wanted[(analyses[i].file, analyses[i].sha256)]: i
+            for i in prepared
+            if analyses[i].sha256
+            and (analyses[i].file, analyses[i].sha256) in wanted
+            and i not in outputs
+            and i not in states
+        }
+        if not matched:
+            # Ningún documento pendiente lo necesita: no se espera por él
+            try:
+                if backend.status(job_id) in TERMINAL_STATES:
+                    discard_job(manifest_path, manifest)
+            except Exception as e:
+                self.logger.warning("No se pudo consultar el lote %s: %s", job_id, e)
+            return
+        self.logger.info("Se retoma el lote %s (%d documentos)", job_id, len(matched))
+        state, outs = self._collect_offline(backend, job_id, poll_seconds, timeout)
+        for custom_id, i in matched.items():
+            if custom_id in outs:
+                outputs[i] = outs[custom_id]
+            else:
+                states[i] = state
+        if state in TERMINAL_STATES:
+            discard_job(manifest_path, manifest)
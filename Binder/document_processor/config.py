@@ -2,7 +2,7 @@
 
 import os
 from pathlib import Path
-from dotenv import load_dotenv
+from typing import Optional
 
 # ————— VARIABLES DE CONFIGURACIÓN —————
 ENV_FILE_NAME          = ".env"
@@ -11,14 +11,81 @@ ENV_VAR_API_KEY        = "OPENAI_API_KEY"
 DEFAULT_LLM_MODEL      = "gpt-4.1-nano"
 INSTRUCTIONS_FILE_NAME = "prompt_instructions.txt"
 PDF_EXAMPLES_DIR       = "pdf_examples"
+CACHE_DIR_NAME         = ".cache"
 
 DEFAULT_MAX_PAGES      = 5
+DEFAULT_LONG_DOCUMENTS = "reject"  # más de MAX_PAGES: "reject" o "truncate" (extrae las primeras)
+DEFAULT_MAX_FILE_MB    = 50   # tamaño máximo de PDF aceptado (0 = sin límite)
 DEFAULT_PRETTY_PRINT   = 1  # 0 = JSON compacto, 1 = JSON con indentación
+DEFAULT_PRINT_STDOUT   = 1  # 1 = imprime cada resultado por stdout
+DEFAULT_OUTPUT_FILE    = "" # NDJSON de salida relativo a base_dir ("" = desactivado)
+DEFAULT_METRICS_FILE   = "" # resumen al final: `.prom` (Prometheus) o `.json` ("" = desactivado)
+DEFAULT_COST_FILE      = "" # JSON con tokens y coste de la ejecución ("" = solo al log)
+
+DEFAULT_WORKERS        = 1    # procesos de análisis: 1 = secuencial, 0 = uno por núcleo
+DEFAULT_LLM_WORKERS    = 4    # clasificaciones concurrentes en modo paralelo
+DEFAULT_FILE_TIMEOUT   = 300  # segundos máximos de análisis por archivo (0 = sin límite)
+
+DEFAULT_ASYNC_LLM      = 0       # 1 = cliente asíncrono con muchas peticiones en vuelo
+DEFAULT_LLM_CONCURRENCY = 16     # peticiones simultáneas máximas del cliente asíncrono
+DEFAULT_LLM_RPM        = 500     # presupuesto de peticiones por minuto
+DEFAULT_LLM_TPM        = 200_000 # presupuesto de tokens por minuto
+DEFAULT_LLM_JSON_MODE  = "json_object"  # "json_object", "json_schema" o "" (sin formato forzado)
+DEFAULT_LLM_MAX_RETRIES = 3      # intentos por llamada ante errores transitorios
+DEFAULT_LLM_RETRY_DELAY = 2.0    # base (s) del backoff exponencial con jitter
+DEFAULT_LLM_BREAKER_FAILURES = 5 # fallos seguidos que abren el disyuntor
+DEFAULT_LLM_BREAKER_RESET = 30   # segundos abierto antes de probar de nuevo
+DEFAULT_LLM_BREAKER_MODE = "fail"  # "fail" = falla al instante, "pause" = espera
+DEFAULT_LLM_BATCH_SIZE = 1       # documentos cortos por petición (1 = sin lotes)
+DEFAULT_LLM_BATCH_MAX_TOKENS = 6000     # tope de tokens de documento por lote
+DEFAULT_LLM_BATCH_DOC_MAX_TOKENS = 1500 # documentos más largos van solos
+DEFAULT_LLM_RUN_TOKEN_CAP = 0    # tokens máximos por ejecución (0 = sin tope)
+DEFAULT_LLM_MINUTE_TOKEN_CAP = 0 # tokens por minuto antes de frenar las llamadas (0 = sin tope)
+DEFAULT_LLM_ADAPTIVE_CONCURRENCY = 1  # 1 = AIMD: reduce la concurrencia ante 429 o latencia alta
+DEFAULT_LLM_LATENCY_TOLERANCE = 2.0   # latencia media / mínima que se considera congestión
+DEFAULT_PRICE_INPUT_PER_MTOK = 0.10   # USD por millón de tokens de entrada (gpt-4.1-nano)
+DEFAULT_PRICE_OUTPUT_PER_MTOK = 0.40  # USD por millón de tokens de salida
+DEFAULT_LLM_OFFLINE_BATCH = 0    # 1 = todas las clasificaciones como un trabajo de la Batch API
+DEFAULT_BATCH_BACKEND  = "openai"  # "openai" o "local" (ejecuta el lote con el cliente normal)
+DEFAULT_BATCH_POLL_SECONDS = 60  # intervalo de consulta del estado del lote
+DEFAULT_BATCH_TIMEOUT  = 0       # segundos máximos de espera (0 = hasta que termine)
+BATCH_DIR_NAME         = "batches"
+
+DEFAULT_FASTPATH_ENABLED = 0     # 1 = clasificador local entrenado con etiquetas en caché
+DEFAULT_FASTPATH_MIN_CONF = 0.8  # similitud mínima para responder sin LLM
+DEFAULT_FASTPATH_MIN_EXAMPLES = 20  # ejemplos mínimos por tipo para entrenarlo
+
+DEFAULT_DEDUP_ENABLED  = 0       # 1 = reutiliza la clasificación de documentos casi idénticos
+DEFAULT_DEDUP_THRESHOLD = 0.85   # similitud de Jaccard estimada mínima (MinHash)
+DEFAULT_PROMPT_MAX_TOKENS = 6000  # tokens de documento enviados por clasificación (0 = sin límite)
+DEFAULT_NORMALIZE_TEXT = 1  # quita membretes/pies repetidos, números de página y ruido de OCR
+
+DEFAULT_OCR_WORKERS    = 4    # páginas en OCR simultáneo (total, repartido entre DEFAULT_WORKERS)
+DEFAULT_OCR_TIMEOUT    = 60   # segundos máximos de tesseract por página
+DEFAULT_OCR_MIN_DPI    = 150  # rango de resolución elegido por página
+DEFAULT_OCR_MAX_DPI    = 400
+DEFAULT_OCR_MIN_CONF   = 60   # confianza media bajo la cual se reintenta a más DPI
+DEFAULT_OCR_BLANK_PAGES = 0   # 1 = también pasa por OCR las páginas que parecen en blanco
+
+DEFAULT_CACHE_ENABLED  = 1    # caché de texto y etiquetas por SHA-256 del PDF
+DEFAULT_CACHE_MAX_MB   = 512  # tamaño máximo en disco antes de expulsar (LRU)
+
+DEFAULT_WATCH_POLL_SECONDS = 1.0  # modo vigilancia (`main.py --watch`): sondeo de input_dir
+DEFAULT_WATCH_DEBOUNCE = 2.0      # segundos sin cambios antes de procesar un PDF
+DEFAULT_WATCH_INCOMPLETE_TIMEOUT = 300  # sin %%EOF tras este tiempo estable se procesa igual
+DEFAULT_WATCH_METRICS_SECONDS = 15  # cada cuánto se reescribe DEFAULT_METRICS_FILE
+
+DEFAULT_SERVER_HOST    = "127.0.0.1"  # modo servicio (`main.py --serve`)
+DEFAULT_SERVER_PORT    = 8080
+DEFAULT_SERVER_QUEUE_SIZE = 32   # trabajos en espera; con la cola llena se responde 429
+DEFAULT_SERVER_REQUEST_TIMEOUT = 300  # segundos que una petición espera su resultado (504)
+UPLOAD_DIR_NAME        = "uploads"  # PDFs subidos, mientras se procesan
 # —————————————————————————————————————
 
 class Config:
     """
-    Carga de configuración centralizada.
+    Carga de configuración centralizada. El `.env`, la API key y las
+    instrucciones se leen en el primer acceso, no al construirla.
     """
 
     def __init__(self, base_dir: Path = Path(__file__).parent.parent):
@@ -26,23 +93,131 @@ class Config:
         self.env_file           = base_dir / ENV_FILE_NAME
         self.instructions_file  = base_dir / INSTRUCTIONS_FILE_NAME
         self.input_dir          = base_dir / PDF_EXAMPLES_DIR
+        self.cache_dir          = base_dir / CACHE_DIR_NAME
 
-        # Carga variables de .env si existe
-        self._load_env()
-
-        # Variable obligatoria
-        self.api_key            = self._get_env_var(ENV_VAR_API_KEY)
+        # API key (obligatoria) e instrucciones para el LLM: ver propiedades
+        self._api_key: Optional[str] = None
+        self._instructions: Optional[str] = None
+        self._env_loaded        = False
         # Modelo del LLM
         self.model              = DEFAULT_LLM_MODEL
-        # Instrucciones para el LLM
-        self.instructions       = self._read_text(self.instructions_file)
 
         # Parámetros fijos
         self.max_pages          = DEFAULT_MAX_PAGES
+        self.long_documents     = DEFAULT_LONG_DOCUMENTS
+        self.max_file_bytes     = DEFAULT_MAX_FILE_MB * 1024 * 1024
         self.pretty_print_json  = bool(DEFAULT_PRETTY_PRINT)
 
+        # Salida: stdout y/o NDJSON con checkpoint para reanudar
+        self.print_stdout       = bool(DEFAULT_PRINT_STDOUT)
+        self.output_file        = base_dir / DEFAULT_OUTPUT_FILE if DEFAULT_OUTPUT_FILE else None
+        self.checkpoint_file    = (
+            self.output_file.with_name(self.output_file.name + ".checkpoint")
+            if self.output_file
+            else None
+        )
+        self.metrics_file       = base_dir / DEFAULT_METRICS_FILE if DEFAULT_METRICS_FILE else None
+        self.cost_file          = base_dir / DEFAULT_COST_FILE if DEFAULT_COST_FILE else None
+
+        # Ejecución paralela
+        self.workers            = DEFAULT_WORKERS
+        self.llm_workers        = DEFAULT_LLM_WORKERS
+        self.file_timeout       = DEFAULT_FILE_TIMEOUT
+
+        # Cliente LLM asíncrono
+        self.async_llm          = bool(DEFAULT_ASYNC_LLM)
+        self.llm_concurrency    = DEFAULT_LLM_CONCURRENCY
+        self.llm_rpm            = DEFAULT_LLM_RPM
+        self.llm_tpm            = DEFAULT_LLM_TPM
+        self.llm_json_mode      = DEFAULT_LLM_JSON_MODE
+        self.llm_max_retries    = DEFAULT_LLM_MAX_RETRIES
+        self.llm_retry_delay    = DEFAULT_LLM_RETRY_DELAY
+        self.llm_breaker_failures = DEFAULT_LLM_BREAKER_FAILURES
+        self.llm_breaker_reset  = DEFAULT_LLM_BREAKER_RESET
+        self.llm_breaker_mode   = DEFAULT_LLM_BREAKER_MODE
+        self.llm_batch_size     = DEFAULT_LLM_BATCH_SIZE
+        self.llm_batch_max_tokens = DEFAULT_LLM_BATCH_MAX_TOKENS
+        self.llm_batch_doc_max_tokens = DEFAULT_LLM_BATCH_DOC_MAX_TOKENS
+
+        # Presupuesto de tokens, concurrencia adaptativa y precios
+        self.llm_run_token_cap  = DEFAULT_LLM_RUN_TOKEN_CAP
+        self.llm_minute_token_cap = DEFAULT_LLM_MINUTE_TOKEN_CAP
+        self.llm_adaptive_concurrency = bool(DEFAULT_LLM_ADAPTIVE_CONCURRENCY)
+        self.llm_latency_tolerance = DEFAULT_LLM_LATENCY_TOLERANCE
+        self.price_input_per_mtok = DEFAULT_PRICE_INPUT_PER_MTOK
+        self.price_output_per_mtok = DEFAULT_PRICE_OUTPUT_PER_MTOK
+
+        self.llm_offline_batch  = bool(DEFAULT_LLM_OFFLINE_BATCH)
+        self.batch_backend      = DEFAULT_BATCH_BACKEND
+        self.batch_dir          = base_dir / BATCH_DIR_NAME
+        self.batch_poll_seconds = DEFAULT_BATCH_POLL_SECONDS
+        self.batch_timeout      = DEFAULT_BATCH_TIMEOUT
+
+        # Clasificador local (requiere caché)
+        self.fastpath_enabled   = bool(DEFAULT_FASTPATH_ENABLED)
+        self.fastpath_min_confidence = DEFAULT_FASTPATH_MIN_CONF
+        self.fastpath_min_examples = DEFAULT_FASTPATH_MIN_EXAMPLES
+
+        # Casi duplicados (índice MinHash en memoria)
+        self.dedup_enabled      = bool(DEFAULT_DEDUP_ENABLED)
+        self.dedup_threshold    = DEFAULT_DEDUP_THRESHOLD
+        self.prompt_max_tokens  = DEFAULT_PROMPT_MAX_TOKENS
+        self.normalize_text     = bool(DEFAULT_NORMALIZE_TEXT)
+
+        # OCR
+        self.ocr_workers        = DEFAULT_OCR_WORKERS
+        self.ocr_page_timeout   = DEFAULT_OCR_TIMEOUT
+        self.ocr_min_dpi        = DEFAULT_OCR_MIN_DPI
+        self.ocr_max_dpi        = DEFAULT_OCR_MAX_DPI
+        self.ocr_min_confidence = DEFAULT_OCR_MIN_CONF
+        self.ocr_blank_pages    = bool(DEFAULT_OCR_BLANK_PAGES)
+
+        # Caché persistente
+        self.cache_enabled      = bool(DEFAULT_CACHE_ENABLED)
+        self.cache_max_bytes    = DEFAULT_CACHE_MAX_MB * 1024 * 1024
+
+        # Modo vigilancia
+        self.watch_poll_seconds = DEFAULT_WATCH_POLL_SECONDS
+        self.watch_debounce     = DEFAULT_WATCH_DEBOUNCE
+        self.watch_incomplete_timeout = DEFAULT_WATCH_INCOMPLETE_TIMEOUT
+        self.watch_metrics_seconds = DEFAULT_WATCH_METRICS_SECONDS
+
+        # Modo servicio (las clasificaciones simultáneas las limita llm_workers)
+        self.server_host        = DEFAULT_SERVER_HOST
+        self.server_port        = DEFAULT_SERVER_PORT
+        self.server_queue_size  = DEFAULT_SERVER_QUEUE_SIZE
+        self.server_request_timeout = DEFAULT_SERVER_REQUEST_TIMEOUT
+        self.upload_dir         = base_dir / UPLOAD_DIR_NAME
+
+    @property
+    def api_key(self) -> str:
+        if self._api_key is None:
+            self._load_env()
+            self._api_key = self._get_env_var(ENV_VAR_API_KEY)
+        return self._api_key
+
+    @api_key.setter
+    def api_key(self, value: str) -> None:
+        self._api_key = value
+
+    @property
+    def instructions(self) -> str:
+        if self._instructions is None:
+            self._instructions = self._read_text(self.instructions_file)
+        return self._instructions
+
+    @instructions.setter
+    def instructions(self, value: str) -> None:
+        self._instructions = value
+
     def _load_env(self) -> None:
+        # Carga variables de .env si existe (dotenv solo se importa entonces)
+        if self._env_loaded:
+            return
+        self._env_loaded = True
         if self.env_file.exists():
+            from dotenv import load_dotenv
+
             load_dotenv(str(self.env_file))
 
     def _get_env_var(self, key: str) -> str:
@@ -0,0 +1,169 @@
+# document_processor/dedup.py
+
+import re
+import struct
+import threading
+import zlib
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .cache import ResultCache
+
+WORD_RE = re.compile(r"\w+")
+DIGITS_RE = re.compile(r"\d")
+
+MASK32 = (1 << 32) - 1
+GOLDEN = 0x9E3779B1  # mezcla multiplicativa de Knuth sobre el CRC32
+
+
+@dataclass
+class DuplicateMatch:
+    file: str
+    similarity: float
+    labels: Dict[str, Any]
+
+
+def shingles(text: str, size: int, max_chars: int) -> set:
+    """
+    Conjunto de n-gramas de palabras (hash CRC32). Los dígitos se igualan
+    para que fechas, folios e importes no separen copias de una plantilla.
+    """
+    words = WORD_RE.findall(DIGITS_RE.sub("0", text[:max_chars].lower()))
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {
+        zlib.crc32(" ".join(words[i : i + size]).encode("utf-8"))
+        for i in range(len(words) - size + 1)
+    }
+
+
+class MinHashIndex:
+    """
+    Índice en memoria de documentos casi idénticos: firma MinHash de
+    `num_perm` valores de 32 bits sobre shingles de palabras y LSH con
+    `bands` bandas. Los candidatos de las bandas se confirman con la
+    similitud de Jaccard estimada (fracción de valores de firma iguales).
+
+    La firma usa una sola permutación repartida en `num_perm` cubetas
+    (one permutation hashing, con densificación por rotación para las
+    cubetas vacías): cada shingle se procesa una vez, no `num_perm` veces.
+
+    Memoria por documento: la firma (`num_perm` × 4 bytes) más una entrada
+    por banda; cientos de miles de documentos caben en unos cientos de MB.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        num_perm: int = 64,
+        bands: int = 8,
+        shingle_size: int = 3,
+        max_chars: int = 20000,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_chars = max_chars
+        # Valor máximo dentro de una cubeta; acota el desplazamiento de rotación
+        self._span = (MASK32 + 1) // num_perm
+        self._files: List[str] = []
+        self._labels: List[Dict[str, Any]] = []
+        self._signatures: List[array] = []
+        self._buckets: List[Dict[int, Any]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def signature(self, text: str) -> Optional[array]:
+        hashes = shingles(text, self.shingle_size, self.max_chars)
+        if not hashes:
+            return None
+        k = self.num_perm
+        empty = self._span
+        sig = [empty] * k
+        for h in hashes:
+            h = (h * GOLDEN) & MASK32
+            slot, value = h % k, h // k
+            if value < sig[slot]:
+                sig[slot] = value
+        # Densificación: una cubeta vacía copia la siguiente ocupada, desplazada
+        if empty in sig:
+            dense = list(sig)
+            for i in range(k):
+                if sig[i] != empty:
+                    continue
+                dist = next(d for d in range(1, k) if sig[(i + d) % k] != empty)
+                dense[i] = sig[(i + dist) % k] + dist * self._span
+            sig = dense
+        return array("I", (v & MASK32 for v in sig))
+
+    def _band_keys(self, sig: array) -> List[int]:
+        keys = []
+        for band in range(self.bands):
+            chunk = sig[band * self.rows : (band + 1) * self.rows]
+            keys.append(hash(struct.pack(f"{self.rows}I", *chunk)))
+        return keys
+
+    def query(self, sig: array) -> Optional[DuplicateMatch]:
+        """El documento indexado más parecido por encima del umbral, si hay."""
+        with self._lock:
+            candidates = set()
+            for band, key in enumerate(self._band_keys(sig)):
+                found = self._buckets[band].get(key)
+                if found is None:
+                    continue
+                candidates.update(found if isinstance(found, list) else (found,))
+            best, best_sim = None, 0.0
+            for doc in candidates:
+                other = self._signatures[doc]
+                sim = sum(x == y for x, y in zip(sig, other)) / self.num_perm
+                if sim > best_sim:
+                    best, best_sim = doc, sim
+            if best is None or best_sim < self.threshold:
+                return None
+            return DuplicateMatch(
+                file=self._files[best],
+                similarity=round(best_sim, 3),
+                labels=dict(self._labels[best]),
+            )
+
+    def add(self, sig: array, file: str, labels: Dict[str, Any]) -> None:
+        with self._lock:
+            doc = len(self._files)
+            self._files.append(file)
+            self._labels.append(labels)
+            self._signatures.append(sig)
+            for band, key in enumerate(self._band_keys(sig)):
+                bucket = self._buckets[band]
+                found = bucket.get(key)
+                # Un entero mientras el cubo tenga un solo documento: ahorra memoria
+                if found is None:
+                    bucket[key] = doc
+                elif isinstance(found, list):
+                    found.append(doc)
+                else:
+                    bucket[key] = [found, doc]
+
+    @property
+    def params(self) -> str:
+        """Parámetros que invalidan las firmas guardadas si cambian."""
+        return f"{self.num_perm}-{self.shingle_size}-{self.max_chars}"
+
+
+def cached_signatures(
+    cache: ResultCache, signatures_prefix: str, labels_prefix: str
+) -> Iterator[Tuple[str, array, Dict[str, Any]]]:
+    """Tríos (archivo, firma, etiquetas) de la caché, unidos por el SHA-256 del PDF."""
+    labels = {
+        key[len(labels_prefix) :]: value for key, value in cache.items(labels_prefix)
+    }
+    for key, value in cache.items(signatures_prefix):
+        found = labels.get(key[len(signatures_prefix) :])
+        if isinstance(found, dict) and value.get("signature"):
+            yield value.get("file", ""), array("I", value["signature"]), found
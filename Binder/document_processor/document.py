@@ -0,0 +1,145 @@
+# document_processor/document.py
+
+import io
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from .cache import sha256_file, sha256_hex
+from .utils.pdf import load_pymupdf, read_pdf_bytes
+
+if TYPE_CHECKING:
+    import pdfplumber
+    from PIL import Image
+
+
+class PDFDocument:
+    """
+    PDF parseado una sola vez y compartido por todas las etapas del pipeline.
+    Da acceso a los bytes, número de páginas, presencia de imágenes por
+    página, capa de texto por página y renderizado, cacheando cada dato.
+
+    Abierto desde una ruta, MuPDF y pdfplumber leen el archivo bajo demanda:
+    los bytes completos solo se cargan si alguien pide `data`. PyMuPDF,
+    pdfplumber y PIL se importan al abrir el primer documento que los usa.
+    """
+
+    def __init__(
+        self, path: Path, data: Optional[bytes] = None, sha256: Optional[str] = None
+    ):
+        fitz = load_pymupdf()
+        self.path = Path(path)
+        self.name = self.path.name
+        self._data = data
+        if data is not None:
+            self.size = len(data)
+            self._fitz = fitz.open(stream=data, filetype="pdf")
+        else:
+            self.size = self.path.stat().st_size
+            self._fitz = fitz.open(str(self.path))
+        self._plumber = None
+        self._texts: Dict[int, str] = {}
+        self._images: Dict[int, List[Tuple[float, float, float, float]]] = {}
+        self._sha256 = sha256  # si ya se calculó antes de abrirlo
+
+    @classmethod
+    def open(cls, path: Path) -> "PDFDocument":
+        return cls(path)
+
+    def __enter__(self) -> "PDFDocument":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def page_count(self) -> int:
+        return self._fitz.page_count
+
+    @property
+    def data(self) -> bytes:
+        """Bytes del PDF (se leen del disco en cada acceso si no se pasaron)."""
+        return self._data if self._data is not None else read_pdf_bytes(self.path)
+
+    @property
+    def sha256(self) -> str:
+        """Hash del contenido, usado como clave de la caché."""
+        if self._sha256 is None:
+            self._sha256 = (
+                sha256_hex(self._data)
+                if self._data is not None
+                else sha256_file(self.path)
+            )
+        return self._sha256
+
+    @property
+    def has_images(self) -> bool:
+        return any(self.page_has_images(i) for i in range(self.page_count))
+
+    @property
+    def plumber(self) -> "pdfplumber.PDF":
+        """Documento pdfplumber, abierto solo si alguna etapa lo necesita."""
+        if self._plumber is None:
+            import pdfplumber
+
+            source = io.BytesIO(self._data) if self._data is not None else str(self.path)
+            self._plumber = pdfplumber.open(source)
+        return self._plumber
+
+    def _image_boxes(self, index: int) -> List[Tuple[float, float, float, float]]:
+        """
+        Rectángulos de las imágenes que dibuja la página. `get_image_info`
+        recorre el contenido, así que también ve las imágenes en línea
+        (BI … EI) de muchos escáneres, que `get_images` no lista.
+        """
+        if index not in self._images:
+            self._images[index] = [
+                tuple(info["bbox"]) for info in self._fitz[index].get_image_info()
+            ]
+        return self._images[index]
+
+    def page_has_images(self, index: int) -> bool:
+        """Indica si la página dibuja alguna imagen (XObject o en línea)."""
+        return bool(self._image_boxes(index))
+
+    def page_text(self, index: int) -> str:
+        """Capa de texto de la página según PyMuPDF."""
+        if index not in self._texts:
+            self._texts[index] = self._fitz[index].get_text("text") or ""
+        return self._texts[index]
+
+    def page_fonts(self, index: int) -> int:
+        """Fuentes que usa la página (0 = no tiene capa de texto real)."""
+        return len(self._fitz[index].get_fonts())
+
+    def page_image_coverage(self, index: int) -> float:
+        """Fracción (0-1) del área de la página cubierta por imágenes."""
+        fitz = load_pymupdf()
+        page = self._fitz[index]
+        area = page.rect.width * page.rect.height
+        if not area:
+            return 0.0
+        covered = sum(
+            (fitz.Rect(bbox) & page.rect).get_area() for bbox in self._image_boxes(index)
+        )
+        return min(1.0, covered / area)
+
+    def page_drawings(self, index: int) -> int:
+        """Trazos vectoriales de la página (p. ej. texto convertido a curvas)."""
+        return len(self._fitz[index].get_cdrawings())
+
+    def page_size(self, index: int) -> Tuple[float, float]:
+        """Ancho y alto de la página en puntos."""
+        rect = self._fitz[index].rect
+        return rect.width, rect.height
+
+    def render_page(self, index: int, dpi: int = 300) -> "Image.Image":
+        from PIL import Image
+
+        pix = self._fitz[index].get_pixmap(dpi=dpi)
+        return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    def close(self) -> None:
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+        self._fitz.close()
@@ -1,76 +1,227 @@
 # document_processor/extractor.py
 
-import io
 import logging
-from typing import List
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
 
-import fitz
-import pdfplumber
-from PIL import Image
+from .document import PDFDocument
+from .metrics import stage_timer
+from .planner import PagePlan, PagePlanner
+from .utils.ocr import OCRExecutor, OCRPage, pdf_to_images
 
-from .utils.ocr import pdf_to_images, ocr_images
+if TYPE_CHECKING:
+    from PIL import Image
 
 LOG = logging.getLogger(__name__)
 
 
+@dataclass
+class Extraction:
+    text: str
+    # Texto por página (índice 0 = página 1; "" si no se obtuvo nada)
+    pages: List[str] = field(default_factory=list)
+    # {página (base 1): confianza media de tesseract}
+    ocr_confidence: Dict[int, float] = field(default_factory=dict)
+    # Páginas resueltas por cada motor y milisegundos por etapa
+    pages_by_engine: Dict[str, int] = field(default_factory=dict)
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    # Decisión del planificador por página (`PagePlan.report()`)
+    page_plan: List[Dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class PageText:
+    index: int  # base 0
+    text: str
+    # Motor que produjo el texto ("" si ninguno lo consiguió)
+    engine: str = ""
+    ocr_confidence: Optional[float] = None
+    plan: Optional[PagePlan] = None
+
+
 class TextExtractor:
     """
     Extrae texto de un PDF en hasta 3 fases:
       1) PyMuPDF, rápido y preciso.
       2) pdfplumber, para layouts complejos (tablas/columnas).
-      3) OCR página-a-página si faltó texto.
+      3) OCR página-a-página si faltó texto, renderizando solo esas páginas
+         a una resolución elegida por página y con preprocesado; si la
+         confianza es baja se reintenta una vez a mayor resolución.
+    `PagePlanner` decide con la capa de texto de PyMuPDF por qué fase
+    empieza cada página: las escaneadas o con texto ilegible van directo
+    al OCR y las páginas en blanco no pasan por ninguna.
+
+    `iter_pages` recorre el documento por ventanas de `ocr_workers` páginas
+    y las entrega en orden a medida que se resuelven, de modo que la
+    memoria no crece con el número de páginas del PDF.
     """
 
-    def __init__(self, min_chars_per_page: int = 30):
+    # Cambiar al modificar la extracción: invalida el texto cacheado
+    VERSION = "6"
+
+    def __init__(
+        self,
+        min_chars_per_page: int = 30,
+        ocr_workers: int = 4,
+        ocr_page_timeout: float = 60,
+        ocr_min_dpi: int = 150,
+        ocr_max_dpi: int = 400,
+        ocr_min_confidence: float = 60.0,
+        ocr_blank_pages: bool = False,
+    ):
         self.min_chars = min_chars_per_page
+        self.ocr_blank_pages = ocr_blank_pages
+        self.planner = PagePlanner(
+            min_chars=min_chars_per_page, ocr_blank=ocr_blank_pages
+        )
+        self.ocr_min_dpi = ocr_min_dpi
+        self.ocr_max_dpi = ocr_max_dpi
+        self.ocr_min_confidence = ocr_min_confidence
+        self.ocr = OCRExecutor(workers=ocr_workers, page_timeout=ocr_page_timeout)
+
+    def close(self) -> None:
+        self.ocr.close()
+
+    def extract(self, doc: PDFDocument, max_pages: Optional[int] = None) -> str:
+        return self.extract_detailed(doc, max_pages=max_pages).text
 
-    def extract(self, pdf_bytes: bytes) -> str:
-        # 1) Extracción con PyMuPDF
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    def extract_detailed(
+        self, doc: PDFDocument, max_pages: Optional[int] = None
+    ) -> Extraction:
+        """Todas las páginas (o las `max_pages` primeras) reunidas en una `Extraction`."""
+        timings: Dict[str, float] = {}
+        engines = {"pymupdf": 0, "pdfplumber": 0, "ocr": 0}
         pages_text: List[str] = []
-        for page in doc:
-            txt = page.get_text("text") or ""
-            if len(txt.strip()) >= self.min_chars:
-                pages_text.append(txt)
-            else:
-                pages_text.append("")  # marcamos para fallback
-        doc.close()
-
-        # 2) Extracción con pdfplumber para páginas vacías
-        if any(not t.strip() for t in pages_text):
-            try:
-                with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-                    for i, page in enumerate(pdf.pages):
-                        if not pages_text[i].strip():
-                            t = page.extract_text() or ""
-                            pages_text[i] = t
-            except Exception as e:
-                LOG.warning("pdfplumber falló: %s", e)
-
-        # 3) OCR para lo que quede vacío
-        images: List[Image.Image] = pdf_to_images(pdf_bytes)
-        full_text: List[str] = []
-        for idx, text in enumerate(pages_text):
-            if text and text.strip():
-                full_text.append(text)
-            else:
-                # intentamos OCR en esa página
-                if idx < len(images):
+        ocr_confidence: Dict[int, float] = {}
+        plans: List[Dict[str, Any]] = []
+        for page in self.iter_pages(doc, max_pages=max_pages, timings=timings):
+            pages_text.append(page.text)
+            if page.plan is not None:
+                plans.append(page.plan.report())
+            if page.engine:
+                engines[page.engine] += 1
+            if page.ocr_confidence is not None:
+                ocr_confidence[page.index + 1] = round(page.ocr_confidence, 1)
+
+        # Unimos todo filtrando vacíos
+        return Extraction(
+            text="\n".join(p for p in pages_text if p.strip()),
+            pages=pages_text,
+            ocr_confidence=ocr_confidence,
+            pages_by_engine=engines,
+            timings_ms=timings,
+            page_plan=plans,
+        )
+
+    def iter_pages(
+        self,
+        doc: PDFDocument,
+        max_pages: Optional[int] = None,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> Iterator[PageText]:
+        """
+        Genera el texto de cada página en orden. Solo una ventana de
+        páginas está en proceso a la vez (el OCR de la ventana corre en
+        paralelo); `timings` acumula los milisegundos por motor.
+        """
+        timings = {} if timings is None else timings
+        total = doc.page_count if max_pages is None else min(max_pages, doc.page_count)
+        window = max(1, self.ocr.workers)
+        for first in range(0, total, window):
+            yield from self._extract_window(
+                doc, range(first, min(first + window, total)), timings
+            )
+
+    def _extract_window(
+        self, doc: PDFDocument, indices: range, timings: Dict[str, float]
+    ) -> List[PageText]:
+        # 1) PyMuPDF: capa de texto y plan de cada página
+        pages: Dict[int, PageText] = {}
+        with stage_timer(timings, "pymupdf"):
+            for i in indices:
+                plan = self.planner.plan(doc, i)
+                text = doc.page_text(i) if plan.engine == "pymupdf" else ""
+                pages[i] = PageText(i, text, plan.engine if text else "", plan=plan)
+
+        # 2) pdfplumber solo para las páginas con fuentes y poco texto
+        thin = [i for i in indices if pages[i].plan.engine == "pdfplumber"]
+        if thin:
+            with stage_timer(timings, "pdfplumber"):
+                for i in thin:
+                    # Una página defectuosa no debe dejar sin texto a las siguientes
                     try:
-                        ocr_res = ocr_images([images[idx]])[0] or ""
-                        full_text.append(ocr_res)
+                        plumber_page = doc.plumber.pages[i]
+                        try:
+                            t = plumber_page.extract_text() or ""
+                        finally:
+                            plumber_page.close()  # libera los objetos de layout cacheados
                     except Exception as e:
-                        LOG.error("OCR fallo en página %d: %s", idx + 1, e)
-                else:
-                    full_text.append("")
-
-        # 4) Si quedan imágenes extra (raro), OCR resto
-        if len(images) > len(pages_text):
-            for img in images[len(pages_text) :]:
-                try:
-                    full_text.append(ocr_images([img])[0] or "")
-                except Exception as e:
-                    LOG.error("OCR en página extra: %s", e)
+                        LOG.warning("pdfplumber falló en página %d: %s", i + 1, e)
+                        continue
+                    if t.strip():
+                        pages[i].text, pages[i].engine = t, "pdfplumber"
 
-        # Unimos todo filtrando vacíos
-        return "\n".join(p for p in full_text if p.strip())
+        # 3) OCR para las planificadas así y las que siguen vacías, salvo
+        #    las páginas en blanco; renderizadas desde el documento ya
+        #    abierto y procesadas en paralelo
+        missing = [
+            i for i in indices if not pages[i].text.strip() and pages[i].plan.engine
+        ]
+        if missing:
+            with stage_timer(timings, "ocr"):
+                ocr_pages = self._ocr(doc, missing)
+            for i, page in ocr_pages.items():
+                pages[i].ocr_confidence = page.confidence
+                if page.text.strip():
+                    pages[i].text, pages[i].engine = page.text, "ocr"
+        for page in pages.values():
+            plan = page.plan
+            if not page.text.strip() and plan.reason == "scanned" and plan.chars >= self.min_chars:
+                # Sin OCR útil, la capa de texto fina es mejor que nada
+                page.text, page.engine = doc.page_text(page.index), "pymupdf"
+            plan.used = page.engine
+        return [pages[i] for i in indices]
+
+    def _ocr(self, doc: PDFDocument, indices: List[int]) -> Dict[int, OCRPage]:
+        dpis = {i: self._choose_dpi(doc, i) for i in indices}
+        pages = self.ocr.run(indices, lambda i: self._render(doc, i, dpis[i]))
+
+        # Un único reintento a mayor resolución para las páginas dudosas
+        retry = [
+            i
+            for i, page in pages.items()
+            if page.confidence < self.ocr_min_confidence and dpis[i] < self.ocr_max_dpi
+        ]
+        for i in retry:
+            dpis[i] = min(self.ocr_max_dpi, int(dpis[i] * 1.5))
+        if retry:
+            again = self.ocr.run(retry, lambda i: self._render(doc, i, dpis[i]))
+            for i, page in again.items():
+                if page.confidence > pages[i].confidence:
+                    pages[i] = page
+        return pages
+
+    def _choose_dpi(self, doc: PDFDocument, index: int) -> int:
+        from .utils.preprocess import PROBE_DPI, choose_dpi
+
+        try:
+            probe = doc.render_page(index, dpi=PROBE_DPI)
+        except Exception:
+            return self.ocr_max_dpi
+        width, height = doc.page_size(index)
+        try:
+            return choose_dpi(
+                probe, width, height, min_dpi=self.ocr_min_dpi, max_dpi=self.ocr_max_dpi
+            )
+        finally:
+            probe.close()
+
+    def _render(self, doc: PDFDocument, index: int, dpi: int) -> Optional["Image.Image"]:
+        try:
+            return doc.render_page(index, dpi=dpi)
+        except Exception as e:
+            LOG.warning("PyMuPDF no pudo renderizar la página %d: %s", index + 1, e)
+        images = pdf_to_images(
+            doc.data, dpi=dpi, first_page=index + 1, last_page=index + 1
+        )
+        return images[0] if images else None
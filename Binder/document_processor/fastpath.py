@@ -0,0 +1,144 @@
+# document_processor/fastpath.py
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .cache import ResultCache
+
+WORD_RE = re.compile(r"[^\W\d_]{3,}")
+LABEL_FIELD = "tipo_documento"
+RETRAIN_GROWTH = 0.1  # se reentrena cuando las etiquetas en caché crecen un 10 %
+
+
+def tokenize(text: str, max_chars: int) -> Counter:
+    return Counter(WORD_RE.findall(text[:max_chars].lower()))
+
+
+class LocalClassifier:
+    """
+    Clasificador local de plantillas repetitivas: centroides TF-IDF por
+    `tipo_documento`, entrenados con las etiquetas que el LLM ya devolvió.
+    Solo responde si la similitud coseno con el mejor centroide (penalizada
+    por la fracción de vocabulario desconocido) supera `min_confidence` y
+    aventaja al segundo en `min_margin`; si no, el documento sigue hacia
+    el LLM.
+
+    Se puntúa con un índice invertido término → (clase, peso), por lo que
+    el coste depende solo de las palabras del inicio del documento.
+    """
+
+    def __init__(
+        self,
+        min_confidence: float = 0.8,
+        min_margin: float = 0.1,
+        min_examples: int = 20,
+        max_chars: int = 2000,
+        max_terms: int = 400,
+    ):
+        self.min_confidence = min_confidence
+        self.min_margin = min_margin
+        self.min_examples = min_examples
+        self.max_chars = max_chars
+        self.max_terms = max_terms
+        self.labels: List[str] = []
+        self.idf: Dict[str, float] = {}
+        self.index: Dict[str, List[Tuple[int, float]]] = {}
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.labels)
+
+    @property
+    def params(self) -> str:
+        """Parámetros que cambian el entrenamiento (no los umbrales de `predict`)."""
+        return (
+            f"min_examples={self.min_examples};"
+            f"chars={self.max_chars};terms={self.max_terms}"
+        )
+
+    def to_dict(self) -> Dict:
+        return {"labels": self.labels, "idf": self.idf, "index": self.index}
+
+    def load(self, data: Dict) -> "LocalClassifier":
+        """Restaura un modelo guardado con `to_dict`."""
+        self.labels = list(data["labels"])
+        self.idf = dict(data["idf"])
+        self.index = {
+            term: [tuple(entry) for entry in entries]
+            for term, entries in data["index"].items()
+        }
+        return self
+
+    def _vector(self, counts: Counter) -> Dict[str, float]:
+        vec = {
+            term: (1 + math.log(n)) * self.idf[term]
+            for term, n in counts.items()
+            if term in self.idf
+        }
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {term: w / norm for term, w in vec.items()}
+
+    def fit(self, samples: Iterable[Tuple[str, str]]) -> "LocalClassifier":
+        docs = [(tokenize(text, self.max_chars), label) for text, label in samples]
+        per_label = Counter(label for _, label in docs)
+        docs = [(c, l) for c, l in docs if c and per_label[l] >= self.min_examples]
+        self.labels, self.index = [], {}
+        if len({l for _, l in docs}) < 2:
+            return self  # con una sola clase no hay nada que distinguir
+
+        df: Counter = Counter()
+        for counts, _ in docs:
+            df.update(counts.keys())
+        total = len(docs)
+        self.idf = {t: math.log((1 + total) / (1 + n)) + 1 for t, n in df.items()}
+
+        sums: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for counts, label in docs:
+            for term, w in self._vector(counts).items():
+                sums[label][term] += w
+        self.labels = sorted(sums)
+        index: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for k, label in enumerate(self.labels):
+            top = sorted(sums[label].items(), key=lambda kv: -kv[1])[: self.max_terms]
+            norm = math.sqrt(sum(w * w for _, w in top)) or 1.0
+            for term, w in top:
+                index[term].append((k, w / norm))
+        self.index = dict(index)
+        return self
+
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        """`(tipo_documento, confianza)` si la predicción es segura, si no None."""
+        if not self.trained:
+            return None
+        counts = tokenize(text, self.max_chars)
+        scores = [0.0] * len(self.labels)
+        for term, w in self._vector(counts).items():
+            for k, cw in self.index.get(term, ()):
+                scores[k] += w * cw
+        # Se descuenta la parte del texto con vocabulario nunca visto
+        total = sum(counts.values())
+        known = sum(n for term, n in counts.items() if term in self.idf)
+        coverage = math.sqrt(known / total) if total else 0.0
+        scores = [s * coverage for s in scores]
+        ranked = sorted(range(len(scores)), key=scores.__getitem__, reverse=True)
+        best, second = scores[ranked[0]], scores[ranked[1]]
+        if best < self.min_confidence or best - second < self.min_margin:
+            return None
+        return self.labels[ranked[0]], round(best, 3)
+
+
+def cached_samples(
+    cache: ResultCache, labels_prefix: str, text_prefix: str
+) -> Iterator[Tuple[str, str]]:
+    """Pares (texto, tipo_documento) de la caché, unidos por el SHA-256 del PDF."""
+    texts = {
+        key[len(text_prefix) :]: value.get("text", "")
+        for key, value in cache.items(text_prefix)
+    }
+    for key, labels in cache.items(labels_prefix):
+        label = labels.get(LABEL_FIELD) if isinstance(labels, dict) else None
+        text = texts.get(key[len(labels_prefix) :])
+        if label and text:
+            yield text, str(label)
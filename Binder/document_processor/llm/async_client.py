@@ -0,0 +1,155 @@
+# document_processor/llm/async_client.py
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Protocol, Tuple
+
+from .governor import TokenGovernor, estimate_tokens
+from .retry import CircuitBreaker, next_delay
+
+if TYPE_CHECKING:
+    import openai
+
+
+class AsyncLLMClient(Protocol):
+    async def chat(
+        self, messages: List[Dict], **kwargs
+    ) -> Tuple[str, Dict[str, int]]: ...
+
+
+class RateLimiter:
+    """
+    Doble cubeta de tokens: peticiones por minuto y tokens por minuto.
+    `acquire` espera hasta que ambas tengan saldo; `settle` corrige la
+    reserva con el uso real devuelto por la API.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.rpm = float(requests_per_minute)
+        self.tpm = float(tokens_per_minute)
+        self._requests = self.rpm
+        self._tokens = self.tpm
+        self._updated = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop = None
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int) -> None:
+        tokens = min(float(tokens), self.tpm)
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Las primitivas de asyncio quedan ligadas al bucle que las usa
+            self._loop = loop
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait_req = max(0.0, (1 - self._requests) * 60 / self.rpm)
+                wait_tok = max(0.0, (tokens - self._tokens) * 60 / self.tpm)
+                await asyncio.sleep(max(wait_req, wait_tok))
+
+    def settle(self, reserved: int, used: int) -> None:
+        self._tokens = min(self.tpm, self._tokens + reserved - used)
+
+
+class AsyncOpenAIClient:
+    """
+    Cliente asíncrono de OpenAI: muchas peticiones en vuelo a la vez,
+    limitadas por concurrencia y por presupuestos RPM/TPM. Reintentos y
+    disyuntor con la misma política que `OpenAIClient`.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        max_concurrency: int = 16,
+        requests_per_minute: int = 500,
+        tokens_per_minute: int = 200_000,
+        limiter: Optional[RateLimiter] = None,
+        max_retries: int = 3,
+        retry_delay: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+        governor: Optional[TokenGovernor] = None,
+    ):
+        self.api_key = api_key
+        self._client: Optional["openai.AsyncOpenAI"] = None
+        self.model = model
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.governor = governor  # solo se le notifican los 429
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter or RateLimiter(requests_per_minute, tokens_per_minute)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    @property
+    def client(self) -> "openai.AsyncOpenAI":
+        """SDK de OpenAI, importado en la primera llamada (tarda ~1 s en cargar)."""
+        if self._client is None:
+            import openai
+
+            # Los reintentos los gestiona este cliente, no el SDK
+            self._client = openai.AsyncOpenAI(api_key=self.api_key, max_retries=0)
+        return self._client
+
+    async def chat(
+        self,
+        messages: List[Dict],
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        stats: Optional[Dict[str, int]] = None,
+        response_format: Optional[Dict] = None,
+    ) -> Tuple[str, Dict[str, int]]:
+        # `max_retries` cuenta intentos: con 0 no se llamaría nunca a la API
+        max_retries = max(1, self.max_retries if max_retries is None else max_retries)
+        retry_delay = self.retry_delay if retry_delay is None else retry_delay
+        extra = {"response_format": response_format} if response_format else {}
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        reserved = estimate_tokens(messages)
+        async with self._semaphore:
+            for attempt in range(max_retries):
+                if attempt and stats is not None:
+                    stats["retries"] = stats.get("retries", 0) + 1
+                await self.breaker.abefore_call()
+                await self.limiter.acquire(reserved)
+                try:
+                    resp = await self.client.chat.completions.create(
+                        model=self.model, messages=messages, **extra
+                    )
+                    self.breaker.record_success()
+                    content = resp.choices[0].message.content
+                    usage = resp.usage
+                    tokens_usage = {
+                        "prompt_tokens": usage.prompt_tokens,
+                        "completion_tokens": usage.completion_tokens,
+                        "total_tokens": usage.total_tokens,
+                    }
+                    self.limiter.settle(reserved, usage.total_tokens)
+                    return content, tokens_usage
+                except Exception as e:
+                    self.limiter.settle(reserved, 0)
+                    await asyncio.sleep(
+                        next_delay(
+                            e,
+                            attempt,
+                            max_retries,
+                            retry_delay,
+                            self.breaker,
+                            self.governor,
+                        )
+                    )
@@ -0,0 +1,210 @@
+# document_processor/llm/batch.py
+
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Protocol, Tuple
+
+from .client import LLMClient
+
+if TYPE_CHECKING:
+    import openai
+
+LOG = logging.getLogger(__name__)
+
+ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+@dataclass
+class BatchOutput:
+    custom_id: str
+    content: Optional[str] = None
+    tokens_usage: Optional[Dict[str, int]] = None
+    error: Optional[str] = None
+
+
+class BatchBackend(Protocol):
+    """Destino de un archivo JSONL de peticiones en el formato de la Batch API."""
+
+    def submit(self, path: Path) -> str: ...
+
+    def status(self, job_id: str) -> str: ...
+
+    def results(self, job_id: str) -> Iterator[Dict]: ...
+
+
+def write_requests(path: Path, model: str, requests: List[Tuple[str, Dict]]) -> Path:
+    """Una línea por `(custom_id, body)`; `body` lleva `messages` y opciones."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        for custom_id, body in requests:
+            line = {
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": ENDPOINT,
+                "body": {"model": model, **body},
+            }
+            fh.write(json.dumps(line, ensure_ascii=False) + "\n")
+    return path
+
+
+def write_manifest(requests_path: Path, job_id: str, files: Dict[str, List[str]]) -> Path:
+    """
+    Deja constancia de un trabajo enviado junto a su archivo de peticiones:
+    `{batch_id, input_file, files}`, con `files` = custom_id → [archivo,
+    sha256]. Permite retomar la espera tras un reinicio sin reenviar el lote.
+    """
+    path = Path(requests_path).with_suffix(MANIFEST_SUFFIX)
+    data = {"batch_id": job_id, "input_file": str(requests_path), "files": files}
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+def read_manifest(path: Path) -> Optional[Dict]:
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        LOG.warning("Manifiesto de lote ilegible %s: %s", path, e)
+        return None
+    if not isinstance(data, dict) or "batch_id" not in data:
+        return None
+    return data
+
+
+def discard_job(manifest_path: Path, manifest: Optional[Dict] = None) -> None:
+    """Borra el manifiesto y el archivo de peticiones (lleva el texto completo)."""
+    if manifest and manifest.get("input_file"):
+        Path(manifest["input_file"]).unlink(missing_ok=True)
+    Path(manifest_path).unlink(missing_ok=True)
+
+
+def parse_output(line: Dict) -> BatchOutput:
+    out = BatchOutput(custom_id=str(line.get("custom_id")))
+    response = line.get("response") or {}
+    body = response.get("body") or {}
+    if line.get("error") or response.get("status_code", 200) != 200:
+        detail = line.get("error") or body.get("error") or response.get("status_code")
+        out.error = f"OpenAI rechazó la petición: {detail}"
+        return out
+    try:
+        out.content = body["choices"][0]["message"]["content"]
+        usage = body.get("usage") or {}
+        out.tokens_usage = {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+        }
+    except (KeyError, IndexError, TypeError):
+        out.error = "Respuesta de lote sin contenido"
+    return out
+
+
+def wait_for(
+    backend: BatchBackend, job_id: str, poll_seconds: float, timeout: float = 0
+) -> str:
+    """Consulta el estado hasta que el trabajo termina (o vence `timeout`)."""
+    start = time.monotonic()
+    while True:
+        state = backend.status(job_id)
+        if state in TERMINAL_STATES:
+            return state
+        if timeout and time.monotonic() - start > timeout:
+            return "timeout"
+        LOG.info("Lote %s en estado %s; nueva consulta en %ss", job_id, state, poll_seconds)
+        time.sleep(poll_seconds)
+
+
+class OpenAIBatchBackend:
+    """Batch API de OpenAI: más barata y con más cupo, sin latencia interactiva."""
+
+    def __init__(self, api_key: str, completion_window: str = "24h"):
+        self.api_key = api_key
+        self.completion_window = completion_window
+        self._client: Optional["openai.OpenAI"] = None
+
+    @property
+    def client(self) -> "openai.OpenAI":
+        if self._client is None:
+            import openai
+
+            self._client = openai.OpenAI(api_key=self.api_key)
+        return self._client
+
+    def submit(self, path: Path) -> str:
+        with open(path, "rb") as fh:
+            uploaded = self.client.files.create(file=fh, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    def status(self, job_id: str) -> str:
+        return self.client.batches.retrieve(job_id).status
+
+    def results(self, job_id: str) -> Iterator[Dict]:
+        batch = self.client.batches.retrieve(job_id)
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LocalBatchBackend:
+    """
+    Sustituto local: ejecuta cada petición del archivo con un `LLMClient`
+    (por ejemplo `FakeLLMClient`) y produce la salida en el mismo formato
+    que la Batch API.
+    """
+
+    def __init__(self, client: LLMClient):
+        self.client = client
+        self._jobs: Dict[str, List[Dict]] = {}
+
+    def submit(self, path: Path) -> str:
+        job_id = f"local-{uuid.uuid4().hex[:12]}"
+        outputs = []
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    outputs.append(self._run(json.loads(line)))
+        self._jobs[job_id] = outputs
+        return job_id
+
+    def _run(self, request: Dict) -> Dict:
+        body = dict(request["body"])
+        body.pop("model", None)
+        messages = body.pop("messages")
+        try:
+            content, usage = self.client.chat(messages, **body)
+        except Exception as e:
+            return {"custom_id": request["custom_id"], "response": None, "error": str(e)}
+        return {
+            "custom_id": request["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "choices": [{"message": {"role": "assistant", "content": content}}],
+                    "usage": usage,
+                },
+            },
+            "error": None,
+        }
+
+    def status(self, job_id: str) -> str:
+        return "completed" if job_id in self._jobs else "failed"
+
+    def results(self, job_id: str) -> Iterator[Dict]:
+        return iter(self._jobs.get(job_id, []))
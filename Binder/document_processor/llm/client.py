@@ -1,14 +1,20 @@
 # document_processor/llm/client.py
 
 import time
-from typing import List, Dict, Protocol, Tuple
-import openai
+from typing import TYPE_CHECKING, List, Dict, Optional, Protocol, Tuple
 
+from .errors import (  # reexportados para el resto del paquete
+    BudgetExceededError,
+    CircuitOpenError,
+    LLMAuthError,
+    LLMRequestError,
+    ServiceUnavailableError,
+)
+from .governor import TokenGovernor
+from .retry import CircuitBreaker, next_delay
 
-class ServiceUnavailableError(Exception):
-    """Indica que el servicio de OpenAI no respondió tras agotar reintentos."""
-
-    pass
+if TYPE_CHECKING:
+    import openai
 
 
 class LLMClient(Protocol):
@@ -18,20 +24,63 @@ class LLMClient(Protocol):
 class OpenAIClient:
     """
     Cliente de OpenAI con reintentos. Ahora devuelve (content, tokens_usage).
+    Si se pasa `stats`, acumula en `stats["retries"]` los reintentos hechos;
+    `response_format` activa el modo JSON / JSON schema de la API.
+
+    Solo se reintentan errores transitorios (red, 429, 5xx), respetando
+    `Retry-After` o con backoff exponencial con jitter; los demás lanzan
+    `LLMRequestError` al momento. El `breaker` puede compartirse entre
+    clientes para cortar todas las llamadas durante una caída.
     """
 
-    def __init__(self, api_key: str, model: str):
-        self.client = openai.OpenAI(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        max_retries: int = 3,
+        retry_delay: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+        governor: Optional[TokenGovernor] = None,
+    ):
+        self.api_key = api_key
+        self._client: Optional["openai.OpenAI"] = None
         self.model = model
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.governor = governor  # solo se le notifican los 429
+
+    @property
+    def client(self) -> "openai.OpenAI":
+        """SDK de OpenAI, importado en la primera llamada (tarda ~1 s en cargar)."""
+        if self._client is None:
+            import openai
+
+            # Los reintentos los gestiona este cliente, no el SDK
+            self._client = openai.OpenAI(api_key=self.api_key, max_retries=0)
+        return self._client
 
     def chat(
-        self, messages: List[Dict], max_retries: int = 3, retry_delay: float = 2.0
+        self,
+        messages: List[Dict],
+        max_retries: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        stats: Optional[Dict[str, int]] = None,
+        response_format: Optional[Dict] = None,
     ) -> Tuple[str, Dict[str, int]]:
+        # `max_retries` cuenta intentos: con 0 no se llamaría nunca a la API
+        max_retries = max(1, self.max_retries if max_retries is None else max_retries)
+        retry_delay = self.retry_delay if retry_delay is None else retry_delay
+        extra = {"response_format": response_format} if response_format else {}
         for attempt in range(max_retries):
+            if attempt and stats is not None:
+                stats["retries"] = stats.get("retries", 0) + 1
+            self.breaker.before_call()
             try:
                 resp = self.client.chat.completions.create(
-                    model=self.model, messages=messages
+                    model=self.model, messages=messages, **extra
                 )
+                self.breaker.record_success()
                 content = resp.choices[0].message.content
                 usage = resp.usage
                 tokens_usage = {
@@ -41,7 +90,13 @@ class OpenAIClient:
                 }
                 return content, tokens_usage
             except Exception as e:
-                if attempt < max_retries - 1:
-                    time.sleep(retry_delay * (2**attempt))
-                    continue
-                raise ServiceUnavailableError("OpenAI service unavailable") from e
+                time.sleep(
+                    next_delay(
+                        e,
+                        attempt,
+                        max_retries,
+                        retry_delay,
+                        self.breaker,
+                        self.governor,
+                    )
+                )
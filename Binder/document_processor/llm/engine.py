@@ -1,47 +1,212 @@
 # document_processor/llm/engine.py
 
-import json
-from typing import Dict, Tuple
+from typing import Any, Dict, Generator, List, Optional, Tuple
 from .client import LLMClient
+from .async_client import AsyncLLMClient
+from .governor import TokenGovernor, estimate_tokens
+from .json_repair import parse_json_lenient
+
+# Esquema estricto para el formato de salida por defecto de las instrucciones
+LABELS_SCHEMA = {
+    "name": "clasificacion_documento",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "tipo_documento": {"type": "string"},
+            "justificacion": {"type": "string"},
+        },
+        "required": ["tipo_documento", "justificacion"],
+        "additionalProperties": False,
+    },
+}
+
+# Petición -> respuesta del cliente; el generador termina con (labels, usage)
+Conversation = Generator[List[Dict], Tuple[str, Dict[str, int]], Tuple[Dict, Dict]]
+
+
+def add_usage(total: Dict[str, int], usage: Dict[str, int]) -> Dict[str, int]:
+    for key, value in (usage or {}).items():
+        total[key] = total.get(key, 0) + value
+    return total
 
 
 class LegalDocumentEngine:
     """
     Envuelve instrucciones y devuelve (labels_dict, tokens_usage).
+    Con `async_client` ofrece además `aclassify` para clasificar de forma
+    concurrente.
+
+    Las respuestas se leen de forma tolerante (`parse_json_lenient`); solo
+    si eso falla se pide una corrección enviando únicamente la salida
+    inválida, no las instrucciones ni el documento. El uso de tokens
+    devuelto suma todos los intentos.
+
+    Cada llamada pasa por `governor`, que la contabiliza y aplica los
+    topes de tokens y la concurrencia adaptativa.
     """
 
     MAX_JSON_RETRIES = 2
+    BATCH_INSTRUCTIONS = (
+        "\n\nMODO LOTE: recibirás varios documentos, cada uno precedido por una "
+        "línea '=== DOCUMENTO <id> ==='. Clasifica cada uno por separado según "
+        "las instrucciones anteriores y responde únicamente con un objeto JSON "
+        "cuyas claves sean los <id> y cuyos valores sean el JSON que darías "
+        "para ese documento."
+    )
+    REPAIR_INSTRUCTIONS = (
+        "Convierte el texto del usuario en un único objeto JSON válido con las "
+        "mismas claves y valores. Responde solo con el JSON."
+    )
 
-    def __init__(self, instructions: str, client: LLMClient):
+    def __init__(
+        self,
+        instructions: str,
+        client: LLMClient,
+        async_client: Optional[AsyncLLMClient] = None,
+        json_mode: str = "json_object",
+        governor: Optional[TokenGovernor] = None,
+    ):
+        """`json_mode`: "json_object", "json_schema" (LABELS_SCHEMA) o "" para ninguno."""
         strict = (
             instructions
             + "\n\nIMPORTANTE: responde únicamente con un JSON válido, sin texto adicional."
         )
         self.instructions = strict
         self.client = client
+        self.async_client = async_client
+        self.governor = governor or TokenGovernor()
+        self.chat_kwargs: Dict[str, Any] = {}
+        if json_mode == "json_object":
+            self.chat_kwargs["response_format"] = {"type": "json_object"}
+        elif json_mode == "json_schema":
+            self.chat_kwargs["response_format"] = {
+                "type": "json_schema",
+                "json_schema": LABELS_SCHEMA,
+            }
 
-    def classify(self, text: str) -> Tuple[Dict[str, str], Dict[str, int]]:
-        messages = [
+    def _messages(self, text: str) -> List[Dict]:
+        return [
             {"role": "system", "content": self.instructions},
             {"role": "user", "content": text},
         ]
 
-        raw, usage = self.client.chat(messages)
+    def _batch_messages(self, docs: List[Tuple[str, str]]) -> List[Dict]:
+        body = "\n\n".join(f"=== DOCUMENTO {doc_id} ===\n{text}" for doc_id, text in docs)
+        return [
+            {"role": "system", "content": self.instructions + self.BATCH_INSTRUCTIONS},
+            {"role": "user", "content": body},
+        ]
+
+    @property
+    def _batch_kwargs(self) -> Dict[str, Any]:
+        # El esquema estricto describe un solo documento; el lote usa json_object
+        return {"response_format": {"type": "json_object"}} if self.chat_kwargs else {}
+
+    @staticmethod
+    def _parse_batch(raw: str, ids: List[str]) -> Dict[str, Dict]:
+        parsed = parse_json_lenient(raw) or {}
+        return {i: parsed[i] for i in ids if isinstance(parsed.get(i), dict)}
+
+    def request_body(self, text: str) -> Dict[str, Any]:
+        """Cuerpo de la petición individual, para enviarla por la Batch API."""
+        return {"messages": self._messages(text), **self.chat_kwargs}
+
+    def _repair_messages(self, raw: str) -> List[Dict]:
+        return [
+            {"role": "system", "content": self.REPAIR_INSTRUCTIONS},
+            {"role": "user", "content": raw or ""},
+        ]
+
+    def _chat(
+        self, messages: List[Dict], stats: Dict[str, int], **kwargs
+    ) -> Tuple[str, Dict[str, int]]:
+        ticket = self.governor.acquire(estimate_tokens(messages))
+        usage = None
+        try:
+            reply = self.client.chat(messages, stats=stats, **kwargs)
+            usage = reply[1]
+            return reply
+        finally:
+            self.governor.settle(ticket, usage)
+
+    async def _achat(
+        self, messages: List[Dict], stats: Dict[str, int], **kwargs
+    ) -> Tuple[str, Dict[str, int]]:
+        ticket = await self.governor.aacquire(estimate_tokens(messages))
+        usage = None
+        try:
+            reply = await self.async_client.chat(messages, stats=stats, **kwargs)
+            usage = reply[1]
+            return reply
+        finally:
+            await self.governor.asettle(ticket, usage)
+
+    def _conversation(self, text: str, stats: Dict[str, int]) -> Conversation:
+        """Secuencia de peticiones compartida por `classify` y `aclassify`."""
+        total: Dict[str, int] = {}
+        raw, usage = yield self._messages(text)
+        add_usage(total, usage)
+        labels = parse_json_lenient(raw)
+        for _ in range(self.MAX_JSON_RETRIES):
+            if labels is not None:
+                return labels, total
+            stats["retries"] = stats.get("retries", 0) + 1
+            raw, usage = yield self._repair_messages(raw)
+            add_usage(total, usage)
+            labels = parse_json_lenient(raw)
+        if labels is not None:
+            return labels, total
+        raise ValueError("No se pudo obtener JSON válido tras múltiples intentos.")
+
+    def classify(
+        self, text: str, stats: Optional[Dict[str, int]] = None
+    ) -> Tuple[Dict[str, str], Dict[str, int]]:
+        """`stats["retries"]` acumula reintentos de transporte y de JSON."""
+        stats = {} if stats is None else stats
+        conversation = self._conversation(text, stats)
         try:
-            labels = json.loads(raw)
-            return labels, usage
-        except json.JSONDecodeError:
-            for _ in range(self.MAX_JSON_RETRIES):
-                fix_prompt = (
-                    "La salida anterior no era un JSON válido:\n"
-                    f"```\n{raw}\n```\n"
-                    "Por favor, responde AHORA _solo_ con el JSON válido."
-                )
-                messages.append({"role": "user", "content": fix_prompt})
-                raw, usage = self.client.chat(messages)
-                try:
-                    labels = json.loads(raw)
-                    return labels, usage
-                except json.JSONDecodeError:
-                    continue
-            raise ValueError("No se pudo obtener JSON válido tras múltiples intentos.")
+            messages = next(conversation)
+            while True:
+                reply = self._chat(messages, stats, **self.chat_kwargs)
+                messages = conversation.send(reply)
+        except StopIteration as done:
+            return done.value
+
+    async def aclassify(
+        self, text: str, stats: Optional[Dict[str, int]] = None
+    ) -> Tuple[Dict[str, str], Dict[str, int]]:
+        if self.async_client is None:
+            raise RuntimeError("El motor no tiene un cliente asíncrono configurado.")
+        stats = {} if stats is None else stats
+        conversation = self._conversation(text, stats)
+        try:
+            messages = next(conversation)
+            while True:
+                reply = await self._achat(messages, stats, **self.chat_kwargs)
+                messages = conversation.send(reply)
+        except StopIteration as done:
+            return done.value
+
+    def classify_batch(
+        self, docs: List[Tuple[str, str]], stats: Optional[Dict[str, int]] = None
+    ) -> Tuple[Dict[str, Dict], Dict[str, int]]:
+        """
+        Clasifica varios `(id, texto)` en una sola petición. Devuelve las
+        etiquetas de los ids que vinieron bien formados (los demás faltan,
+        para que el llamador los reintente por separado) y el uso total.
+        """
+        stats = {} if stats is None else stats
+        raw, usage = self._chat(self._batch_messages(docs), stats, **self._batch_kwargs)
+        return self._parse_batch(raw, [i for i, _ in docs]), usage
+
+    async def aclassify_batch(
+        self, docs: List[Tuple[str, str]], stats: Optional[Dict[str, int]] = None
+    ) -> Tuple[Dict[str, Dict], Dict[str, int]]:
+        if self.async_client is None:
+            raise RuntimeError("El motor no tiene un cliente asíncrono configurado.")
+        stats = {} if stats is None else stats
+        raw, usage = await self._achat(
+            self._batch_messages(docs), stats, **self._batch_kwargs
+        )
+        return self._parse_batch(raw, [i for i, _ in docs]), usage
@@ -0,0 +1,31 @@
+# document_processor/llm/errors.py
+
+
+class ServiceUnavailableError(Exception):
+    """Indica que el servicio de OpenAI no respondió tras agotar reintentos."""
+
+    pass
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    """El disyuntor está abierto: la llamada falla sin contactar al servicio."""
+
+    pass
+
+
+class BudgetExceededError(ServiceUnavailableError):
+    """Se alcanzó el tope de tokens de la ejecución: no salen más llamadas."""
+
+    pass
+
+
+class LLMRequestError(Exception):
+    """OpenAI rechazó la petición con un error no transitorio (auth, 4xx)."""
+
+    pass
+
+
+class LLMAuthError(LLMRequestError):
+    """Credenciales o permisos rechazados (401/403)."""
+
+    pass
@@ -0,0 +1,91 @@
+# document_processor/llm/fake.py
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Dict, List, Sequence, Tuple
+
+DEFAULT_LABELS = ("contrato", "escritura pública", "demanda judicial", "sentencia")
+BATCH_MARKER_RE = re.compile(r"^=== DOCUMENTO (\S+) ===\n", re.MULTILINE)
+
+
+def _fake_labels(text: str, labels: Sequence[str]) -> Dict[str, str]:
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return {
+        "tipo_documento": labels[digest[0] % len(labels)],
+        "justificacion": "Clasificación simulada.",
+    }
+
+
+def fake_completion(
+    messages: List[Dict], labels: Sequence[str] = DEFAULT_LABELS
+) -> Tuple[str, Dict[str, int]]:
+    """
+    Respuesta determinista derivada del último mensaje: la misma entrada
+    produce siempre la misma etiqueta y el mismo uso de tokens. Un mensaje
+    en modo lote recibe un objeto con las etiquetas de cada documento,
+    iguales a las que daría la llamada individual.
+    """
+    text = messages[-1].get("content") or ""
+    parts = BATCH_MARKER_RE.split(text)
+    if len(parts) > 1:
+        docs = zip(parts[1::2], parts[2::2])
+        result = {
+            doc_id: _fake_labels(body.rstrip("\n"), labels) for doc_id, body in docs
+        }
+    else:
+        result = _fake_labels(text, labels)
+    content = json.dumps(result, ensure_ascii=False)
+    prompt = sum(len(m.get("content") or "") for m in messages) // 4 + 1
+    completion = len(content) // 4 + 1
+    return content, {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+    }
+
+
+class FakeLLMClient:
+    """
+    Sustituto local de `LLMClient` para pruebas y benchmarks, sin red.
+    """
+
+    def __init__(self, latency: float = 0.0, labels: Sequence[str] = DEFAULT_LABELS):
+        self.latency = latency
+        self.labels = labels
+        self.calls = 0
+
+    def chat(self, messages: List[Dict], **kwargs) -> Tuple[str, Dict[str, int]]:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return fake_completion(messages, self.labels)
+
+
+class FakeAsyncLLMClient:
+    """
+    Sustituto local de `AsyncLLMClient`; registra la concurrencia máxima
+    alcanzada para comprobar los límites.
+    """
+
+    def __init__(self, latency: float = 0.0, labels: Sequence[str] = DEFAULT_LABELS):
+        self.latency = latency
+        self.labels = labels
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def chat(
+        self, messages: List[Dict], **kwargs
+    ) -> Tuple[str, Dict[str, int]]:
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            return fake_completion(messages, self.labels)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,304 @@
+# document_processor/llm/governor.py
+
+import asyncio
+import logging
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .errors import BudgetExceededError
+
+LOG = logging.getLogger(__name__)
+
+WINDOW_SECONDS = 60.0
+MIN_BASELINE = 0.2  # s; por debajo, las variaciones de latencia no indican congestión
+
+
+def estimate_tokens(messages: List[Dict]) -> int:
+    """Estimación barata (~4 caracteres por token) para reservar presupuesto."""
+    chars = sum(len(m.get("content") or "") for m in messages)
+    return chars // 4 + 1
+
+
+@dataclass
+class Ticket:
+    """Llamada admitida: tokens reservados y momento de salida."""
+
+    reserved: int
+    started: float
+    settled: bool = False
+
+
+class TokenLedger:
+    """
+    Uso de tokens de una ejecución, sumado llamada a llamada (también
+    reintentos, reparaciones de JSON y reclasificaciones de lotes), con
+    una ventana deslizante de un minuto y el coste según los precios.
+    """
+
+    def __init__(self, price_input_per_mtok: float = 0.0, price_output_per_mtok: float = 0.0):
+        self.price_input_per_mtok = price_input_per_mtok
+        self.price_output_per_mtok = price_output_per_mtok
+        self.started = time.time()
+        self.usage: Counter = Counter()
+        self.calls = 0
+        self.failed_calls = 0
+        self.rate_limited = 0
+        self.budget_rejections = 0
+        self.throttled_seconds = 0.0
+        self.peak_tokens_per_minute = 0
+        self._window: Deque[Tuple[float, int]] = deque()
+        self._window_tokens = 0
+
+    def add(self, usage: Dict[str, int], now: float) -> None:
+        self.calls += 1
+        self.usage.update(usage)
+        tokens = usage.get("total_tokens", 0)
+        self._window.append((now, tokens))
+        self._window_tokens += tokens
+        self.peak_tokens_per_minute = max(
+            self.peak_tokens_per_minute, self.window_tokens(now)
+        )
+
+    def window_tokens(self, now: float) -> int:
+        while self._window and self._window[0][0] <= now - WINDOW_SECONDS:
+            self._window_tokens -= self._window.popleft()[1]
+        return self._window_tokens
+
+    def window_wait(self, excess: int, now: float) -> Optional[float]:
+        """Segundos hasta que salgan de la ventana `excess` tokens (None si no alcanza)."""
+        freed = 0
+        for t, tokens in self._window:
+            freed += tokens
+            if freed >= excess:
+                return max(0.01, t + WINDOW_SECONDS - now)
+        return None
+
+    @property
+    def total_tokens(self) -> int:
+        return self.usage.get("total_tokens", 0)
+
+    @property
+    def cost(self) -> float:
+        return (
+            self.usage.get("prompt_tokens", 0) * self.price_input_per_mtok
+            + self.usage.get("completion_tokens", 0) * self.price_output_per_mtok
+        ) / 1_000_000
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failed_calls": self.failed_calls,
+            "rate_limited": self.rate_limited,
+            "budget_rejections": self.budget_rejections,
+            "throttled_seconds": round(self.throttled_seconds, 1),
+            "tokens": dict(self.usage),
+            "peak_tokens_per_minute": self.peak_tokens_per_minute,
+            "cost_usd": round(self.cost, 6),
+        }
+
+
+class TokenGovernor:
+    """
+    Controla las llamadas al LLM de una ejecución; lo usa el motor en cada
+    `chat`, síncrono o asíncrono, y los clientes le avisan de los 429:
+      - `run_token_cap`: al alcanzarse, las llamadas nuevas fallan con
+        `BudgetExceededError` (el documento se reintenta en otra ejecución);
+      - `minute_token_cap`: ventana deslizante de un minuto; si una llamada
+        la excedería, espera a que se libere;
+      - con `adaptive`, la concurrencia sigue un AIMD: +1 por cada
+        `limit` llamadas sanas, ×0.5 ante un 429 y ×0.9 si la latencia
+        media supera `latency_tolerance` veces la mínima observada.
+    `acquire`/`settle` envuelven cada llamada; `aacquire`/`asettle` son
+    sus equivalentes asíncronos.
+    """
+
+    def __init__(
+        self,
+        run_token_cap: int = 0,
+        minute_token_cap: int = 0,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        adaptive: bool = False,
+        latency_tolerance: float = 2.0,
+        price_input_per_mtok: float = 0.0,
+        price_output_per_mtok: float = 0.0,
+    ):
+        self.run_token_cap = run_token_cap
+        self.minute_token_cap = minute_token_cap
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.adaptive = adaptive
+        self.latency_tolerance = latency_tolerance
+        self.ledger = TokenLedger(price_input_per_mtok, price_output_per_mtok)
+        self.limit = self.max_concurrency
+        self.lowest_limit = self.limit
+        self.in_flight = 0
+        self._reserved = 0
+        self._latency: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._credit = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        self._async_cond: Optional[asyncio.Condition] = None
+        self._loop = None
+
+    def start_run(self) -> None:
+        """Reinicia el libro de tokens; la concurrencia aprendida se conserva."""
+        with self._cond:
+            self.ledger = TokenLedger(
+                self.ledger.price_input_per_mtok, self.ledger.price_output_per_mtok
+            )
+            self.lowest_limit = self.limit
+
+    def summary(self) -> Dict[str, Any]:
+        with self._cond:
+            data = self.ledger.summary()
+            data["run_token_cap"] = self.run_token_cap
+            data["minute_token_cap"] = self.minute_token_cap
+            data["concurrency"] = {
+                "final": self.limit,
+                "lowest": self.lowest_limit,
+                "max": self.max_concurrency,
+            }
+            return data
+
+    # --- Admisión ----------------------------------------------------------
+
+    def _admit(self, reserved: int) -> Optional[float]:
+        """0 si la llamada sale; si no, segundos de espera (None = hasta un `settle`)."""
+        if self.run_token_cap and self.ledger.total_tokens + self._reserved >= self.run_token_cap:
+            self.ledger.budget_rejections += 1
+            raise BudgetExceededError(
+                f"Presupuesto de tokens de la ejecución agotado ({self.run_token_cap})"
+            )
+        if self.in_flight >= self.limit:
+            return None
+        now = time.monotonic()
+        if self.minute_token_cap:
+            used = self.ledger.window_tokens(now) + self._reserved
+            excess = used + min(reserved, self.minute_token_cap) - self.minute_token_cap
+            if excess > 0 and used:
+                return self.ledger.window_wait(excess, now)
+        self.in_flight += 1
+        self._reserved += reserved
+        return 0.0
+
+    def acquire(self, reserved: int) -> Ticket:
+        with self._cond:
+            while True:
+                wait = self._admit(reserved)
+                if wait == 0:
+                    return Ticket(reserved=reserved, started=time.monotonic())
+                start = time.monotonic()
+                self._cond.wait(timeout=wait)
+                self.ledger.throttled_seconds += time.monotonic() - start
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Las primitivas de asyncio quedan ligadas al bucle que las usa
+            self._loop = loop
+            self._async_cond = asyncio.Condition()
+        return self._async_cond
+
+    async def aacquire(self, reserved: int) -> Ticket:
+        cond = self._condition()
+        async with cond:
+            while True:
+                with self._cond:
+                    wait = self._admit(reserved)
+                if wait == 0:
+                    return Ticket(reserved=reserved, started=time.monotonic())
+                start = time.monotonic()
+                try:
+                    await asyncio.wait_for(cond.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                with self._cond:
+                    self.ledger.throttled_seconds += time.monotonic() - start
+
+    # --- Liquidación -------------------------------------------------------
+
+    def settle(self, ticket: Ticket, usage: Optional[Dict[str, int]] = None) -> None:
+        """Registra el uso de la llamada (None si falló) y libera su plaza."""
+        with self._cond:
+            if ticket.settled:
+                return
+            ticket.settled = True
+            now = time.monotonic()
+            self.in_flight -= 1
+            self._reserved -= ticket.reserved
+            if usage is not None:
+                self.ledger.add(usage, now)
+                self._observe_latency(now - ticket.started, now)
+            else:
+                self.ledger.failed_calls += 1
+            self._cond.notify_all()
+
+    def admit_batch(self, estimates: List[int]) -> int:
+        """
+        Cuántas peticiones de un lote (en orden, con sus tokens estimados)
+        caben en `run_token_cap`; las demás cuentan como rechazadas.
+        """
+        with self._cond:
+            if not self.run_token_cap:
+                return len(estimates)
+            used = self.ledger.total_tokens + self._reserved
+            admitted = 0
+            for tokens in estimates:
+                if used + tokens > self.run_token_cap:
+                    break
+                used += tokens
+                admitted += 1
+            self.ledger.budget_rejections += len(estimates) - admitted
+            return admitted
+
+    def record(self, usage: Dict[str, int]) -> None:
+        """Suma uso obtenido fuera de `acquire` (p. ej. resultados de la Batch API)."""
+        with self._cond:
+            self.ledger.add(usage, time.monotonic())
+
+    async def asettle(self, ticket: Ticket, usage: Optional[Dict[str, int]] = None) -> None:
+        self.settle(ticket, usage)
+        cond = self._condition()
+        async with cond:
+            cond.notify_all()
+
+    # --- Concurrencia adaptativa (AIMD) ------------------------------------
+
+    def record_rate_limited(self) -> None:
+        """Un intento recibió 429: se reduce la concurrencia a la mitad."""
+        with self._cond:
+            self.ledger.rate_limited += 1
+            self._decrease(0.5, time.monotonic(), "429")
+
+    def _observe_latency(self, latency: float, now: float) -> None:
+        if not self.adaptive:
+            return
+        self._latency = latency if self._latency is None else 0.8 * self._latency + 0.2 * latency
+        # La referencia sube despacio para seguir cambios del servicio
+        self._baseline = (
+            latency if self._baseline is None else min(latency, self._baseline * 1.01)
+        )
+        if self._latency > self.latency_tolerance * max(self._baseline, MIN_BASELINE):
+            self._decrease(0.9, now, f"latencia {self._latency:.1f}s")
+            return
+        self._credit += 1 / self.limit
+        if self._credit >= 1 and self.limit < self.max_concurrency:
+            self._credit = 0.0
+            self.limit += 1
+
+    def _decrease(self, factor: float, now: float, reason: str) -> None:
+        # Una sola reducción por episodio: las llamadas en vuelo traen la misma señal
+        if not self.adaptive or now - self._last_decrease < max(1.0, self._latency or 0):
+            return
+        self._last_decrease = now
+        self._credit = 0.0
+        limit = max(self.min_concurrency, int(self.limit * factor))
+        if limit < self.limit:
+            LOG.info("Concurrencia del LLM %d → %d (%s)", self.limit, limit, reason)
+            self.limit = limit
+            self.lowest_limit = min(self.lowest_limit, limit)
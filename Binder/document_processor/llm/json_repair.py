@@ -0,0 +1,61 @@
+# document_processor/llm/json_repair.py
+
+import json
+import re
+from typing import Any, Dict, Optional
+
+_FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?(.*?)\n?\s*```\s*$", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def _first_object(text: str) -> Optional[str]:
+    """Primer objeto {...} balanceado, respetando llaves dentro de cadenas."""
+    start = text.find("{")
+    while start != -1:
+        depth, in_str, escaped = 0, False, False
+        for i in range(start, len(text)):
+            ch = text[i]
+            if in_str:
+                if escaped:
+                    escaped = False
+                elif ch == "\\":
+                    escaped = True
+                elif ch == '"':
+                    in_str = False
+            elif ch == '"':
+                in_str = True
+            elif ch == "{":
+                depth += 1
+            elif ch == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start : i + 1]
+        start = text.find("{", start + 1)
+    return None
+
+
+def parse_json_lenient(raw: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Intenta leer un objeto JSON de la respuesta del modelo sin volver a
+    llamarlo: quita cercos de código, extrae el primer objeto y elimina
+    comas finales. Devuelve None si no hay forma de obtener un dict.
+    """
+    if not raw:
+        return None
+    text = raw.strip()
+    fenced = _FENCE_RE.match(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    candidates = [text]
+    obj = _first_object(text)
+    if obj is not None and obj != text:
+        candidates.append(obj)
+    for candidate in candidates:
+        for attempt in (candidate, _TRAILING_COMMA_RE.sub(r"\1", candidate)):
+            try:
+                value = json.loads(attempt)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(value, dict):
+                return value
+    return None
@@ -0,0 +1,204 @@
+# document_processor/llm/retry.py
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from .errors import (
+    CircuitOpenError,
+    LLMAuthError,
+    LLMRequestError,
+    ServiceUnavailableError,
+)
+
+if TYPE_CHECKING:
+    from .governor import TokenGovernor
+
+LOG = logging.getLogger(__name__)
+
+# Estados HTTP transitorios: vale la pena reintentar
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+MAX_RETRY_AFTER = 120.0  # segundos; un Retry-After mayor se recorta
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Red, timeouts, 429 y 5xx se reintentan; auth, 4xx y errores propios no."""
+    import openai  # ya cargado por el cliente que lanzó `exc`
+
+    if isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code in RETRYABLE_STATUS or exc.status_code >= 500
+    return False
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    import openai
+
+    return isinstance(exc, openai.APIStatusError) and exc.status_code == 429
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Segundos indicados por `retry-after-ms` / `Retry-After`, si vienen."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return min(MAX_RETRY_AFTER, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None  # cabecera mal formada: se usa el backoff
+        if date is None:
+            return None
+        seconds = date.timestamp() - time.time()
+    return max(0.0, min(MAX_RETRY_AFTER, seconds))
+
+
+def backoff_delay(attempt: int, base: float, cap: float = 60.0) -> float:
+    """Backoff exponencial con jitter completo: uniforme en [0, base·2^attempt]."""
+    return random.uniform(0, min(cap, base * (2**attempt)))
+
+
+class CircuitBreaker:
+    """
+    Disyuntor compartido por todas las llamadas al LLM. Tras
+    `failure_threshold` fallos transitorios seguidos se abre durante
+    `reset_timeout` segundos (o lo que pida un Retry-After mayor); luego
+    deja pasar una única llamada de prueba y se cierra si tiene éxito.
+
+    Con el circuito abierto, `mode="fail"` hace fallar al instante las
+    llamadas (`CircuitOpenError`) y `mode="pause"` las detiene hasta la
+    siguiente prueba.
+    """
+
+    def __init__(
+        self, failure_threshold: int = 5, reset_timeout: float = 30.0, mode: str = "fail"
+    ):
+        if mode not in ("fail", "pause"):
+            raise ValueError(f"Modo de disyuntor desconocido: {mode}")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.mode = mode
+        self.failures = 0
+        self.opened = 0  # veces que se abrió en la ejecución
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._open_until > 0
+
+    def _wait_time(self) -> float:
+        """0 si la llamada puede salir; si no, segundos hasta reintentar."""
+        with self._lock:
+            if not self._open_until:
+                return 0.0
+            remaining = self._open_until - time.monotonic()
+            if remaining > 0:
+                return remaining
+            if self._probing:
+                return min(1.0, self.reset_timeout)
+            self._probing = True
+            return 0.0
+
+    def _blocked(self, wait: float) -> None:
+        if self.mode == "fail":
+            raise CircuitOpenError(
+                f"Circuito del LLM abierto; próximo intento en {wait:.0f}s"
+            )
+
+    def before_call(self) -> None:
+        while True:
+            wait = self._wait_time()
+            if not wait:
+                return
+            self._blocked(wait)
+            time.sleep(wait)
+
+    async def abefore_call(self) -> None:
+        while True:
+            wait = self._wait_time()
+            if not wait:
+                return
+            self._blocked(wait)
+            await asyncio.sleep(wait)
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._open_until:
+                LOG.info("Circuito del LLM cerrado: el servicio respondió")
+            self.failures = 0
+            self._open_until = 0.0
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """La llamada de prueba no llegó al servicio: otra podrá probar."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self, retry_after_s: Optional[float] = None) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if not self._open_until or self._probing:
+                    self.opened += 1
+                    LOG.warning(
+                        "Circuito del LLM abierto tras %d fallos seguidos", self.failures
+                    )
+                delay = max(self.reset_timeout, retry_after_s or 0.0)
+                self._open_until = time.monotonic() + delay
+                self._probing = False
+
+
+def next_delay(
+    exc: BaseException,
+    attempt: int,
+    max_retries: int,
+    base_delay: float,
+    breaker: Optional[CircuitBreaker] = None,
+    governor: Optional["TokenGovernor"] = None,
+) -> float:
+    """
+    Decide qué hacer tras un intento fallido: devuelve los segundos a
+    esperar antes de reintentar, o lanza `LLMRequestError` / `LLMAuthError`
+    (no transitorio) o `ServiceUnavailableError` (reintentos agotados).
+    Los 429 se notifican al `governor` para que reduzca la concurrencia.
+    Las excepciones que no son de la API (errores propios) se relanzan tal cual.
+    """
+    import openai
+
+    if not isinstance(exc, openai.APIError):
+        if breaker is not None:
+            breaker.release_probe()
+        raise exc
+    if governor is not None and is_rate_limited(exc):
+        governor.record_rate_limited()
+    if not is_retryable(exc):
+        if breaker is not None:
+            breaker.record_success()  # el servicio responde; el problema es la petición
+        if isinstance(exc, (openai.AuthenticationError, openai.PermissionDeniedError)):
+            raise LLMAuthError(f"OpenAI rechazó las credenciales: {exc}") from exc
+        raise LLMRequestError(f"OpenAI rechazó la petición: {exc}") from exc
+    wait = retry_after(exc)
+    if breaker is not None:
+        breaker.record_failure(wait)
+    if attempt >= max_retries - 1:
+        raise ServiceUnavailableError("OpenAI service unavailable") from exc
+    return wait if wait is not None else backoff_delay(attempt, base_delay)
@@ -0,0 +1,61 @@
+# document_processor/llm/tokens.py
+
+from typing import Any, Optional
+
+# Promedio aproximado para texto en español con los tokenizadores de OpenAI
+CHARS_PER_TOKEN = 4
+
+
+class TokenCounter:
+    """
+    Cuenta y recorta texto en tokens. Usa tiktoken para `model` si está
+    disponible; si no, una heurística de ~CHARS_PER_TOKEN caracteres.
+    La codificación se carga en el primer conteo, no al construirlo.
+    """
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model
+        self._encoding: Any = False  # False = aún no cargada
+
+    @property
+    def encoding(self) -> Any:
+        if self._encoding is False:
+            self._encoding = None
+            try:  # opcional: conteo exacto si tiktoken está instalado
+                import tiktoken
+            except ImportError:  # pragma: no cover - depende del entorno
+                return None
+            try:
+                self._encoding = tiktoken.encoding_for_model(self.model or "")
+            except KeyError:
+                self._encoding = tiktoken.get_encoding("o200k_base")
+        return self._encoding
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return len(text) // CHARS_PER_TOKEN + 1
+
+    def head(self, text: str, tokens: int) -> str:
+        """Los primeros `tokens` tokens de `text`."""
+        if tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            ids = self.encoding.encode(text, disallowed_special=())
+            return text if len(ids) <= tokens else self.encoding.decode(ids[:tokens])
+        return text[: tokens * CHARS_PER_TOKEN]
+
+    def tail(self, text: str, tokens: int) -> str:
+        """Los últimos `tokens` tokens de `text`."""
+        if tokens <= 0:
+            return ""
+        if self.encoding is not None:
+            ids = self.encoding.encode(text, disallowed_special=())
+            return text if len(ids) <= tokens else self.encoding.decode(ids[-tokens:])
+        return text[-tokens * CHARS_PER_TOKEN :]
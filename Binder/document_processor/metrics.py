@@ -0,0 +1,252 @@
+# document_processor/metrics.py
+
+import json
+import os
+import random
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+# Límites (segundos) de los histogramas de duración por etapa
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RECENT_WINDOW = 60.0  # segundos del throughput reciente en modo vigilancia
+RESERVOIR_SIZE = 1024  # muestras por histograma para calcular p50/p95
+
+
+@contextmanager
+def stage_timer(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    """Acumula en `timings[stage]` los milisegundos del bloque."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        timings[stage] = round(timings.get(stage, 0.0) + elapsed, 1)
+
+
+class Histogram:
+    """
+    Conteos por cubeta más una muestra de tamaño fijo (muestreo de
+    reservorio) para los percentiles: exactos hasta `reservoir`
+    observaciones y estimados después, con memoria acotada en las sesiones
+    largas de vigilancia y servicio.
+    """
+
+    def __init__(self, buckets=DURATION_BUCKETS, reservoir: int = RESERVOIR_SIZE):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.reservoir = reservoir
+        self.sample: List[float] = []
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+        if len(self.sample) < self.reservoir:
+            self.sample.append(value)
+        else:
+            # Cada observación acaba en la muestra con probabilidad reservoir/count
+            slot = random.randrange(self.count)
+            if slot < self.reservoir:
+                self.sample[slot] = value
+
+    def quantile(self, q: float) -> float:
+        if not self.sample:
+            return 0.0
+        ordered = sorted(self.sample)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "p50": round(self.quantile(0.50), 4),
+            "p95": round(self.quantile(0.95), 4),
+            "max": round(self.maximum, 4),
+        }
+
+
+class RunMetrics:
+    """
+    Agregados de una ejecución: histogramas por etapa, throughput, conteo
+    de páginas por motor, errores por código, reintentos y tokens. Se
+    exporta como textfile de Prometheus (`.prom`) o resumen JSON. En modo
+    vigilancia añade la cola por etapa, el throughput del último minuto y
+    la latencia desde que llega un PDF hasta que se emite su resultado.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.finished: Optional[float] = None
+        self.stages: Dict[str, Histogram] = {}
+        self.documents: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.pages: Counter = Counter()
+        self.tokens: Counter = Counter()
+        self.classified_by: Counter = Counter()
+        self.llm_retries = 0
+        self.circuit_opens = 0
+        # Resumen del `TokenGovernor`: llamadas, tokens, coste y concurrencia
+        self.llm_cost: Dict[str, Any] = {}
+        # Solo en modo vigilancia: archivos por etapa y llegada → resultado
+        self.queue: Optional[Dict[str, int]] = None
+        self.ingest = Histogram()
+        self._recent: Deque[float] = deque()
+
+    def observe(self, record: Dict[str, Any]) -> None:
+        meta = record["metadata"]
+        status = record["classification"]["status"]
+        self.documents[status["state"]] += 1
+        if status["error_code"]:
+            self.errors[status["error_code"]] += 1
+        self._observe_stage("total", meta["processing_time_ms"])
+        for stage, ms in meta.get("timings_ms", {}).items():
+            self._observe_stage(stage, ms)
+        # Un texto de la caché no pasó por ningún motor en esta ejecución
+        if meta.get("cache", {}).get("text") != "hit":
+            self.pages.update(meta.get("pages_by_engine", {}))
+        self.llm_retries += meta.get("llm_retries", 0)
+        if meta.get("classified_by"):
+            self.classified_by[meta["classified_by"]] += 1
+        self.tokens.update(record["classification"].get("tokens_usage") or {})
+        if self.queue is not None:
+            self._recent.append(time.monotonic())
+
+    def observe_ingest(self, seconds: float) -> None:
+        """Segundos entre la llegada del PDF al directorio y su resultado."""
+        self.ingest.observe(seconds)
+
+    @property
+    def recent_documents(self) -> int:
+        """Documentos terminados en los últimos RECENT_WINDOW segundos."""
+        limit = time.monotonic() - RECENT_WINDOW
+        while self._recent and self._recent[0] < limit:
+            self._recent.popleft()
+        return len(self._recent)
+
+    def _observe_stage(self, stage: str, ms: float) -> None:
+        self.stages.setdefault(stage, Histogram()).observe(ms / 1000)
+
+    def finish(self) -> None:
+        self.finished = time.time()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def throughput(self) -> float:
+        total = sum(self.documents.values())
+        return total / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "run_seconds": round(self.elapsed, 3),
+            "documents": dict(self.documents),
+            "docs_per_second": round(self.throughput, 3),
+            "errors": dict(self.errors),
+            "pages_by_engine": dict(self.pages),
+            "llm_retries": self.llm_retries,
+            "llm_circuit_opens": self.circuit_opens,
+            "tokens": dict(self.tokens),
+            "classified_by": dict(self.classified_by),
+            "llm_cost": self.llm_cost,
+            "stages_seconds": {k: h.summary() for k, h in sorted(self.stages.items())},
+        }
+        if self.queue is not None:
+            data["queue"] = dict(self.queue)
+            data["docs_last_minute"] = self.recent_documents
+            data["ingest_latency_seconds"] = self.ingest.summary()
+        return data
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# TYPE binder_run_seconds gauge",
+            f"binder_run_seconds {self.elapsed:.3f}",
+            "# TYPE binder_docs_per_second gauge",
+            f"binder_docs_per_second {self.throughput:.3f}",
+            "# TYPE binder_documents_total counter",
+        ]
+        lines += [
+            f'binder_documents_total{{state="{k}"}} {v}'
+            for k, v in sorted(self.documents.items())
+        ]
+        lines.append("# TYPE binder_errors_total counter")
+        lines += [
+            f'binder_errors_total{{code="{k}"}} {v}' for k, v in sorted(self.errors.items())
+        ]
+        lines.append("# TYPE binder_pages_total counter")
+        lines += [
+            f'binder_pages_total{{engine="{k}"}} {v}' for k, v in sorted(self.pages.items())
+        ]
+        lines.append("# TYPE binder_llm_retries_total counter")
+        lines.append(f"binder_llm_retries_total {self.llm_retries}")
+        lines.append("# TYPE binder_llm_circuit_opens_total counter")
+        lines.append(f"binder_llm_circuit_opens_total {self.circuit_opens}")
+        lines.append("# TYPE binder_tokens_total counter")
+        lines += [
+            f'binder_tokens_total{{kind="{k}"}} {v}' for k, v in sorted(self.tokens.items())
+        ]
+        if self.llm_cost:
+            lines.append("# TYPE binder_llm_calls_total counter")
+            lines.append(f"binder_llm_calls_total {self.llm_cost['calls']}")
+            lines.append("# TYPE binder_llm_rate_limited_total counter")
+            lines.append(f"binder_llm_rate_limited_total {self.llm_cost['rate_limited']}")
+            lines.append("# TYPE binder_llm_cost_usd gauge")
+            lines.append(f"binder_llm_cost_usd {self.llm_cost['cost_usd']}")
+            lines.append("# TYPE binder_llm_concurrency_limit gauge")
+            lines.append(
+                f"binder_llm_concurrency_limit {self.llm_cost['concurrency']['final']}"
+            )
+        lines.append("# TYPE binder_classified_total counter")
+        lines += [
+            f'binder_classified_total{{source="{k}"}} {v}'
+            for k, v in sorted(self.classified_by.items())
+        ]
+        if self.queue is not None:
+            lines.append("# TYPE binder_queue_depth gauge")
+            lines += [
+                f'binder_queue_depth{{stage="{k}"}} {v}' for k, v in sorted(self.queue.items())
+            ]
+            lines.append("# TYPE binder_docs_last_minute gauge")
+            lines.append(f"binder_docs_last_minute {self.recent_documents}")
+            lines.append("# TYPE binder_ingest_latency_seconds histogram")
+            lines += self._histogram_lines("binder_ingest_latency_seconds", "", self.ingest)
+        lines.append("# TYPE binder_stage_duration_seconds histogram")
+        for stage, hist in sorted(self.stages.items()):
+            lines += self._histogram_lines(
+                "binder_stage_duration_seconds", f'stage="{stage}",', hist
+            )
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram_lines(name: str, labels: str, hist: Histogram) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(hist.buckets, hist.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {hist.count}')
+        plain = f"{{{labels.rstrip(',')}}}" if labels else ""
+        lines.append(f"{name}_sum{plain} {hist.total:.4f}")
+        lines.append(f"{name}_count{plain} {hist.count}")
+        return lines
+
+    def write(self, path: Path) -> None:
+        """Escribe de forma atómica; `.prom` → Prometheus, otro sufijo → JSON."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.suffix == ".prom":
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(content, encoding="utf-8")
+        os.replace(tmp, path)
@@ -0,0 +1,136 @@
+# document_processor/normalize.py
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .llm.tokens import TokenCounter
+
+# Numeración de página: "3", "- 3 -", "Página 3", "Pág. 3 de 10", "3/10"
+PAGE_NUMBER_RE = re.compile(
+    r"^[-–—\s]*(p[aá]g(ina)?\.?\s*)?\d{1,4}(\s*(de|/)\s*\d{1,4})?[-–—\s]*$",
+    re.IGNORECASE,
+)
+SPACES_RE = re.compile(r"[ \t\u00a0\u200b]+")
+DIGITS_RE = re.compile(r"\d+")
+# Pies con numeración embebida ("Contrato 12/2023 - Hoja 3"): se comparan sin dígitos
+PAGE_WORD_RE = re.compile(r"\b(p[aá]g(ina)?|hoja|folio|page)\b", re.IGNORECASE)
+
+EDGE_LINES = 5  # líneas al inicio y al final de cada página candidatas a membrete/pie
+
+
+@dataclass
+class Normalization:
+    pages: List[str]
+    chars_before: int = 0
+    chars_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    # Líneas eliminadas por motivo
+    removed: Dict[str, int] = field(default_factory=dict)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "chars_before": self.chars_before,
+            "chars_after": self.chars_after,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "removed_lines": self.removed,
+        }
+
+
+def _is_noise(line: str) -> bool:
+    """Restos de OCR: líneas con muy pocos caracteres alfanuméricos."""
+    alnum = sum(c.isalnum() for c in line)
+    return alnum == 0 or (alnum / len(line) < 0.5 and alnum < 4)
+
+
+class TextNormalizer:
+    """
+    Limpia el texto por página antes de enviarlo al LLM:
+      - membretes y pies repetidos (se conserva su primera aparición),
+      - números de página (solo en la primera y la última línea),
+      - líneas de ruido de OCR,
+      - espacios y líneas en blanco redundantes.
+    Una línea de borde se considera repetida si (ignorando mayúsculas, y
+    dígitos en pies de página numerados) aparece en al menos
+    `repeat_ratio` de las páginas.
+    """
+
+    def __init__(
+        self,
+        repeat_ratio: float = 0.5,
+        counter: Optional[TokenCounter] = None,
+    ):
+        self.repeat_ratio = repeat_ratio
+        self.counter = counter or TokenCounter()
+
+    @staticmethod
+    def _key(line: str) -> str:
+        key = line.lower()
+        return DIGITS_RE.sub("#", key) if PAGE_WORD_RE.search(key) else key
+
+    def _repeated(self, pages: List[List[str]]) -> set:
+        with_text = [p for p in pages if p]
+        if len(with_text) < 2:
+            return set()
+        seen: Counter = Counter()
+        for lines in with_text:
+            edges = lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+            seen.update({self._key(line) for line in edges})
+        threshold = max(2, self.repeat_ratio * len(with_text))
+        return {key for key, n in seen.items() if n >= threshold}
+
+    def normalize(self, pages: List[str]) -> Normalization:
+        before = "\n".join(p for p in pages if p.strip())
+        removed: Counter = Counter()
+
+        split: List[List[str]] = []
+        for page in pages:
+            raw_lines = [SPACES_RE.sub(" ", raw).strip() for raw in page.splitlines()]
+            content = [i for i, line in enumerate(raw_lines) if line]
+            # La numeración solo se busca en la primera y la última línea: un
+            # número suelto en el cuerpo puede ser un año, un importe o una cláusula
+            edges = {content[0], content[-1]} if content else set()
+            lines = []
+            for i, line in enumerate(raw_lines):
+                if not line:
+                    lines.append("")
+                elif i in edges and PAGE_NUMBER_RE.match(line):
+                    removed["page_numbers"] += 1
+                elif _is_noise(line):
+                    removed["noise"] += 1
+                else:
+                    lines.append(line)
+            split.append(lines if any(lines) else [])
+
+        repeated = self._repeated([[l for l in lines if l] for lines in split])
+        kept_once: set = set()
+        cleaned: List[str] = []
+        for lines in split:
+            content = [i for i, line in enumerate(lines) if line]
+            edges = set(content[:EDGE_LINES] + content[-EDGE_LINES:])
+            out: List[str] = []
+            for i, line in enumerate(lines):
+                key = self._key(line) if line else ""
+                if i in edges and key in repeated:
+                    if key in kept_once:
+                        removed["repeated"] += 1
+                        continue
+                    kept_once.add(key)
+                # Colapsa líneas en blanco consecutivas
+                if not line and (not out or not out[-1]):
+                    continue
+                out.append(line)
+            cleaned.append("\n".join(out).strip())
+
+        after = "\n".join(p for p in cleaned if p)
+        return Normalization(
+            pages=cleaned,
+            chars_before=len(before),
+            chars_after=len(after),
+            tokens_before=self.counter.count(before),
+            tokens_after=self.counter.count(after),
+            removed=dict(removed),
+        )
@@ -0,0 +1,123 @@
+# document_processor/output.py
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Errores transitorios o de configuración: el archivo no se da por
+# terminado y se reintenta al relanzar el pipeline.
+RETRYABLE_ERROR_CODES = {
+    "LLM_UNAVAILABLE",
+    "LLM_AUTH_FAILED",
+    "LLM_BUDGET_EXCEEDED",
+    "TIMEOUT",
+    "WORKER_CRASHED",
+}
+
+
+class JsonPrinter:
+    @staticmethod
+    def print(obj: Dict[str, Any], pretty: bool = False):
+        text = (
+            json.dumps(obj, ensure_ascii=False, indent=2)
+            if pretty
+            else json.dumps(obj, ensure_ascii=False)
+        )
+        print(text)
+
+
+class StdoutSink:
+    """Salida clásica: JSON por stdout con una línea en blanco entre archivos."""
+
+    def __init__(self, pretty: bool = False):
+        self.pretty = pretty
+
+    def write(self, record: Dict[str, Any]) -> None:
+        JsonPrinter.print(record, pretty=self.pretty)
+        print()  # línea en blanco entre archivos
+
+    def close(self) -> None:
+        pass
+
+
+class NdjsonSink:
+    """
+    Agrega un registro JSON compacto por línea y vacía el buffer en cada
+    escritura, de modo que un corte solo pierde el documento en curso.
+    """
+
+    def __init__(self, path: Path, fsync: bool = False):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        if self.fsync:
+            os.fsync(self._fh.fileno())
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class Checkpoint:
+    """
+    Manifiesto de archivos ya terminados (uno por línea). La clave incluye
+    tamaño y fecha de modificación, así un PDF reemplazado se reprocesa.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._done: Set[str] = set()
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as fh:
+                self._done = {line.rstrip("\n") for line in fh if line.strip()}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(self.path, "a", encoding="utf-8")
+
+    @staticmethod
+    def signature(pdf: Path) -> Optional[Tuple[int, int]]:
+        """(tamaño, mtime en ns) del archivo; None si ya no existe."""
+        try:
+            st = pdf.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    @staticmethod
+    def key(pdf: Path, signature: Tuple[int, int]) -> str:
+        size, mtime_ns = signature
+        return f"{pdf.name}\t{size}\t{mtime_ns}"
+
+    def is_done(self, pdf: Path, signature: Tuple[int, int]) -> bool:
+        return self.key(pdf, signature) in self._done
+
+    def mark(self, pdf: Path, signature: Tuple[int, int]) -> None:
+        """Marca con la firma que tenía el archivo al encolarse, no la actual."""
+        key = self.key(pdf, signature)
+        if key in self._done:
+            return
+        self._done.add(key)
+        self._fh.write(key + "\n")
+        self._fh.flush()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class OutputSinks:
+    """Reparte cada registro entre varias salidas."""
+
+    def __init__(self, sinks: List):
+        self.sinks = sinks
+
+    def write(self, record: Dict[str, Any]) -> None:
+        for sink in self.sinks:
+            sink.write(record)
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
@@ -1,78 +1,246 @@
 # document_processor/pipeline.py
 
+import asyncio
+import itertools
 import json
+import logging
+import multiprocessing
+from multiprocessing.util import Finalize
+import os
+import signal
+import threading
 import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 from collections import OrderedDict
 from datetime import datetime
 
-from PyPDF2 import PdfReader
 from .config import Config
+from .cache import ResultCache, sha256_file
+from .metrics import RunMetrics
+from .output import (
+    RETRYABLE_ERROR_CODES,
+    Checkpoint,
+    JsonPrinter,
+    NdjsonSink,
+    OutputSinks,
+    StdoutSink,
+)
 from .analyzer import PDFAnalyzer, AnalysisResult
 from .classifier import DocumentClassifier, ClassificationResult
-from .utils.pdf import read_pdf_bytes, count_pages
+from .llm.async_client import AsyncLLMClient
+from .llm.batch import BatchBackend, LocalBatchBackend, OpenAIBatchBackend
+from .llm.client import LLMClient
+from .llm.governor import TokenGovernor
+from .llm.retry import CircuitBreaker
+from .watcher import DirectoryWatcher
 
 
-class JsonPrinter:
-    @staticmethod
-    def print(obj: Dict[str, Any], pretty: bool = False):
-        text = (
-            json.dumps(obj, ensure_ascii=False, indent=2)
-            if pretty
-            else json.dumps(obj, ensure_ascii=False)
+class AsyncExecutor:
+    """
+    Bucle de eventos en un hilo propio con la interfaz `submit`/`shutdown`
+    de un executor; cada corrutina devuelve un `concurrent.futures.Future`.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, *args) -> Future:
+        return asyncio.run_coroutine_threadsafe(fn(*args), self._loop)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if wait:
+            self._thread.join()
+        self._loop.close()
+
+
+# Analizador propio de cada proceso del pool, creado una sola vez por proceso.
+_WORKER_ANALYZER: Optional[PDFAnalyzer] = None
+
+
+def _init_worker(analyzer_kwargs: Dict[str, Any], announce=None) -> None:
+    global _WORKER_ANALYZER
+    _WORKER_ANALYZER = PDFAnalyzer(**analyzer_kwargs)
+    # Los procesos del pool no pasan por atexit; Finalize sí se ejecuta al salir
+    Finalize(_WORKER_ANALYZER, _WORKER_ANALYZER.close, exitpriority=10)
+    if announce is not None:
+        announce.put(os.getpid())
+
+
+def analyze_in_worker(path: Path) -> Tuple[AnalysisResult, float]:
+    """Analiza `path` en un proceso de `AnalysisPool`; devuelve también los segundos."""
+    start = time.perf_counter()
+    analysis = _WORKER_ANALYZER.analyze(path)
+    return analysis, time.perf_counter() - start
+
+
+class AnalysisPool:
+    """
+    Pool de procesos de análisis. Cada proceso anuncia su PID al arrancar,
+    así los colgados pueden terminarse sin tocar los atributos privados de
+    `ProcessPoolExecutor`.
+    """
+
+    def __init__(self, workers: int, analyzer_kwargs: Dict[str, Any]):
+        self._announced = multiprocessing.SimpleQueue()
+        self._pids: set = set()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(analyzer_kwargs, self._announced),
         )
-        print(text)
+
+    def submit(self, fn, *args) -> Future:
+        return self.executor.submit(fn, *args)
+
+    def terminate(self) -> None:
+        """Termina todos los procesos (también los colgados) y descarta el pool."""
+        while not self._announced.empty():
+            self._pids.add(self._announced.get())
+        for pid in self._pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait, cancel_futures=True)
 
 
 class DocumentPipeline:
     VERSION = "1.0"
 
-    def __init__(self, config: Config):
+    def __init__(
+        self,
+        config: Config,
+        client: Optional[LLMClient] = None,
+        async_client: Optional[AsyncLLMClient] = None,
+        batch_backend: Optional[BatchBackend] = None,
+    ):
+        """
+        `client`/`async_client` sustituyen a los clientes de OpenAI (pruebas,
+        benchmarks); `batch_backend` al de la Batch API en modo offline.
+        """
         self.input_dir = Path(config.input_dir)
-        self.analyzer = PDFAnalyzer(max_pages=config.max_pages)
+        self.cache_enabled = config.cache_enabled
+        self.workers = config.workers or os.cpu_count() or 1
+        cache_dir = str(config.cache_dir) if config.cache_enabled else None
+        self.analyzer_kwargs = {
+            "max_pages": config.max_pages,
+            "long_documents": config.long_documents,
+            "max_file_bytes": config.max_file_bytes,
+            "cache_dir": cache_dir,
+            "cache_max_bytes": config.cache_max_bytes,
+            # `ocr_workers` es el total de tesseracts: se reparte entre procesos
+            "ocr_workers": max(1, config.ocr_workers // self.workers),
+            "ocr_page_timeout": config.ocr_page_timeout,
+            "ocr_min_dpi": config.ocr_min_dpi,
+            "ocr_max_dpi": config.ocr_max_dpi,
+            "ocr_min_confidence": config.ocr_min_confidence,
+            "ocr_blank_pages": config.ocr_blank_pages,
+        }
+        self.analyzer = PDFAnalyzer(**self.analyzer_kwargs)
+        # La clave solo se lee si hay que construir algún cliente de OpenAI
+        needs_key = client is None or (config.async_llm and async_client is None)
         self.classifier = DocumentClassifier(
             instructions=config.instructions,
-            api_key=config.api_key,
+            api_key=config.api_key if needs_key else None,
             model=config.model,
+            client=client,
+            async_client=async_client,
+            async_llm=config.async_llm,
+            max_concurrency=config.llm_concurrency,
+            requests_per_minute=config.llm_rpm,
+            tokens_per_minute=config.llm_tpm,
+            cache=self.analyzer.cache,
+            json_mode=config.llm_json_mode,
+            max_retries=config.llm_max_retries,
+            retry_delay=config.llm_retry_delay,
+            breaker=CircuitBreaker(
+                failure_threshold=config.llm_breaker_failures,
+                reset_timeout=config.llm_breaker_reset,
+                mode=config.llm_breaker_mode,
+            ),
+            governor=TokenGovernor(
+                run_token_cap=config.llm_run_token_cap,
+                minute_token_cap=config.llm_minute_token_cap,
+                # El techo es la concurrencia configurada del modo en uso
+                max_concurrency=(
+                    config.llm_concurrency if config.async_llm else config.llm_workers
+                ),
+                adaptive=config.llm_adaptive_concurrency,
+                latency_tolerance=config.llm_latency_tolerance,
+                price_input_per_mtok=config.price_input_per_mtok,
+                price_output_per_mtok=config.price_output_per_mtok,
+            ),
+            prompt_max_tokens=config.prompt_max_tokens,
+            normalize_text=config.normalize_text,
+            batch_size=config.llm_batch_size,
+            batch_max_tokens=config.llm_batch_max_tokens,
+            batch_doc_max_tokens=config.llm_batch_doc_max_tokens,
+            fastpath=config.fastpath_enabled,
+            fastpath_min_confidence=config.fastpath_min_confidence,
+            fastpath_min_examples=config.fastpath_min_examples,
+            dedup=config.dedup_enabled,
+            dedup_threshold=config.dedup_threshold,
+            text_version=self.analyzer.text_version(),
         )
         self.pretty = config.pretty_print_json
         self.llm_model = config.model
         self.max_pages = config.max_pages
+        self.llm_workers = max(1, config.llm_workers)
+        self.file_timeout = config.file_timeout
+        self.output_file = config.output_file
+        self.checkpoint_file = config.checkpoint_file
+        self.print_stdout = config.print_stdout
+        self.metrics_file = config.metrics_file
+        self.cost_file = config.cost_file
+        self.metrics = RunMetrics()
 
-    def _has_images(self, path: Path) -> bool:
-        """
-        Recorre todas las XObject de cada página, resolviendo IndirectObject
-        hasta llegar al diccionario, y busca /Subtype == /Image.
-        """
-        reader = PdfReader(str(path))
-        for page in reader.pages:
-            resources = page.get("/Resources")
-            if resources is None:
-                continue
-            resources = resources.get_object()
-
-            xobj = resources.get("/XObject")
-            if xobj is None:
-                continue
-            xobj = xobj.get_object()
-
-            for obj in xobj.values():
-                try:
-                    obj = obj.get_object()
-                except AttributeError:
-                    pass
-                if obj.get("/Subtype") == "/Image":
-                    return True
-        return False
+        self.watch_poll_seconds = config.watch_poll_seconds
+        self.watch_debounce = config.watch_debounce
+        self.watch_incomplete_timeout = config.watch_incomplete_timeout
+        self.watch_metrics_seconds = config.watch_metrics_seconds
+
+        self.offline_batch = config.llm_offline_batch
+        self.batch_dir = Path(config.batch_dir)
+        self.batch_poll_seconds = config.batch_poll_seconds
+        self.batch_timeout = config.batch_timeout
+        if batch_backend is None and self.offline_batch:
+            if config.batch_backend == "local":
+                batch_backend = LocalBatchBackend(self.classifier.client)
+            else:
+                batch_backend = OpenAIBatchBackend(api_key=config.api_key)
+        self.batch_backend = batch_backend
 
     def _error_code(self, msg: str) -> str:
         if msg is None or msg == "":
             return None
         if "páginas" in msg:
             return "PAGE_LIMIT_EXCEEDED"
+        if "tamaño" in msg:
+            return "FILE_SIZE_EXCEEDED"
         if "no disponible" in msg:
             return "LLM_UNAVAILABLE"
+        if "Credenciales" in msg:
+            return "LLM_AUTH_FAILED"
+        if "rechazó la petición" in msg:
+            return "LLM_REQUEST_REJECTED"
+        if "Presupuesto" in msg:
+            return "LLM_BUDGET_EXCEEDED"
         return "UNKNOWN_ERROR"
 
     def run(self):
@@ -83,77 +251,539 @@ class DocumentPipeline:
         if not pdfs:
             raise FileNotFoundError(f"No se encontraron PDFs en: {self.input_dir}")
 
-        count = 0
+        with self._session() as (checkpoint, signatures, emit):
+            # `count` sigue siendo la posición en el listado ordenado, también
+            # para los archivos que un checkpoint previo permite saltar
+            items = []
+            for count, pdf in enumerate(pdfs, start=1):
+                signature = Checkpoint.signature(pdf)
+                if signature is not None:
+                    if checkpoint is not None and checkpoint.is_done(pdf, signature):
+                        continue
+                    signatures[count] = signature
+                items.append((count, pdf))
 
-        for pdf in pdfs:
-            count += 1
-            start = time.perf_counter()
+            if self.offline_batch:
+                records = self._run_offline(items)
+            elif self.workers > 1 or self.classifier.is_async:
+                records = self._run_parallel(items)
+            else:
+                records = self._run_sequential(items)
+
+            for result in records:
+                emit(result)
+
+    def watch(self, stop: Optional[threading.Event] = None) -> None:
+        """
+        Modo vigilancia: procesa cada PDF nuevo o modificado de `input_dir`
+        en cuanto termina de escribirse (`DirectoryWatcher`), con los
+        procesos de análisis y los clientes del LLM calientes durante toda
+        la sesión. Los resultados se emiten según terminan. Al activarse
+        `stop` deja de aceptar archivos y termina los que ya están en cola;
+        Ctrl+C corta en el acto.
+        """
+        if not self.input_dir.is_dir():
+            raise FileNotFoundError(f"No existe el directorio: {self.input_dir}")
+        if self.offline_batch:
+            raise ValueError("El modo offline (Batch API) no admite vigilancia")
+
+        stop = stop or threading.Event()
+        log = logging.getLogger(self.__class__.__name__)
+        watcher = DirectoryWatcher(
+            self.input_dir,
+            debounce=self.watch_debounce,
+            incomplete_timeout=self.watch_incomplete_timeout,
+        )
+        counter = itertools.count(1)
+        arrivals: Dict[int, float] = {}
+
+        with self._session() as (checkpoint, signatures, emit):
+            self.metrics.queue = {}
+            last_write = time.monotonic()
+
+            def feed(queue: Dict[str, int]) -> Optional[List[Tuple[int, Path]]]:
+                nonlocal last_write
+                self.metrics.queue = {"debouncing": watcher.pending, **queue}
+                now = time.monotonic()
+                if self.metrics_file and now - last_write >= self.watch_metrics_seconds:
+                    last_write = now
+                    self._write_live_metrics()
+                if stop.is_set():
+                    return None
+                items = []
+                for pdf, arrived, signature in watcher.scan(now):
+                    if checkpoint is not None and checkpoint.is_done(pdf, signature):
+                        continue
+                    count = next(counter)
+                    arrivals[count] = arrived
+                    signatures[count] = signature
+                    items.append((count, pdf))
+                return items
+
+            log.info("Vigilando %s (sondeo cada %ss)", self.input_dir, self.watch_poll_seconds)
+            try:
+                for result in self._run_parallel([], feed=feed):
+                    arrived = arrivals.pop(result["metadata"]["count"], None)
+                    if arrived is not None:
+                        self.metrics.observe_ingest(time.monotonic() - arrived)
+                    emit(result)
+            except KeyboardInterrupt:
+                log.info("Vigilancia interrumpida")
+            self.metrics.queue = {}
+
+    @contextmanager
+    def _session(
+        self,
+    ) -> Iterator[Tuple[Optional[Checkpoint], Dict[int, Tuple[int, int]], Callable]]:
+        """
+        Salidas, checkpoint, métricas y libro de tokens de una ejecución.
+        Entrega el checkpoint, las firmas (tamaño, mtime) de los archivos
+        tomadas al encolarlos, por `count`, y la función que emite cada
+        registro. El checkpoint marca esa firma y no la del archivo al
+        terminar: si cambió mientras se procesaba, se vuelve a procesar, y
+        si se movió o borró no hace falta leerlo.
+        """
+        self.metrics = RunMetrics()
+        opens_before = self.classifier.breaker.opened
+        self.classifier.governor.start_run()
+        sinks = self._open_sinks()
+        checkpoint = Checkpoint(self.checkpoint_file) if self.checkpoint_file else None
+        signatures: Dict[int, Tuple[int, int]] = {}
+
+        def emit(result: Dict[str, Any]) -> None:
+            sinks.write(result)
+            self.metrics.observe(result)
+            code = result["classification"]["status"]["error_code"]
+            signature = signatures.pop(result["metadata"]["count"], None)
+            if checkpoint is not None and signature and code not in RETRYABLE_ERROR_CODES:
+                checkpoint.mark(self.input_dir / result["metadata"]["file"], signature)
+
+        try:
+            yield checkpoint, signatures, emit
+        finally:
+            sinks.close()
+            self.analyzer.close()
+            if checkpoint is not None:
+                checkpoint.close()
+            self.metrics.circuit_opens = self.classifier.breaker.opened - opens_before
+            self.metrics.llm_cost = self.classifier.governor.summary()
+            self.metrics.finish()
+            self.report_cost(self.metrics.llm_cost)
+            if self.metrics_file:
+                self.metrics.write(self.metrics_file)
+
+    def _write_live_metrics(self) -> None:
+        """Reescribe el archivo de métricas durante una sesión de vigilancia."""
+        self.metrics.llm_cost = self.classifier.governor.summary()
+        try:
+            self.metrics.write(self.metrics_file)
+        except OSError as e:
+            logging.getLogger(self.__class__.__name__).warning(
+                "No se pudieron escribir las métricas: %s", e
+            )
+
+    def report_cost(self, cost: Dict[str, Any]) -> None:
+        """Resumen de tokens y coste de la ejecución: al log y, si se pidió, a disco."""
+        logging.getLogger(self.__class__.__name__).info(
+            "LLM: %d llamadas, %d tokens, %.4f USD%s",
+            cost["calls"],
+            cost["tokens"].get("total_tokens", 0),
+            cost["cost_usd"],
+            f" ({cost['budget_rejections']} rechazadas por presupuesto)"
+            if cost["budget_rejections"]
+            else "",
+        )
+        if self.cost_file:
+            path = Path(self.cost_file)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(json.dumps(cost, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp, path)
 
-            # Metadatos del archivo
-            raw_bytes = read_pdf_bytes(pdf)
-            size_b = pdf.stat().st_size
-            pages = count_pages(raw_bytes)
-            has_imgs = self._has_images(pdf)
+    def _open_sinks(self) -> OutputSinks:
+        sinks = []
+        if self.print_stdout:
+            sinks.append(StdoutSink(pretty=self.pretty))
+        if self.output_file:
+            sinks.append(NdjsonSink(self.output_file))
+        return OutputSinks(sinks)
 
-            # Etapas de análisis y clasificación
+    def _run_sequential(
+        self, items: List[Tuple[int, Path]]
+    ) -> Iterator[Dict[str, Any]]:
+        if self.classifier.batch_size > 1:
+            yield from self._run_sequential_batched(items)
+            return
+        for count, pdf in items:
+            start = time.perf_counter()
+
+            # Etapas de análisis y clasificación; el PDF se parsea una sola
+            # vez y el análisis devuelve también los metadatos del archivo
             analysis = self.analyzer.analyze(pdf)
             classification = self.classifier.classify(analysis)
 
             elapsed_ms = int((time.perf_counter() - start) * 1000)
+            yield self.build_record(count, analysis, classification, elapsed_ms)
+
+    def _run_sequential_batched(
+        self, items: List[Tuple[int, Path]]
+    ) -> Iterator[Dict[str, Any]]:
+        """Analiza `batch_size` archivos y los clasifica juntos."""
+        size = self.classifier.batch_size
+        for offset in range(0, len(items), size):
+            chunk = items[offset : offset + size]
+            analyses, seconds = [], []
+            for _, pdf in chunk:
+                start = time.perf_counter()
+                analyses.append(self.analyzer.analyze(pdf))
+                seconds.append(time.perf_counter() - start)
+            classifications, llm_seconds = self.classifier.classify_batch_timed(analyses)
+            for (count, _), analysis, secs, classification in zip(
+                chunk, analyses, seconds, classifications
+            ):
+                elapsed_ms = int((secs + llm_seconds) * 1000)
+                yield self.build_record(count, analysis, classification, elapsed_ms)
+
+    def _analyze_all(
+        self, items: List[Tuple[int, Path]]
+    ) -> List[Tuple[AnalysisResult, float]]:
+        paths = [pdf for _, pdf in items]
+        if self.workers > 1 and len(paths) > 1:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.analyzer_kwargs,),
+            ) as pool:
+                return list(pool.map(analyze_in_worker, paths))
+        results = []
+        for pdf in paths:
+            start = time.perf_counter()
+            results.append((self.analyzer.analyze(pdf), time.perf_counter() - start))
+        return results
+
+    def _run_offline(
+        self, items: List[Tuple[int, Path]]
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Modo offline: analiza todo, envía las clasificaciones como un único
+        trabajo por `batch_backend`, espera a que termine y emite los
+        registros en el orden de `count`.
+        """
+        analyzed = self._analyze_all(items)
+        if not analyzed:
+            return
+        # Sin caché el análisis no calcula el hash, y el manifiesto de un
+        # trabajo enviado solo se retoma para documentos que no cambiaron
+        for (_, pdf), (analysis, _) in zip(items, analyzed):
+            if not analysis.error and not analysis.sha256:
+                try:
+                    analysis.sha256 = sha256_file(pdf)
+                except OSError as e:
+                    logging.getLogger(self.__class__.__name__).warning(
+                        "No se pudo calcular el hash de %s: %s", pdf.name, e
+                    )
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+        start = time.perf_counter()
+        classifications = self.classifier.classify_offline(
+            [analysis for analysis, _ in analyzed],
+            self.batch_backend,
+            self.batch_dir / f"batch-{stamp}.jsonl",
+            poll_seconds=self.batch_poll_seconds,
+            timeout=self.batch_timeout,
+        )
+        llm_seconds = time.perf_counter() - start
+        for (count, _), (analysis, seconds), classification in zip(
+            items, analyzed, classifications
+        ):
+            elapsed_ms = int((seconds + llm_seconds) * 1000)
+            yield self.build_record(count, analysis, classification, elapsed_ms)
+
+    def _run_parallel(
+        self,
+        items: List[Tuple[int, Path]],
+        feed: Optional[Callable[[Dict[str, int]], Optional[List[Tuple[int, Path]]]]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Análisis y extracción en un pool de procesos; la clasificación corre
+        en paralelo (pool de hilos, o el cliente asíncrono si está activo) a
+        medida que llegan los análisis.
+        Los resultados se emiten en el orden de `count`: los ya terminados
+        esperan al archivo pendiente más lento, como mucho `file_timeout`.
+        Un archivo que supera ese plazo se reporta como error y su proceso
+        deja de contar como disponible, de modo que no frena al resto; si
+        todos quedan colgados, el pool se recrea. Si un proceso muere (falta
+        de memoria, fallo de una librería nativa), los archivos que el pool
+        tenía en curso se reportan como `WORKER_CRASHED` y el pool se recrea.
+        Con lotes activos, los análisis terminados se acumulan hasta
+        `batch_size` (o hasta que no quede nada por analizar) y se
+        clasifican juntos.
+
+        Con `feed` (modo vigilancia) se le pide trabajo nuevo cada
+        `watch_poll_seconds`, pasándole la cola por etapa; los resultados se
+        emiten según terminan y el bucle acaba cuando `feed` devuelve None.
+        """
+        order = [count for count, _ in items]
+        streaming = feed is not None
+        pending = list(reversed(items))
+        analyzing: Dict[Future, Tuple[int, Path, float]] = {}
+        # Cada clasificación en curso cubre uno o varios (count, análisis, segundos)
+        classifying: Dict[Future, List[Tuple[int, AnalysisResult, float]]] = {}
+        batch_size = self.classifier.batch_size
+        buffer: List[Tuple[int, AnalysisResult, float]] = []
+        stuck: set = set()
+        broken = False
+        ready: Dict[int, Dict[str, Any]] = {}
+        emitted = 0
+
+        pool = AnalysisPool(self.workers, self.analyzer_kwargs)
+        if self.classifier.is_async:
+            llm = AsyncExecutor()
+            classify = self.classifier.aclassify_timed
+            classify_batch = self.classifier.aclassify_batch_timed
+        else:
+            llm = ThreadPoolExecutor(max_workers=self.llm_workers)
+            classify = self.classifier.classify_timed
+            classify_batch = self.classifier.classify_batch_timed
+        next_poll = 0.0
+        try:
+            while feed is not None or pending or analyzing or classifying or buffer:
+                if feed is not None and time.monotonic() >= next_poll:
+                    queue = {
+                        "waiting": len(pending),
+                        "analyzing": len(analyzing),
+                        "classifying": len(buffer)
+                        + sum(len(entries) for entries in classifying.values()),
+                    }
+                    new = feed(queue)
+                    next_poll = time.monotonic() + self.watch_poll_seconds
+                    if new is None:
+                        feed = None
+                    else:
+                        # `pending` se consume desde el final
+                        pending[:0] = reversed(new)
+
+                if broken:
+                    # Todo lo que el pool roto tenía en curso se ha perdido
+                    now = time.monotonic()
+                    for count, pdf, started in analyzing.values():
+                        ready[count] = self._crash_record(count, pdf, now - started)
+                    analyzing.clear()
+                if broken or (pending and stuck and len(stuck) >= self.workers):
+                    # Sin procesos libres: se descarta el pool con los colgados
+                    pool.terminate()
+                    stuck.clear()
+                    broken = False
+                    pool = AnalysisPool(self.workers, self.analyzer_kwargs)
+
+                # Solo se envía trabajo a procesos libres, así el plazo de
+                # cada archivo empieza a contar cuando realmente arranca
+                while pending and len(analyzing) + len(stuck) < self.workers:
+                    count, pdf = pending.pop()
+                    try:
+                        fut = pool.submit(analyze_in_worker, pdf)
+                    except BrokenProcessPool:
+                        # Un proceso murió entre dos vueltas: se reintenta con otro pool
+                        pending.append((count, pdf))
+                        broken = True
+                        break
+                    analyzing[fut] = (count, pdf, time.monotonic())
+
+                timeout = None
+                if analyzing and self.file_timeout:
+                    oldest = min(t for _, _, t in analyzing.values())
+                    timeout = max(0.0, oldest + self.file_timeout - time.monotonic())
+                if feed is not None:
+                    until_poll = max(0.0, next_poll - time.monotonic())
+                    timeout = until_poll if timeout is None else min(timeout, until_poll)
 
-            # Determinamos estado y detalles de error solo si hubo fallo
-            if classification.error:
-                state = "error"
-                description = classification.error
-                code = self._error_code(description) or ""
+                futures = list(analyzing) + list(classifying) + list(stuck)
+                if futures:
+                    done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    # `wait` sin futuros vuelve al instante; en vigilancia se duerme
+                    time.sleep(timeout or 0)
+                    done = set()
+
+                for fut in done:
+                    if fut in stuck:
+                        stuck.discard(fut)
+                    elif fut in analyzing:
+                        count, pdf, started = analyzing.pop(fut)
+                        try:
+                            analysis, seconds = fut.result()
+                        except BrokenProcessPool:
+                            broken = True
+                            ready[count] = self._crash_record(
+                                count, pdf, time.monotonic() - started
+                            )
+                            continue
+                        except Exception as e:
+                            analysis, seconds = AnalysisResult(file=pdf.name, error=str(e)), 0.0
+                        if batch_size > 1:
+                            buffer.append((count, analysis, seconds))
+                        else:
+                            cfut = llm.submit(classify, analysis)
+                            classifying[cfut] = [(count, analysis, seconds)]
+                    elif fut in classifying:
+                        entries = classifying.pop(fut)
+                        outcome, llm_seconds = fut.result()
+                        results = outcome if isinstance(outcome, list) else [outcome]
+                        for (count, analysis, seconds), classification in zip(
+                            entries, results
+                        ):
+                            elapsed_ms = int((seconds + llm_seconds) * 1000)
+                            ready[count] = self.build_record(
+                                count, analysis, classification, elapsed_ms
+                            )
+
+                if buffer and (
+                    len(buffer) >= batch_size or not (pending or analyzing)
+                ):
+                    cfut = llm.submit(classify_batch, [a for _, a, _ in buffer])
+                    classifying[cfut] = buffer
+                    buffer = []
+
+                if self.file_timeout:
+                    now = time.monotonic()
+                    for fut, (count, pdf, started) in list(analyzing.items()):
+                        if now - started < self.file_timeout:
+                            continue
+                        del analyzing[fut]
+                        stuck.add(fut)
+                        analysis = AnalysisResult(
+                            file=pdf.name,
+                            error=f"Se excedió el tiempo máximo de procesamiento ({self.file_timeout}s)",
+                            error_code="TIMEOUT",
+                        )
+                        ready[count] = self.build_record(
+                            count,
+                            analysis,
+                            self.classifier.classify(analysis),
+                            int((now - started) * 1000),
+                        )
+
+                if streaming:
+                    for count in sorted(ready):
+                        yield ready.pop(count)
+                while emitted < len(order) and order[emitted] in ready:
+                    yield ready.pop(order[emitted])
+                    emitted += 1
+        finally:
+            llm.shutdown(wait=True)
+            if stuck:
+                # Los procesos colgados no terminarían por sí solos
+                pool.terminate()
             else:
-                state = "ok"
-                description = ""
-                code = ""
-
-            labels = classification.labels or {
-                "tipo_documento": "",
-                "justificacion": "",
-            }
-            usage = classification.tokens_usage or {
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "total_tokens": 0,
-            }
-
-            # Construcción del JSON
-            metadata = OrderedDict(
-                [
-                    ("count", count),
-                    ("file", classification.file),
-                    ("timestamp", datetime.utcnow().isoformat() + "Z"),
-                    ("llm_model", self.llm_model),
-                    ("file_size_bytes", size_b),
-                    ("page_count", pages),
-                    ("processing_time_ms", elapsed_ms),
-                    ("has_images", has_imgs),
-                ]
-            )
+                pool.shutdown()
 
-            status_block = OrderedDict(
-                [("state", state), ("error_code", code), ("description", description)]
-            )
+    def _crash_record(self, count: int, pdf: Path, seconds: float) -> Dict[str, Any]:
+        """Registro de un archivo perdido porque murió un proceso del pool."""
+        analysis = AnalysisResult(
+            file=pdf.name,
+            error="El proceso de análisis terminó de forma inesperada",
+            error_code="WORKER_CRASHED",
+        )
+        return self.build_record(
+            count, analysis, self.classifier.classify(analysis), int(seconds * 1000)
+        )
 
-            classification_section = OrderedDict(
+    def build_record(
+        self,
+        count: int,
+        analysis: AnalysisResult,
+        classification: ClassificationResult,
+        elapsed_ms: int,
+    ) -> Dict[str, Any]:
+        """Registro de salida de un documento, el mismo en `run` y en el servicio."""
+        # Determinamos estado y detalles de error solo si hubo fallo
+        if classification.error:
+            state = "error"
+            description = classification.error
+            code = classification.error_code or self._error_code(description) or ""
+        else:
+            state = "ok"
+            description = ""
+            code = ""
+
+        labels = classification.labels or {
+            "tipo_documento": "",
+            "justificacion": "",
+        }
+        usage = classification.tokens_usage or {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+        }
+
+        timings = dict(analysis.timings_ms)
+        if classification.llm_latency_ms:
+            timings["llm"] = classification.llm_latency_ms
+
+        # Construcción del JSON
+        metadata = OrderedDict(
+            [
+                ("count", count),
+                ("file", classification.file),
+                ("timestamp", datetime.utcnow().isoformat() + "Z"),
+                ("llm_model", self.llm_model),
+                ("file_size_bytes", analysis.file_size_bytes),
+                ("page_count", analysis.page_count),
+                ("processing_time_ms", elapsed_ms),
+                ("has_images", analysis.has_images),
+                (
+                    "ocr_confidence",
+                    {str(p): c for p, c in sorted(analysis.ocr_confidence.items())},
+                ),
+                ("timings_ms", timings),
+                ("pages_by_engine", analysis.pages_by_engine),
+                ("llm_retries", classification.llm_retries),
+            ]
+        )
+        if analysis.page_plan:
+            metadata["page_plan"] = analysis.page_plan
+        if analysis.truncated:
+            metadata["pages_extracted"] = len(analysis.pages)
+        if classification.batch_size > 1:
+            metadata["llm_batch_size"] = classification.batch_size
+        if classification.classified_by:
+            metadata["classified_by"] = classification.classified_by
+        if classification.duplicate_of is not None:
+            metadata["duplicate_of"] = OrderedDict(
                 [
-                    ("status", status_block),
-                    ("labels", labels),
-                    ("tokens_usage", usage),
+                    ("file", classification.duplicate_of),
+                    ("similarity", classification.confidence),
                 ]
             )
-
-            result = OrderedDict(
+        elif classification.confidence is not None:
+            metadata["local_confidence"] = classification.confidence
+        if classification.normalization is not None:
+            metadata["normalization"] = classification.normalization
+        if classification.prompt is not None:
+            metadata["prompt"] = classification.prompt
+        if self.cache_enabled:
+            metadata["cache"] = OrderedDict(
                 [
-                    ("version", self.VERSION),
-                    ("metadata", metadata),
-                    ("classification", classification_section),
+                    ("text", "hit" if analysis.text_cached else "miss"),
+                    ("labels", "hit" if classification.from_cache else "miss"),
                 ]
             )
 
-            JsonPrinter.print(result, pretty=self.pretty)
-            print()  # línea en blanco entre archivos
+        status_block = OrderedDict(
+            [("state", state), ("error_code", code), ("description", description)]
+        )
+
+        classification_section = OrderedDict(
+            [
+                ("status", status_block),
+                ("labels", labels),
+                ("tokens_usage", usage),
+            ]
+        )
+
+        return OrderedDict(
+            [
+                ("version", self.VERSION),
+                ("metadata", metadata),
+                ("classification", classification_section),
+            ]
+        )
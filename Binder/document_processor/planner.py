@@ -0,0 +1,113 @@
+# document_processor/planner.py
+
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from .document import PDFDocument
+
+
+def garbage_ratio(text: str) -> float:
+    """
+    Fracción de caracteres ilegibles entre los no blancos: U+FFFD, uso
+    privado (glifos sin ToUnicode), controles y marcas "(cid:N)".
+    """
+    visible = [c for c in text if not c.isspace()]
+    if not visible:
+        return 0.0
+    bad = sum(
+        1 for c in visible if c == "\ufffd" or "\ue000" <= c <= "\uf8ff" or ord(c) < 32
+    )
+    bad += 6 * text.count("(cid:")
+    return min(1.0, bad / len(visible))
+
+
+@dataclass
+class PagePlan:
+    index: int  # base 0
+    # Motor planificado: "pymupdf", "pdfplumber", "ocr" o "" (página en blanco)
+    engine: str
+    reason: str
+    chars: int = 0
+    garbage: float = 0.0
+    image_coverage: float = 0.0
+    fonts: int = 0
+    # Motor que finalmente dio el texto ("" si ninguno)
+    used: str = ""
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "page": self.index + 1,
+            "plan": self.engine,
+            "reason": self.reason,
+            "used": self.used,
+            "chars": self.chars,
+            "garbage": round(self.garbage, 2),
+            "image_coverage": round(self.image_coverage, 2),
+            "fonts": self.fonts,
+        }
+
+
+class PagePlanner:
+    """
+    Decide por página el motor más barato con probabilidad de éxito, a
+    partir de la capa de texto de PyMuPDF (que ya se leyó):
+      - texto suficiente y legible → PyMuPDF;
+      - texto ilegible (fuentes sin mapa Unicode) → OCR, pdfplumber daría
+        los mismos glifos;
+      - página cubierta de imágenes con poco texto → OCR directamente;
+      - fuentes pero poco texto → pdfplumber (y OCR si tampoco da nada);
+      - sin fuentes ni imágenes y con menos de `min_drawings` trazos →
+        en blanco, sin OCR.
+
+    La última regla es una heurística: una página cuyo contenido son unos
+    pocos trazos vectoriales (una firma, texto convertido a contornos
+    simples) o solo anotaciones se da por vacía. Con `ocr_blank=True`
+    esas páginas también pasan por OCR.
+    """
+
+    def __init__(
+        self,
+        min_chars: int = 30,
+        thin_text_chars: int = 100,
+        max_garbage: float = 0.3,
+        scan_coverage: float = 0.5,
+        min_drawings: int = 20,
+        ocr_blank: bool = False,
+    ):
+        self.min_chars = min_chars
+        self.thin_text_chars = thin_text_chars
+        self.max_garbage = max_garbage
+        self.scan_coverage = scan_coverage
+        self.min_drawings = min_drawings
+        self.ocr_blank = ocr_blank
+
+    def plan(self, doc: PDFDocument, index: int) -> PagePlan:
+        text = doc.page_text(index)
+        chars = len(text.strip())
+        plan = PagePlan(
+            index=index,
+            engine="",
+            reason="",
+            chars=chars,
+            garbage=garbage_ratio(text),
+            image_coverage=(
+                doc.page_image_coverage(index) if doc.page_has_images(index) else 0.0
+            ),
+            fonts=doc.page_fonts(index),
+        )
+        scanned = plan.image_coverage >= self.scan_coverage
+        if plan.garbage > self.max_garbage and chars:
+            plan.engine, plan.reason = "ocr", "garbled_text"
+        elif scanned and chars < self.thin_text_chars:
+            plan.engine, plan.reason = "ocr", "scanned"
+        elif chars >= self.min_chars:
+            plan.engine, plan.reason = "pymupdf", "text_layer"
+        elif plan.fonts:
+            plan.engine, plan.reason = "pdfplumber", "thin_text"
+        elif plan.image_coverage or doc.page_drawings(index) >= self.min_drawings:
+            plan.engine, plan.reason = "ocr", "no_text_layer"
+        elif self.ocr_blank:
+            plan.engine, plan.reason = "ocr", "blank"
+        else:
+            plan.engine, plan.reason = "", "blank"
+        return plan
@@ -0,0 +1,165 @@
+# document_processor/prompt.py
+
+import re
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from .llm.tokens import TokenCounter
+
+# Encabezados típicos de escritos legales (cláusulas, capítulos, apartados)
+HEADING_RE = re.compile(
+    r"^\s*(CL[AÁ]USULA|CAP[IÍ]TULO|ART[IÍ]CULO|SECCI[OÓ]N|T[IÍ]TULO|"
+    r"DECLARACIONES|CONSIDERANDOS?|ANTECEDENTES|HECHOS|RESULTANDOS?|"
+    r"RESUELVE|PUNTOS RESOLUTIVOS|PETITORIOS?|PRIMER[OA]?|SEGUND[OA]|"
+    r"TERCER[OA]?|CUART[OA]|QUINT[OA])\b",
+    re.IGNORECASE,
+)
+# Indicios de cierre: firmas, fechas de suscripción, testigos
+CLOSING_RE = re.compile(
+    r"\b(firma|firman|suscriben|atentamente|protesto lo necesario|testigos?|"
+    r"rúbrica|ante mí|doy fe)\b",
+    re.IGNORECASE,
+)
+
+HEAD_SHARE = 0.5   # fracción del presupuesto para la primera página
+TAIL_SHARE = 0.25  # fracción para el final de la última página
+
+
+@dataclass
+class Prompt:
+    text: str
+    tokens: int
+    original_tokens: int
+    # Páginas (base 1) recortadas o reducidas a encabezados, y omitidas
+    partial_pages: List[int] = field(default_factory=list)
+    dropped_pages: List[int] = field(default_factory=list)
+
+    @property
+    def truncated(self) -> bool:
+        return bool(self.partial_pages or self.dropped_pages)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "tokens": self.tokens,
+            "original_tokens": self.original_tokens,
+            "truncated": self.truncated,
+            "partial_pages": self.partial_pages,
+            "dropped_pages": self.dropped_pages,
+        }
+
+
+def heading_lines(text: str) -> List[str]:
+    """Líneas que parecen títulos: palabras clave o mayúsculas sostenidas."""
+    found = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not 3 <= len(line) <= 120:
+            continue
+        letters = [c for c in line if c.isalpha()]
+        upper = len(letters) >= 4 and sum(c.isupper() for c in letters) / len(letters) > 0.8
+        if upper or HEADING_RE.match(line):
+            found.append(line)
+    return found
+
+
+class PromptBuilder:
+    """
+    Arma el texto que se envía al LLM dentro de un presupuesto de tokens.
+    Si el documento cabe entero se envía tal cual; si no, se prioriza el
+    inicio de la primera página, el final de la última (firmas, cierre),
+    las páginas intermedias con indicios de cierre y los encabezados del
+    resto, y se rellena con páginas completas mientras quede presupuesto.
+    Las omisiones se marcan en el texto y se informan en `Prompt`.
+    """
+
+    def __init__(self, max_tokens: int, model: Optional[str] = None):
+        self.max_tokens = max_tokens
+        self.counter = TokenCounter(model)
+
+    def build(self, pages: List[str]) -> Prompt:
+        numbered = [(n, p) for n, p in enumerate(pages, start=1) if p.strip()]
+        full = "\n".join(p for _, p in numbered)
+        total = self.counter.count(full)
+        if not self.max_tokens or total <= self.max_tokens:
+            return Prompt(text=full, tokens=total, original_tokens=total)
+
+        count = lru_cache(maxsize=None)(self.counter.count)
+        # Reserva para los marcadores de omisión
+        budget = max(0, self.max_tokens - 8 * len(numbered))
+        chosen: Dict[int, str] = {}
+        partial = set()
+
+        def take(n: int, text: str, piece: str) -> None:
+            chosen[n] = piece
+            if piece != text:
+                partial.add(n)
+            else:
+                partial.discard(n)
+
+        first_n, first = numbered[0]
+        if len(numbered) == 1:
+            take(first_n, first, self.counter.head(first, budget))
+            return self._assemble(numbered, chosen, partial, total)
+        take(first_n, first, self.counter.head(first, int(budget * HEAD_SHARE)))
+        last_n, last = numbered[-1]
+        take(last_n, last, self.counter.tail(last, int(budget * TAIL_SHARE)))
+
+        def remaining() -> int:
+            return budget - sum(count(t) for t in chosen.values())
+
+        middle = numbered[1:-1]
+        # 1) páginas intermedias con firmas o cierre, 2) encabezados del resto
+        for n, text in middle:
+            if CLOSING_RE.search(text) and count(text) <= remaining():
+                take(n, text, text)
+        for n, text in middle:
+            if n in chosen:
+                continue
+            headings = "\n".join(heading_lines(text))
+            if headings and count(headings) <= remaining():
+                take(n, text, headings)
+        # 3) páginas intermedias completas en orden mientras quepan
+        for n, text in middle:
+            if chosen.get(n) == text:
+                continue
+            extra = count(text) - count(chosen.get(n, ""))
+            if extra <= remaining():
+                take(n, text, text)
+
+        # Lo que sobre amplía primera y última página
+        ends = ((first_n, first, self.counter.head), (last_n, last, self.counter.tail))
+        for n, text, cut in ends:
+            spare = remaining()
+            if spare > 0 and n in partial:
+                take(n, text, cut(text, count(chosen[n]) + spare))
+        return self._assemble(numbered, chosen, partial, total)
+
+    def _assemble(self, numbered, chosen, partial, total) -> Prompt:
+        parts: List[str] = []
+        dropped: List[int] = []
+        gap: List[int] = []
+
+        def flush() -> None:
+            if gap:
+                span = str(gap[0]) if len(gap) == 1 else f"{gap[0]}-{gap[-1]}"
+                parts.append(f"[... página(s) {span} omitida(s) ...]")
+                gap.clear()
+
+        for n, _ in numbered:
+            piece = chosen.get(n, "")
+            if not piece.strip():
+                dropped.append(n)
+                gap.append(n)
+                continue
+            flush()
+            parts.append(piece + (f"\n[... página {n} recortada ...]" if n in partial else ""))
+        flush()
+        text = "\n".join(parts)
+        return Prompt(
+            text=text,
+            tokens=self.counter.count(text),
+            original_tokens=total,
+            partial_pages=sorted(n for n in partial if n not in dropped),
+            dropped_pages=dropped,
+        )
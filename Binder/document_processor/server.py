@@ -0,0 +1,466 @@
+# document_processor/server.py
+
+import itertools
+import json
+import logging
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+
+from .analyzer import AnalysisResult
+from .metrics import RunMetrics
+from .pipeline import AnalysisPool, AsyncExecutor, DocumentPipeline, analyze_in_worker
+
+LOG = logging.getLogger(__name__)
+
+MAX_JSON_BODY = 64 * 1024  # bytes de una petición `{"path": ...}`
+UPLOAD_CHUNK = 1024 * 1024  # las subidas se copian a disco por bloques
+
+
+class ServiceOverloaded(Exception):
+    """La cola de trabajos está llena (HTTP 429)."""
+
+
+class PathNotAllowed(Exception):
+    """Ruta pedida fuera de `input_dir` (HTTP 403)."""
+
+
+def _warm_worker() -> None:
+    """Carga PyMuPDF en el proceso de extracción antes de la primera petición."""
+    from .utils.pdf import load_pymupdf
+
+    load_pymupdf()
+
+
+@dataclass
+class _Job:
+    path: Path
+    future: Future
+    received: float
+    # Directorio temporal de una subida, que se borra al terminar
+    upload_dir: Optional[Path] = None
+
+
+class ClassificationService:
+    """
+    Clasificación bajo demanda sobre un `DocumentPipeline`:
+      - cola acotada de `queue_size` trabajos; con la cola llena, `submit`
+        lanza `ServiceOverloaded` en lugar de aceptar más;
+      - pool de `pipeline.workers` procesos de extracción, precalentado al
+        arrancar;
+      - como mucho `llm_concurrency` clasificaciones a la vez.
+    Cada trabajo produce el mismo registro JSON que `DocumentPipeline.run`.
+    Los documentos se clasifican de uno en uno (sin lotes), para no
+    retrasar unas peticiones esperando a otras.
+    """
+
+    def __init__(
+        self,
+        pipeline: DocumentPipeline,
+        queue_size: int = 32,
+        llm_concurrency: int = 4,
+        request_timeout: float = 300,
+        upload_dir: Optional[Path] = None,
+    ):
+        self.pipeline = pipeline
+        self.workers = pipeline.workers
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.request_timeout = request_timeout
+        self.upload_dir = Path(upload_dir or Path(tempfile.gettempdir()) / "binder-uploads")
+        self.queue_size = queue_size
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue(maxsize=queue_size)
+        self._llm_slots = threading.BoundedSemaphore(self.llm_concurrency)
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        self._threads: List[threading.Thread] = []
+        self._pool: Optional[AnalysisPool] = None
+        self._llm: Optional[AsyncExecutor] = None
+        self._stuck: Set[Future] = set()
+        self.analyzing = 0
+        self.classifying = 0
+        self.rejected = 0
+        self.started = 0.0
+        self.closing = False
+
+    # --- Ciclo de vida -----------------------------------------------------
+
+    def start(self) -> None:
+        classifier = self.pipeline.classifier
+        self.pipeline.metrics = RunMetrics()
+        self.pipeline.metrics.queue = {}
+        self.opens_before = classifier.breaker.opened
+        classifier.governor.start_run()
+        self._pool = self._warm(AnalysisPool(self.workers, self.pipeline.analyzer_kwargs))
+        if classifier.is_async:
+            self._llm = AsyncExecutor()
+        # El SDK del LLM también se carga ahora y no en la primera petición
+        getattr(classifier.async_client or classifier.client, "client", None)
+        # Un hilo por trabajo en curso: bastan para ocupar ambas etapas
+        for i in range(self.workers + self.llm_concurrency):
+            thread = threading.Thread(target=self._dispatch, name=f"binder-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.started = time.monotonic()
+        LOG.info(
+            "Servicio listo: %d procesos de extracción, %d clasificaciones simultáneas, cola de %d",
+            self.workers,
+            self.llm_concurrency,
+            self.queue_size,
+        )
+
+    def close(self) -> None:
+        """Termina los trabajos aceptados y libera los pools."""
+        self.closing = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._llm is not None:
+            self._llm.shutdown(wait=True)
+        if self._pool is not None:
+            if self._stuck:
+                # Los procesos colgados no terminarían por sí solos
+                self._pool.terminate()
+            else:
+                self._pool.shutdown()
+        metrics = self.snapshot()
+        metrics.queue = {}
+        metrics.finish()
+        self.pipeline.report_cost(metrics.llm_cost)
+        if self.pipeline.metrics_file:
+            metrics.write(self.pipeline.metrics_file)
+
+    def _warm(self, pool: AnalysisPool) -> AnalysisPool:
+        """Arranca los procesos del pool y carga sus dependencias."""
+        for fut in [pool.submit(_warm_worker) for _ in range(self.workers)]:
+            try:
+                fut.result()
+            except Exception as e:  # p. ej. pool terminado mientras arrancaba
+                LOG.warning("No se pudo precalentar un proceso de extracción: %s", e)
+        return pool
+
+    # --- Trabajos ----------------------------------------------------------
+
+    def submit(self, path: Path, upload_dir: Optional[Path] = None) -> Future:
+        """Encola un PDF; el futuro resuelve al registro JSON."""
+        if self.closing:
+            raise ServiceOverloaded("El servicio se está deteniendo")
+        job = _Job(path=Path(path), future=Future(), received=time.monotonic(), upload_dir=upload_dir)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise ServiceOverloaded(f"Cola llena ({self.queue_size} trabajos en espera)")
+        return job.future
+
+    def has_room(self) -> bool:
+        """Hay sitio en la cola; si no, la petición cuenta como rechazada."""
+        if self._queue.full() or self.closing:
+            with self._lock:
+                self.rejected += 1
+            return False
+        return True
+
+    def _dispatch(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            try:
+                try:
+                    record = self._process(job)
+                finally:
+                    # La subida se borra antes de responder, no después
+                    if job.upload_dir is not None:
+                        shutil.rmtree(job.upload_dir, ignore_errors=True)
+            except Exception as e:
+                LOG.exception("Error procesando %s", job.path.name)
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(record)
+
+    def _process(self, job: _Job) -> Dict[str, Any]:
+        count = next(self._counter)
+        start = time.perf_counter()
+        analysis = self._analyze(job.path)
+        with self._llm_slots:
+            with self._lock:
+                self.classifying += 1
+            try:
+                if self._llm is not None:
+                    classification, _ = self._llm.submit(
+                        self.pipeline.classifier.aclassify_timed, analysis
+                    ).result()
+                else:
+                    classification, _ = self.pipeline.classifier.classify_timed(analysis)
+            finally:
+                with self._lock:
+                    self.classifying -= 1
+        elapsed_ms = int((time.perf_counter() - start) * 1000)
+        record = self.pipeline.build_record(count, analysis, classification, elapsed_ms)
+        with self._lock:
+            self.pipeline.metrics.observe(record)
+            self.pipeline.metrics.observe_ingest(time.monotonic() - job.received)
+        return record
+
+    def _analyze(self, path: Path) -> AnalysisResult:
+        timeout = self.pipeline.file_timeout
+        with self._lock:
+            pool = self._pool
+            self.analyzing += 1
+        try:
+            fut = pool.submit(analyze_in_worker, path)
+            analysis, _ = fut.result(timeout=timeout or None)
+            return analysis
+        except FutureTimeoutError:
+            self._mark_stuck(pool, fut)
+            return AnalysisResult(
+                file=path.name,
+                error=f"Se excedió el tiempo máximo de procesamiento ({timeout}s)",
+                error_code="TIMEOUT",
+            )
+        except Exception as e:
+            return AnalysisResult(file=path.name, error=str(e))
+        finally:
+            with self._lock:
+                self.analyzing -= 1
+
+    def _mark_stuck(self, pool: AnalysisPool, fut: Future) -> None:
+        """
+        Un proceso colgado deja de contar; si lo están todos, el pool se
+        recrea. Bajo el candado solo se cambia la referencia: terminar el
+        pool viejo y precalentar el nuevo no bloquea /health ni los trabajos.
+        """
+        with self._lock:
+            if pool is not self._pool:
+                return
+            self._stuck.add(fut)
+            fut.add_done_callback(self._stuck.discard)
+            if len(self._stuck) < self.workers:
+                return
+            self._stuck = set()
+            self._pool = AnalysisPool(self.workers, self.pipeline.analyzer_kwargs)
+            fresh = self._pool
+        LOG.warning("Todos los procesos de extracción colgados; se recrea el pool")
+        pool.terminate()
+        self._warm(fresh)
+
+    # --- Estado ------------------------------------------------------------
+
+    def snapshot(self) -> RunMetrics:
+        """Métricas de la sesión con la cola y el uso del LLM actuales."""
+        classifier = self.pipeline.classifier
+        metrics = self.pipeline.metrics
+        with self._lock:
+            metrics.queue = {
+                "waiting": self._queue.qsize(),
+                "analyzing": self.analyzing,
+                "classifying": self.classifying,
+            }
+            metrics.circuit_opens = classifier.breaker.opened - self.opens_before
+            metrics.llm_cost = classifier.governor.summary()
+        return metrics
+
+    def health(self) -> Dict[str, Any]:
+        circuit_open = self.pipeline.classifier.breaker.is_open
+        if self.closing:
+            status = "stopping"
+        elif circuit_open:
+            status = "degraded"
+        else:
+            status = "ok"
+        with self._lock:
+            return {
+                "status": status,
+                "uptime_seconds": round(time.monotonic() - self.started, 1),
+                "queue": {"waiting": self._queue.qsize(), "capacity": self.queue_size},
+                "in_flight": {"analyzing": self.analyzing, "classifying": self.classifying},
+                "workers": self.workers,
+                "llm_concurrency": self.llm_concurrency,
+                "llm_circuit_open": circuit_open,
+                "rejected": self.rejected,
+            }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    POST /classify   cuerpo `application/pdf` (nombre en `?filename=` o la
+                     cabecera X-Filename) o JSON `{"path": "..."}` dentro
+                     de input_dir; responde el registro JSON del documento.
+    GET  /health     estado del servicio y de la cola.
+    GET  /metrics    textfile de Prometheus (`?format=json` para JSON).
+    """
+
+    server_version = "Binder/" + DocumentPipeline.VERSION
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def service(self) -> ClassificationService:
+        return self.server.service
+
+    def log_message(self, fmt: str, *args) -> None:
+        LOG.debug("%s %s", self.address_string(), fmt % args)
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Dict[str, str] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _json(self, status: int, data: Any, headers: Dict[str, str] = None) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self._send(status, body, "application/json; charset=utf-8", headers)
+
+    def _error(self, status: int, message: str, headers: Dict[str, str] = None) -> None:
+        self._json(status, {"error": message}, headers)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._json(HTTPStatus.OK, self.service.health())
+        elif url.path == "/metrics":
+            metrics = self.service.snapshot()
+            if parse_qs(url.query).get("format") == ["json"]:
+                self._json(HTTPStatus.OK, metrics.to_dict())
+            else:
+                body = metrics.to_prometheus().encode("utf-8")
+                self._send(HTTPStatus.OK, body, "text/plain; version=0.0.4; charset=utf-8")
+        else:
+            self._error(HTTPStatus.NOT_FOUND, f"Ruta desconocida: {url.path}")
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/classify":
+            self._error(HTTPStatus.NOT_FOUND, f"Ruta desconocida: {url.path}")
+            return
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+        is_json = content_type == "application/json"
+        try:
+            length = int(self.headers["Content-Length"])
+        except (KeyError, TypeError, ValueError):
+            # Sin Content-Length no hay forma de acotar el cuerpo antes de leerlo
+            self.close_connection = True
+            self._error(HTTPStatus.LENGTH_REQUIRED, "Falta la cabecera Content-Length")
+            return
+        max_bytes = MAX_JSON_BODY if is_json else self.service.pipeline.analyzer.max_file_bytes
+        if max_bytes and length > max_bytes:
+            self.close_connection = True
+            self._error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"El cuerpo supera {max_bytes} bytes")
+            return
+        if not self.service.has_room():
+            # Sin leer el cuerpo: se rechaza antes de recibir el PDF
+            self.close_connection = True
+            self._error(HTTPStatus.TOO_MANY_REQUESTS, "Servicio saturado", {"Retry-After": "1"})
+            return
+        try:
+            if is_json:
+                path, upload_dir = self._requested_path(self.rfile.read(length)), None
+            else:
+                name = parse_qs(url.query).get("filename", [None])[0] or self.headers.get("X-Filename")
+                path, upload_dir = self._store_upload(length, name)
+        except ValueError as e:
+            self.close_connection = True  # el cuerpo puede no haberse leído
+            self._error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except PathNotAllowed as e:
+            self._error(HTTPStatus.FORBIDDEN, str(e))
+            return
+        except OSError as e:
+            # Sin espacio o sin permisos en upload_dir: fallo del servicio, no de la petición
+            LOG.error("No se pudo guardar la subida: %s", e)
+            self.close_connection = True
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, "No se pudo guardar el documento")
+            return
+
+        try:
+            future = self.service.submit(path, upload_dir=upload_dir)
+        except ServiceOverloaded as e:
+            if upload_dir is not None:
+                shutil.rmtree(upload_dir, ignore_errors=True)
+            self._error(HTTPStatus.TOO_MANY_REQUESTS, str(e), {"Retry-After": "1"})
+            return
+        try:
+            record = future.result(timeout=self.service.request_timeout or None)
+        except FutureTimeoutError:
+            self._error(HTTPStatus.GATEWAY_TIMEOUT, "El documento sigue en proceso")
+            return
+        except Exception as e:
+            self._error(HTTPStatus.INTERNAL_SERVER_ERROR, str(e))
+            return
+        self._json(HTTPStatus.OK, record)
+
+    def _requested_path(self, body: bytes) -> Path:
+        try:
+            requested = json.loads(body or b"{}").get("path")
+        except (ValueError, AttributeError):
+            raise ValueError("Cuerpo JSON inválido")
+        if not requested:
+            raise ValueError("Falta `path`")
+        root = self.service.pipeline.input_dir.resolve()
+        path = (root / requested).resolve()
+        # Solo archivos dentro de input_dir: el servicio no lee rutas arbitrarias
+        if root not in path.parents:
+            raise PathNotAllowed(f"{requested} está fuera de {root}")
+        if not path.is_file():
+            raise ValueError(f"No existe: {requested}")
+        return path
+
+    def _store_upload(self, length: int, name: Optional[str]) -> tuple:
+        """Copia el cuerpo a disco por bloques, sin tenerlo entero en memoria."""
+        if not length:
+            raise ValueError("Cuerpo vacío: se espera un PDF")
+        if name is None:
+            name = "upload.pdf"
+        elif Path(name).name in ("", ".", ".."):
+            # "..", "/" o "" no nombran un archivo dentro del directorio de la subida
+            raise ValueError(f"Nombre de archivo inválido: {name!r}")
+        else:
+            name = Path(name).name
+        # Un directorio por subida conserva el nombre original en el registro
+        directory = self.service.upload_dir / uuid.uuid4().hex
+        directory.mkdir(parents=True)
+        path = directory / name
+        remaining = length
+        try:
+            with open(path, "wb") as fh:
+                while remaining:
+                    chunk = self.rfile.read(min(UPLOAD_CHUNK, remaining))
+                    if not chunk:
+                        raise ValueError("Cuerpo incompleto")
+                    fh.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        return path, directory
+
+
+class BinderHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: ClassificationService):
+        self.service = service
+        super().__init__(address, _Handler)
+
+
+def create_server(service: ClassificationService, host: str, port: int) -> BinderHTTPServer:
+    """Servidor HTTP sobre `service` (puerto 0 = uno libre, útil en pruebas)."""
+    return BinderHTTPServer((host, port), service)
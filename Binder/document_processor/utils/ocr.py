@@ -1,18 +1,163 @@
-from typing import List
-from PIL import Image
-from pdf2image import convert_from_bytes
-from pdf2image.exceptions import PDFInfoNotInstalledError
-import pytesseract
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
 
+# pytesseract, pdf2image y PIL se importan en el primer OCR: un lote que
+# solo tiene PDFs con texto (o ya en caché) no paga su carga
+if TYPE_CHECKING:
+    from PIL import Image
+
+LOG = logging.getLogger(__name__)
+
+
+def pdf_to_images(
+    pdf_bytes: bytes,
+    dpi: int = 300,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+) -> List["Image.Image"]:
+    """Renderiza con pdf2image; `first_page`/`last_page` (base 1) acotan el rango."""
+    from pdf2image import convert_from_bytes
+    from pdf2image.exceptions import PDFInfoNotInstalledError
 
-def pdf_to_images(pdf_bytes: bytes, dpi: int = 300) -> List[Image.Image]:
     try:
-        return convert_from_bytes(pdf_bytes, dpi=dpi)
+        return convert_from_bytes(
+            pdf_bytes, dpi=dpi, first_page=first_page, last_page=last_page
+        )
     except PDFInfoNotInstalledError:
         return []
     except Exception:
         return []
 
 
-def ocr_images(images: List[Image.Image], lang: str = "spa") -> List[str]:
-    return [pytesseract.image_to_string(img, lang=lang) for img in images]
+def ocr_images(
+    images: List["Image.Image"], lang: str = "spa", timeout: float = 0
+) -> List[str]:
+    import pytesseract
+
+    return [
+        pytesseract.image_to_string(img, lang=lang, timeout=timeout) for img in images
+    ]
+
+
+def ocr_with_confidence(
+    image: "Image.Image", lang: str = "spa", timeout: float = 0
+) -> Tuple[str, float]:
+    """
+    Una sola pasada de tesseract que devuelve el texto (reconstruido por
+    líneas) y la confianza media de las palabras (0-100).
+    """
+    import pytesseract
+
+    data = pytesseract.image_to_data(
+        image, lang=lang, timeout=timeout, output_type=pytesseract.Output.DICT
+    )
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confs: List[float] = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not word.strip():
+            continue
+        confs.append(conf)
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    confidence = sum(confs) / len(confs) if confs else 0.0
+    return text, confidence
+
+
+def preprocess_image(image: "Image.Image") -> "Image.Image":
+    """`preprocess_for_ocr`, cargado (con PIL) en la primera página."""
+    from .preprocess import preprocess_for_ocr
+
+    return preprocess_for_ocr(image)
+
+
+@dataclass
+class OCRPage:
+    text: str = ""
+    confidence: float = 0.0
+
+
+class OCRExecutor:
+    """
+    OCR concurrente de las páginas de un documento. Cada página es un
+    subproceso de tesseract, así que basta un pool de hilos. El render se
+    hace en el hilo llamante (PyMuPDF no es thread-safe) y se limita el
+    número de imágenes vivas a `max_in_flight`.
+
+    Cada proceso de análisis tiene su propio ejecutor: el pipeline reparte
+    `DEFAULT_OCR_WORKERS` entre los procesos y llama a `close` al terminar.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_in_flight: Optional[int] = None,
+        page_timeout: float = 60,
+        lang: str = "spa",
+        preprocess: Optional[Callable[["Image.Image"], "Image.Image"]] = preprocess_image,
+    ):
+        self.workers = max(1, workers)
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.page_timeout = page_timeout
+        self.lang = lang
+        self.preprocess = preprocess
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _ocr_page(
+        self, index: int, image: "Image.Image", slots: threading.Semaphore
+    ) -> OCRPage:
+        try:
+            if self.preprocess is not None:
+                prepared = self.preprocess(image)
+                image.close()
+                image = prepared
+            text, conf = ocr_with_confidence(
+                image, lang=self.lang, timeout=self.page_timeout
+            )
+            return OCRPage(text=text, confidence=conf)
+        except RuntimeError as e:
+            # pytesseract lanza RuntimeError al agotar el timeout
+            LOG.error("OCR excedió el tiempo en página %d: %s", index + 1, e)
+        except Exception as e:
+            LOG.error("OCR fallo en página %d: %s", index + 1, e)
+        finally:
+            image.close()
+            slots.release()
+        return OCRPage()
+
+    def run(
+        self,
+        indices: Iterable[int],
+        render: Callable[[int], Optional["Image.Image"]],
+    ) -> Dict[int, OCRPage]:
+        """Devuelve {página: OCRPage} para las páginas indicadas, en orden."""
+        if self._pool is None and self.workers > 1:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="ocr"
+            )
+        slots = threading.Semaphore(self.max_in_flight)
+        results: Dict[int, Future] = {}
+        for index in indices:
+            # Espera a que haya hueco antes de renderizar otra imagen
+            slots.acquire()
+            image = render(index)
+            if image is None:
+                slots.release()
+                continue
+            if self._pool is None:
+                fut: Future = Future()
+                fut.set_result(self._ocr_page(index, image, slots))
+            else:
+                fut = self._pool.submit(self._ocr_page, index, image, slots)
+            results[index] = fut
+        return {index: results[index].result() for index in sorted(results)}
+
+    def close(self) -> None:
+        """Espera a las páginas en curso y libera los hilos; `run` los recrea."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
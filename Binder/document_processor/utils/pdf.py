@@ -1,17 +1,102 @@
+import functools
 import io
-from typing import List
-from PyPDF2 import PdfReader
+import logging
+import mmap
+import re
+from typing import List, Optional
+
 from pathlib import Path
 
 
+@functools.lru_cache(maxsize=None)
+def load_pymupdf():
+    """
+    PyMuPDF, importado en el primer uso. Se prefiere el nombre `pymupdf`
+    (importar `fitz` avisa por stdout en versiones recientes) y los mensajes
+    de MuPDF van al log: stdout queda solo para la salida JSON.
+    """
+    try:
+        import pymupdf
+    except ImportError:  # PyMuPDF < 1.24.3
+        import fitz as pymupdf
+    if hasattr(pymupdf, "set_messages"):
+        pymupdf.set_messages(pylogging_name="mupdf", pylogging_level=logging.WARNING)
+    return pymupdf
+
+
 def read_pdf_bytes(path: Path) -> bytes:
     return path.read_bytes()
 
 
 def count_pages(pdf_bytes: bytes) -> int:
+    from PyPDF2 import PdfReader
+
     return len(PdfReader(io.BytesIO(pdf_bytes)).pages)
 
 
 def extract_selectable_text(pdf_bytes: bytes) -> List[str]:
+    from PyPDF2 import PdfReader
+
     reader = PdfReader(io.BytesIO(pdf_bytes))
     return [p.extract_text() or "" for p in reader.pages]
+
+
+_REF_RE = re.compile(rb"\s*(\d+)\s+(\d+)\s+R")
+# El grupo 2 detecta "/Count 7 0 R": el número sería el del objeto, no el total
+_COUNT_RE = re.compile(rb"/Count\s+(\d+)(\s+\d+\s+R)?")
+
+
+def _last_ref(buf, key: bytes, end: int = -1):
+    """Referencia indirecta `num gen R` tras la última aparición de `key`."""
+    pos = buf.rfind(key) if end < 0 else buf.rfind(key, 0, end)
+    while pos != -1:
+        match = _REF_RE.match(buf, pos + len(key))
+        if match is not None:
+            return match.group(1), match.group(2)
+        pos = buf.rfind(key, 0, pos)
+    return None
+
+
+def _last_object(buf, num: bytes, gen: bytes):
+    """Cuerpo (hasta endobj) de la última definición del objeto `num gen`."""
+    needle = num + b" " + gen + b" obj"
+    pos = buf.rfind(needle)
+    # Descarta coincidencias parciales como "112 0 obj" al buscar "12 0 obj"
+    while pos > 0 and buf[pos - 1 : pos].isdigit():
+        pos = buf.rfind(needle, 0, pos)
+    if pos == -1:
+        return None
+    start = pos + len(needle)
+    end = buf.find(b"endobj", start)
+    return buf[start : end if end != -1 else len(buf)]
+
+
+def quick_page_count(path: Path) -> Optional[int]:
+    """
+    Número de páginas leyendo solo el trailer, el catálogo y el nodo
+    /Pages raíz sobre un mmap, sin construir el documento. Devuelve None
+    si no se puede determinar así (p. ej. objetos dentro de object streams).
+    """
+    with open(path, "rb") as fh:
+        try:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # archivo vacío
+            return None
+        with buf:
+            root = _last_ref(buf, b"/Root")
+            catalog = _last_object(buf, *root) if root else None
+            pages_ref = _last_ref(catalog, b"/Pages") if catalog else None
+            pages = _last_object(buf, *pages_ref) if pages_ref else None
+            count = _COUNT_RE.search(pages) if pages else None
+            if count is None or count.group(2):
+                return None
+            return int(count.group(1))
+
+
+def preflight_page_count(path: Path) -> int:
+    """Páginas vía `quick_page_count`, o abriendo solo la estructura con PyMuPDF."""
+    pages = quick_page_count(path)
+    if pages is None:
+        with load_pymupdf().open(str(path)) as doc:
+            pages = doc.page_count
+    return pages
@@ -0,0 +1,122 @@
+import statistics
+from typing import List, Optional
+
+from PIL import Image, ImageOps
+
+PROBE_DPI = 72
+# Alto de línea (ascendente a descendente) con el que tesseract rinde mejor
+TARGET_LINE_PX = 40
+MAX_PIXELS = 40_000_000
+
+
+def otsu_threshold(gray: Image.Image) -> int:
+    hist = gray.histogram()[:256]
+    total = sum(hist)
+    sum_all = sum(i * h for i, h in enumerate(hist))
+    sum_bg = weight_bg = 0
+    best, threshold = -1.0, 128
+    for i, h in enumerate(hist):
+        weight_bg += h
+        if weight_bg == 0:
+            continue
+        weight_fg = total - weight_bg
+        if weight_fg == 0:
+            break
+        sum_bg += i * h
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_all - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        if between > best:
+            best, threshold = between, i
+    return threshold
+
+
+def binarize(gray: Image.Image) -> Image.Image:
+    """Blanco y negro (modo L, valores 0/255) con umbral de Otsu."""
+    t = otsu_threshold(gray)
+    return gray.point(lambda v: 255 if v > t else 0)
+
+
+def _row_profile(bw: Image.Image) -> List[float]:
+    # Reducir a una columna con filtro BOX promedia cada fila
+    return list(bw.resize((1, bw.height), Image.BOX).getdata())
+
+
+def estimate_line_height(gray: Image.Image) -> Optional[float]:
+    """Mediana del alto (px) de las líneas de texto detectadas, o None."""
+    rows = _row_profile(binarize(gray))
+    runs, current = [], 0
+    for value in rows:
+        if value < 250:  # fila con tinta
+            current += 1
+        elif current:
+            runs.append(current)
+            current = 0
+    runs = [r for r in runs if r >= 2]
+    if len(runs) < 3:
+        return None
+    return statistics.median(runs)
+
+
+def choose_dpi(
+    probe: Image.Image,
+    page_width_pt: float,
+    page_height_pt: float,
+    min_dpi: int = 150,
+    max_dpi: int = 400,
+    default_dpi: int = 300,
+) -> int:
+    """
+    Elige la resolución de OCR a partir de un render de sonda a PROBE_DPI:
+    escala para que las líneas midan ~TARGET_LINE_PX y limita el total de
+    píxeles según el tamaño de la página.
+    """
+    line = estimate_line_height(probe.convert("L"))
+    dpi = default_dpi if line is None else PROBE_DPI * TARGET_LINE_PX / line
+    area_in2 = (page_width_pt / 72) * (page_height_pt / 72)
+    if area_in2 > 0:
+        dpi = min(dpi, (MAX_PIXELS / area_in2) ** 0.5)
+    return int(max(min_dpi, min(max_dpi, dpi)))
+
+
+def _skew_angle(bw: Image.Image, max_angle: float = 5.0, step: float = 0.5) -> float:
+    small = bw.copy()
+    small.thumbnail((600, 600))
+    best_angle, best_score = 0.0, -1.0
+    steps = int(max_angle / step)
+    for k in range(-steps, steps + 1):
+        angle = k * step
+        rotated = small.rotate(angle, resample=Image.NEAREST, fillcolor=255)
+        # Las líneas alineadas dan un perfil de filas con máxima varianza
+        score = statistics.pvariance(_row_profile(rotated))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def deskew(bw: Image.Image) -> Image.Image:
+    angle = _skew_angle(bw)
+    if abs(angle) < 0.25:
+        return bw
+    return bw.rotate(angle, resample=Image.NEAREST, expand=True, fillcolor=255)
+
+
+def crop_margins(bw: Image.Image, padding: int = 10) -> Image.Image:
+    box = ImageOps.invert(bw).getbbox()
+    if box is None:
+        return bw
+    left, top, right, bottom = box
+    return bw.crop(
+        (
+            max(0, left - padding),
+            max(0, top - padding),
+            min(bw.width, right + padding),
+            min(bw.height, bottom + padding),
+        )
+    )
+
+
+def preprocess_for_ocr(image: Image.Image) -> Image.Image:
+    """Escala de grises, binarizado, corrección de inclinación y recorte."""
+    bw = binarize(image.convert("L"))
+    return crop_margins(deskew(bw))
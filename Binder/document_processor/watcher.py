@@ -0,0 +1,118 @@
+# document_processor/watcher.py
+
+import fnmatch
+import logging
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+LOG = logging.getLogger(__name__)
+
+EOF_MARKER = b"%%EOF"
+EOF_TAIL_BYTES = 1024  # el marcador puede ir seguido de espacios o basura
+
+
+@dataclass
+class _Candidate:
+    signature: Tuple[int, int]  # (tamaño, mtime en ns)
+    stable_since: float  # desde cuándo la firma no cambia
+    first_seen: float  # primera vez que se vio el archivo (llegada)
+    warned: bool = False
+
+
+def looks_complete(path: Path) -> bool:
+    """El PDF termina en `%%EOF`: la escritura (o copia) parece completa."""
+    try:
+        with open(path, "rb") as fh:
+            fh.seek(0, os.SEEK_END)
+            size = fh.tell()
+            fh.seek(max(0, size - EOF_TAIL_BYTES))
+            return EOF_MARKER in fh.read()
+    except OSError:
+        return False
+
+
+class DirectoryWatcher:
+    """
+    Vigila un directorio por sondeo (sin dependencias ni inotify, funciona
+    igual en carpetas de red). `scan()` devuelve los PDFs nuevos o
+    modificados que ya se pueden procesar:
+      - antirrebote: tamaño y fecha sin cambios durante `debounce` segundos;
+      - escritura parcial: el archivo debe terminar en `%%EOF`; si sigue
+        sin él tras `incomplete_timeout` segundos estable se entrega igual,
+        para que el error del PDF truncado quede registrado.
+    Los archivos ocultos (`.nombre.pdf`, típicos de subidas en curso) se
+    ignoran. Un archivo ya entregado vuelve a entregarse si cambia.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        pattern: str = "*.pdf",
+        debounce: float = 2.0,
+        incomplete_timeout: float = 300.0,
+    ):
+        self.directory = Path(directory)
+        self.pattern = pattern
+        self.debounce = debounce
+        self.incomplete_timeout = incomplete_timeout
+        self._candidates: Dict[str, _Candidate] = {}
+        self._delivered: Dict[str, Tuple[int, int]] = {}
+
+    @property
+    def pending(self) -> int:
+        """Archivos vistos que aún esperan el antirrebote o su `%%EOF`."""
+        return len(self._candidates)
+
+    def scan(
+        self, now: Optional[float] = None
+    ) -> List[Tuple[Path, float, Tuple[int, int]]]:
+        """
+        (ruta, momento de llegada según `time.monotonic`, firma (tamaño,
+        mtime en ns)) de los archivos listos para procesar.
+        """
+        now = time.monotonic() if now is None else now
+        ready = []
+        present = set()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith(".") or not fnmatch.fnmatch(name, self.pattern):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:  # borrado entre el listado y el stat
+                    continue
+                present.add(name)
+                signature = (st.st_size, st.st_mtime_ns)
+                if self._delivered.get(name) == signature:
+                    continue
+                found = self._candidates.get(name)
+                if found is None or found.signature != signature:
+                    first_seen = found.first_seen if found else now
+                    self._candidates[name] = _Candidate(signature, now, first_seen)
+                    continue
+                stable = now - found.stable_since
+                if stable < self.debounce:
+                    continue
+                path = Path(entry.path)
+                if not st.st_size or not looks_complete(path):
+                    if stable < self.incomplete_timeout:
+                        if not found.warned:
+                            found.warned = True
+                            LOG.info("%s aún sin %%%%EOF; se espera a que termine de escribirse", name)
+                        continue
+                    LOG.warning("%s sigue incompleto tras %ss; se procesa igual", name, int(stable))
+                del self._candidates[name]
+                self._delivered[name] = signature
+                ready.append((path, found.first_seen, signature))
+        # Un archivo borrado que reaparece se trata como nuevo
+        for name in set(self._candidates) - present:
+            del self._candidates[name]
+        for name in set(self._delivered) - present:
+            del self._delivered[name]
+        return sorted(ready)
@@ -1,10 +1,61 @@
+import argparse
+import signal
+import threading
+
 from document_processor.config import Config
 from document_processor.pipeline import DocumentPipeline
 
 def main():
+    parser = argparse.ArgumentParser(description="Clasifica los PDFs de input_dir con un LLM.")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="sigue vigilando input_dir y procesa cada PDF nuevo o modificado",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="servicio HTTP local: POST /classify, GET /health y GET /metrics",
+    )
+    parser.add_argument("--host", help="interfaz del servicio (por defecto la de Config)")
+    parser.add_argument("--port", type=int, help="puerto del servicio (por defecto el de Config)")
+    args = parser.parse_args()
+
     config = Config()
     pipeline = DocumentPipeline(config)
-    pipeline.run()
+    if args.serve:
+        serve(pipeline, config, args.host or config.server_host, args.port or config.server_port)
+    elif args.watch:
+        # SIGTERM (systemd, docker stop) vacía la cola antes de salir
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        pipeline.watch(stop)
+    else:
+        pipeline.run()
+
+
+def serve(pipeline: DocumentPipeline, config: Config, host: str, port: int) -> None:
+    from document_processor.server import ClassificationService, create_server
+
+    service = ClassificationService(
+        pipeline,
+        queue_size=config.server_queue_size,
+        llm_concurrency=config.llm_workers,
+        request_timeout=config.server_request_timeout,
+        upload_dir=config.upload_dir,
+    )
+    service.start()
+    server = create_server(service, host, port)
+    # shutdown() espera a serve_forever(), así que no puede llamarse desde su hilo
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"Escuchando en http://{host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
 
 
 if __name__ == "__main__":
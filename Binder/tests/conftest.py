@@ -0,0 +1,55 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Las pruebas se ejecutan desde Binder/ (`python -m pytest`), como main.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from document_processor.config import Config  # noqa: E402
+from document_processor.utils.pdf import load_pymupdf  # noqa: E402
+
+
+@pytest.fixture
+def make_pdf():
+    """Escribe un PDF con una página de texto por cada elemento de `pages`."""
+
+    def make(path: Path, *pages: str) -> Path:
+        doc = load_pymupdf().open()
+        for text in pages:
+            doc.new_page().insert_text((72, 72), text)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        doc.save(path)
+        doc.close()
+        return path
+
+    return make
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """Configuración aislada en `tmp_path`: sin clave, caché ni stdout, con NDJSON."""
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    config = Config(base_dir=tmp_path)
+    config.instructions = "Clasifica el documento."
+    config.input_dir = tmp_path / "pdfs"
+    config.input_dir.mkdir()
+    config.cache_enabled = False
+    config.print_stdout = False
+    config.output_file = tmp_path / "out.ndjson"
+    config.checkpoint_file = None
+    config.metrics_file = None
+    config.cost_file = None
+    return config
+
+
+@pytest.fixture
+def read_output(config):
+    """Registros escritos en el NDJSON de `config`."""
+
+    def read():
+        with open(config.output_file, encoding="utf-8") as fh:
+            return [json.loads(line) for line in fh]
+
+    return read
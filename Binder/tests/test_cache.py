@@ -0,0 +1,90 @@
+"""`ResultCache` (LRU con tamaño total en `meta`) y aciertos del analizador."""
+
+from document_processor.analyzer import PDFAnalyzer
+from document_processor.cache import ResultCache
+from document_processor.utils.pdf import load_pymupdf
+
+
+def _total(cache: ResultCache) -> int:
+    conn = cache._connection()
+    stored = conn.execute("SELECT value FROM meta WHERE name = 'total_size'").fetchone()[0]
+    assert stored == conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+    return stored
+
+
+def test_put_get_and_prefix_queries(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    cache.put("labels:a", {"tipo_documento": "contrato"})
+    cache.put("labels:b", {"tipo_documento": "poder"})
+    cache.put("text:a", {"text": "hola"})
+    assert cache.get("labels:a") == {"tipo_documento": "contrato"}
+    assert cache.get("labels:c") is None
+    assert dict(cache.items("labels:")) == {
+        "labels:a": {"tipo_documento": "contrato"},
+        "labels:b": {"tipo_documento": "poder"},
+    }
+    assert cache.count("labels:") == 2
+    cache.close()
+
+
+def test_replacing_a_key_keeps_the_running_total(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    cache.put("k", "x" * 100)
+    cache.put("k", "x" * 10)
+    assert _total(cache) == len('"' + "x" * 10 + '"')
+    cache.close()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=350)
+    for key in "abc":
+        cache.put(key, "x" * 98)  # 100 bytes en JSON
+    cache.get("a")  # "b" pasa a ser la menos usada
+    cache.put("d", "x" * 98)
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in "ad")
+    assert _total(cache) == 300
+    cache.close()
+
+
+def test_oversized_values_are_not_stored(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=50)
+    cache.put("k", "x" * 100)
+    assert cache.get("k") is None
+    assert _total(cache) == 0
+    cache.close()
+
+
+def test_total_is_seeded_for_existing_caches(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    cache.put("a", "x" * 10)
+    conn = cache._connection()
+    with conn:
+        conn.execute("DELETE FROM meta")
+    cache.close()
+    reopened = ResultCache(tmp_path, max_bytes=1 << 20)
+    assert _total(reopened) == 12
+    reopened.close()
+
+
+def test_cache_hit_restores_extraction_metadata(tmp_path):
+    pymupdf = load_pymupdf()
+    doc = pymupdf.open()
+    doc.new_page().insert_text((72, 72), "Contrato de arrendamiento entre las partes. " * 3)
+    doc.new_page()
+    path = tmp_path / "doc.pdf"
+    doc.save(path)
+
+    analyzer = PDFAnalyzer(cache_dir=str(tmp_path / "cache"), cache_max_bytes=1 << 20)
+    first = analyzer.analyze(path)
+    second = analyzer.analyze(path)
+    assert not first.text_cached and second.text_cached
+    assert second.text == first.text
+    assert second.page_count == 2
+    assert second.pages_by_engine == first.pages_by_engine == {
+        "pymupdf": 1,
+        "pdfplumber": 0,
+        "ocr": 0,
+    }
+    assert second.page_plan == first.page_plan
+    analyzer.close()
@@ -0,0 +1,50 @@
+"""`Checkpoint`: manifiesto de archivos terminados con su firma (tamaño, mtime)."""
+
+import os
+
+from document_processor.output import Checkpoint
+
+
+def test_marked_files_survive_a_restart(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 uno")
+    signature = Checkpoint.signature(pdf)
+    checkpoint = Checkpoint(tmp_path / "out.checkpoint")
+    checkpoint.mark(pdf, signature)
+    checkpoint.mark(pdf, signature)
+    checkpoint.close()
+
+    reopened = Checkpoint(tmp_path / "out.checkpoint")
+    assert reopened.is_done(pdf, Checkpoint.signature(pdf))
+    reopened.close()
+    assert len((tmp_path / "out.checkpoint").read_text().splitlines()) == 1
+
+
+def test_replaced_file_is_not_done(tmp_path):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 uno")
+    checkpoint = Checkpoint(tmp_path / "out.checkpoint")
+    checkpoint.mark(pdf, Checkpoint.signature(pdf))
+    pdf.write_bytes(b"%PDF-1.4 otro contenido")
+    assert not checkpoint.is_done(pdf, Checkpoint.signature(pdf))
+    checkpoint.close()
+
+
+def test_mark_uses_the_queued_signature(tmp_path):
+    # El archivo se reescribe mientras se procesa: se marca la versión
+    # encolada y la nueva sigue pendiente
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4 uno")
+    queued = Checkpoint.signature(pdf)
+    pdf.write_bytes(b"%PDF-1.4 uno")
+    st = pdf.stat()
+    os.utime(pdf, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    checkpoint = Checkpoint(tmp_path / "out.checkpoint")
+    checkpoint.mark(pdf, queued)
+    assert checkpoint.is_done(pdf, queued)
+    assert not checkpoint.is_done(pdf, Checkpoint.signature(pdf))
+    checkpoint.close()
+
+
+def test_missing_file_has_no_signature(tmp_path):
+    assert Checkpoint.signature(tmp_path / "borrado.pdf") is None
@@ -0,0 +1,80 @@
+"""
+Casi duplicados (`MinHashIndex`) en `DocumentClassifier`, y fallos previos
+al LLM convertidos en errores por documento.
+"""
+
+import sqlite3
+
+from document_processor.analyzer import AnalysisResult
+from document_processor.cache import ResultCache
+from document_processor.classifier import DocumentClassifier
+from document_processor.dedup import MinHashIndex
+from document_processor.llm.fake import FakeLLMClient
+
+TEMPLATE = (
+    "Contrato de arrendamiento de vivienda celebrado el día {day} entre las "
+    "partes firmantes. El arrendador cede el uso del inmueble situado en la "
+    "calle Mayor y el arrendatario se obliga a pagar la renta mensual pactada "
+    "dentro de los cinco primeros días de cada mes, con una fianza de dos "
+    "mensualidades y una duración inicial de un año prorrogable."
+)
+
+
+def _analysis(name: str, text: str) -> AnalysisResult:
+    return AnalysisResult(file=name, text=text, pages=[text], sha256=name * 4)
+
+
+def _classifier(cache, fake, **kwargs) -> DocumentClassifier:
+    return DocumentClassifier(
+        instructions="Clasifica el documento.",
+        api_key=None,
+        model="gpt-4o-mini",
+        client=fake,
+        cache=cache,
+        dedup=True,
+        **kwargs,
+    )
+
+
+def test_signature_similarity():
+    index = MinHashIndex(threshold=0.8)
+    first = index.signature(TEMPLATE.format(day="3 de marzo de 2021"))
+    index.add(first, "a.pdf", {"tipo_documento": "contrato"})
+    # Las fechas y cifras no separan copias de una misma plantilla
+    match = index.query(index.signature(TEMPLATE.format(day="17 de julio de 2023")))
+    assert match is not None and match.file == "a.pdf"
+    assert index.query(index.signature("Sentencia del tribunal supremo " * 10)) is None
+    assert index.signature("") is None
+
+
+def test_near_duplicate_reuses_labels_and_survives_restart(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    fake = FakeLLMClient()
+    classifier = _classifier(cache, fake)
+    first = classifier.classify(_analysis("a.pdf", TEMPLATE.format(day="1")))
+    second = classifier.classify(_analysis("b.pdf", TEMPLATE.format(day="2")))
+    assert first.classified_by == "llm" and fake.calls == 1
+    assert second.classified_by == "duplicate" and second.duplicate_of == "a.pdf"
+    assert second.labels == first.labels
+
+    # Un clasificador nuevo carga las firmas guardadas en la caché
+    restarted = _classifier(cache, fake)
+    third = restarted.classify(_analysis("c.pdf", TEMPLATE.format(day="3")))
+    assert third.duplicate_of == "a.pdf" and fake.calls == 1
+    cache.close()
+
+
+class _BrokenCache(ResultCache):
+    def get(self, key):
+        raise sqlite3.OperationalError("database is locked")
+
+
+def test_failures_before_the_llm_are_per_document_errors(tmp_path):
+    cache = _BrokenCache(tmp_path, max_bytes=1 << 20)
+    classifier = _classifier(cache, FakeLLMClient(), batch_size=4)
+    analyses = [_analysis(f"{i}.pdf", f"Documento {i}") for i in range(3)]
+    assert classifier.classify(analyses[0]).error == "database is locked"
+    for results in (classifier.classify_batch(analyses), classifier.classify_many(analyses)):
+        assert [r.file for r in results] == ["0.pdf", "1.pdf", "2.pdf"]
+        assert all(r.error == "database is locked" for r in results)
+    cache.close()
@@ -0,0 +1,81 @@
+"""`LocalClassifier` y su entrenamiento con la caché en `DocumentClassifier`."""
+
+from document_processor.analyzer import AnalysisResult, PDFAnalyzer
+from document_processor.cache import ResultCache, text_key
+from document_processor.classifier import DocumentClassifier
+from document_processor.fastpath import LocalClassifier
+from document_processor.llm.fake import FakeLLMClient
+
+TEXTS = {
+    "contrato": "Contrato de arrendamiento entre arrendador y arrendatario, renta mensual {i}.",
+    "sentencia": "Sentencia del juzgado: fallo, costas y recurso de apelación número {i}.",
+}
+
+
+def _samples(per_label: int):
+    return [
+        (text.format(i=i), label) for label, text in TEXTS.items() for i in range(per_label)
+    ]
+
+
+def test_local_classifier_needs_examples_and_margin():
+    model = LocalClassifier(min_examples=3).fit(_samples(3))
+    assert model.labels == ["contrato", "sentencia"]
+    tipo, confidence = model.predict(TEXTS["sentencia"].format(i=99))
+    assert tipo == "sentencia" and confidence >= model.min_confidence
+    assert model.predict("Acta de la junta general de accionistas") is None
+    assert not LocalClassifier(min_examples=4).fit(_samples(3)).trained
+
+
+def _classifier(cache, fake, text_version) -> DocumentClassifier:
+    return DocumentClassifier(
+        instructions="Clasifica el documento.",
+        api_key=None,
+        model="gpt-4o-mini",
+        client=fake,
+        cache=cache,
+        fastpath=True,
+        fastpath_min_examples=3,
+        text_version=text_version,
+    )
+
+
+def _seed(cache, classifier, text_version):
+    """Textos y etiquetas en caché como los dejarían el analizador y el LLM."""
+    for n, (text, label) in enumerate(_samples(3)):
+        analysis = AnalysisResult(file=f"{n}.pdf", text=text, sha256=f"{n:064x}")
+        cache.put(text_key(analysis.sha256, text_version), {"text": text})
+        cache.put(classifier._cache_key(analysis), {"tipo_documento": label})
+
+
+def test_trains_on_the_text_version_of_the_analyzer(tmp_path):
+    version = PDFAnalyzer(ocr_blank_pages=True).text_version()
+    assert version.endswith("-ocrblank")
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    fake = FakeLLMClient()
+    classifier = _classifier(cache, fake, version)
+    _seed(cache, classifier, version)
+    new = AnalysisResult(file="nuevo.pdf", text=TEXTS["contrato"].format(i=7), sha256="f" * 64)
+    result = classifier.classify(new)
+    assert result.classified_by == "local" and fake.calls == 0
+    assert result.labels["tipo_documento"] == "contrato"
+
+    # Con otra versión de texto no hay ejemplos: el documento va al LLM
+    other = _classifier(cache, fake, PDFAnalyzer().text_version())
+    assert other.classify(new).classified_by == "llm" and fake.calls == 1
+    cache.close()
+
+
+def test_trained_model_is_reused_from_the_cache(tmp_path, monkeypatch):
+    version = PDFAnalyzer().text_version()
+    cache = ResultCache(tmp_path, max_bytes=1 << 20)
+    _seed(cache, _classifier(cache, FakeLLMClient(), version), version)
+    assert _classifier(cache, FakeLLMClient(), version)._fastpath_model().trained
+
+    def refit(self, samples):
+        raise AssertionError("no debería reentrenarse")
+
+    monkeypatch.setattr(LocalClassifier, "fit", refit)
+    reloaded = _classifier(cache, FakeLLMClient(), version)._fastpath_model()
+    assert reloaded.labels == ["contrato", "sentencia"]
+    cache.close()
@@ -0,0 +1,139 @@
+"""`TokenGovernor`: presupuesto por ejecución, ventana por minuto y AIMD."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from document_processor.llm.errors import BudgetExceededError
+from document_processor.llm.governor import TokenGovernor, TokenLedger
+
+
+def _usage(prompt: int, completion: int):
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "total_tokens": prompt + completion,
+    }
+
+
+def test_run_cap_counts_reserved_and_spent_tokens():
+    governor = TokenGovernor(
+        run_token_cap=100, price_input_per_mtok=1.0, price_output_per_mtok=4.0
+    )
+    ticket = governor.acquire(100)
+    # Lo reservado por una llamada en vuelo ya ocupa el presupuesto
+    with pytest.raises(BudgetExceededError):
+        governor.acquire(1)
+    governor.settle(ticket, _usage(60, 20))
+    governor.settle(governor.acquire(10), _usage(15, 5))
+    with pytest.raises(BudgetExceededError):
+        governor.acquire(1)
+    summary = governor.summary()
+    assert summary["tokens"]["total_tokens"] == 100 and summary["calls"] == 2
+    assert summary["budget_rejections"] == 2
+    assert summary["cost_usd"] == pytest.approx((75 * 1.0 + 25 * 4.0) / 1e6)
+
+
+def test_settle_is_idempotent_and_counts_failures():
+    governor = TokenGovernor()
+    ticket = governor.acquire(10)
+    governor.settle(ticket)
+    governor.settle(ticket)
+    assert governor.in_flight == 0 and governor._reserved == 0
+    assert governor.summary()["failed_calls"] == 1
+
+
+def test_admit_batch_stops_at_the_cap():
+    governor = TokenGovernor(run_token_cap=100)
+    governor.record(_usage(10, 10))
+    assert governor.admit_batch([30, 30, 30, 5]) == 2
+    assert governor.summary()["budget_rejections"] == 2
+    assert TokenGovernor().admit_batch([10**9]) == 1
+
+
+def test_minute_window():
+    ledger = TokenLedger()
+    ledger.add(_usage(40, 10), now=0.0)
+    ledger.add(_usage(30, 0), now=20.0)
+    assert ledger.window_tokens(30.0) == 80
+    # Hace falta que salga la primera llamada (50 tokens) para liberar 40
+    assert ledger.window_wait(40, now=30.0) == pytest.approx(30.0)
+    assert ledger.window_wait(100, now=30.0) is None
+    assert ledger.window_tokens(61.0) == 30
+    assert ledger.peak_tokens_per_minute == 80
+
+    governor = TokenGovernor(minute_token_cap=100)
+    governor.record(_usage(80, 10))
+    assert governor._admit(20) > 0  # esperaría a que se libere la ventana
+    assert governor._admit(10) == 0
+
+
+def test_concurrency_limit_blocks_until_settle():
+    governor = TokenGovernor(max_concurrency=1)
+    first = governor.acquire(1)
+    acquired = threading.Event()
+
+    def second():
+        governor.settle(governor.acquire(1), _usage(1, 1))
+        acquired.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not acquired.wait(0.2)
+    governor.settle(first, _usage(1, 1))
+    assert acquired.wait(5)
+    thread.join()
+    assert governor.summary()["throttled_seconds"] >= 0.1
+
+
+def test_async_acquire_respects_the_limit():
+    governor = TokenGovernor(max_concurrency=2)
+    peak = 0
+
+    async def call():
+        nonlocal peak
+        ticket = await governor.aacquire(1)
+        peak = max(peak, governor.in_flight)
+        await asyncio.sleep(0.01)
+        await governor.asettle(ticket, _usage(1, 0))
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(6)))
+
+    asyncio.run(main())
+    assert peak == 2 and governor.summary()["calls"] == 6
+
+
+def test_aimd_halves_on_429_once_per_episode_and_grows_back():
+    governor = TokenGovernor(max_concurrency=8, adaptive=True)
+    governor.record_rate_limited()
+    governor.record_rate_limited()  # misma señal de las llamadas en vuelo
+    assert governor.limit == 4
+    for _ in range(4):
+        governor.settle(governor.acquire(1), _usage(1, 1))
+    assert governor.limit == 5
+    summary = governor.summary()
+    assert summary["rate_limited"] == 2
+    assert summary["concurrency"] == {"final": 5, "lowest": 4, "max": 8}
+
+
+def test_aimd_backs_off_when_latency_grows():
+    governor = TokenGovernor(max_concurrency=10, adaptive=True, latency_tolerance=2.0)
+
+    def call(latency):
+        ticket = governor.acquire(1)
+        ticket.started = time.monotonic() - latency
+        governor.settle(ticket, _usage(1, 1))
+
+    call(0.3)
+    for _ in range(5):
+        call(3.0)
+    assert governor.limit == 9  # ×0.9, una sola vez en el episodio
+
+
+def test_without_adaptive_the_limit_is_fixed():
+    governor = TokenGovernor(max_concurrency=8)
+    governor.record_rate_limited()
+    assert governor.limit == 8 and governor.summary()["rate_limited"] == 1
@@ -0,0 +1,41 @@
+"""`parse_json_lenient`: respuestas del modelo casi JSON, sin volver a llamarlo."""
+
+import pytest
+
+from document_processor.llm.json_repair import parse_json_lenient
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        '{"tipo_documento": "contrato"}',
+        '```json\n{"tipo_documento": "contrato"}\n```',
+        '```\n{"tipo_documento": "contrato"}\n```',
+        'Aquí tienes la clasificación: {"tipo_documento": "contrato"} Saludos.',
+        '{"tipo_documento": "contrato",}',
+    ],
+)
+def test_recovers_object(raw):
+    assert parse_json_lenient(raw) == {"tipo_documento": "contrato"}
+
+
+def test_trailing_commas_in_nested_values():
+    raw = '{"partes": ["A", "B",], "fechas": {"firma": "2023-01-01",},}'
+    assert parse_json_lenient(raw) == {
+        "partes": ["A", "B"],
+        "fechas": {"firma": "2023-01-01"},
+    }
+
+
+def test_braces_inside_strings():
+    raw = 'Respuesta: {"justificacion": "cláusula {3} y \\"anexo}\\"", "n": 1} fin'
+    assert parse_json_lenient(raw) == {"justificacion": 'cláusula {3} y "anexo}"', "n": 1}
+
+
+def test_skips_unbalanced_prefix():
+    assert parse_json_lenient('{ roto { "a": 1 }') == {"a": 1}
+
+
+@pytest.mark.parametrize("raw", [None, "", "sin json", "[1, 2]", '{"a": '])
+def test_returns_none_without_object(raw):
+    assert parse_json_lenient(raw) is None
@@ -0,0 +1,106 @@
+"""
+Construcción de los clientes reales de OpenAI contra un servidor local que
+imita `/v1/chat/completions`: sin red ni clave válida, pero con el SDK de
+verdad (los benchmarks solo usan `FakeLLMClient`).
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+openai = pytest.importorskip("openai")
+
+from document_processor.llm.async_client import AsyncOpenAIClient  # noqa: E402
+from document_processor.llm.batch import OpenAIBatchBackend  # noqa: E402
+from document_processor.llm.client import OpenAIClient  # noqa: E402
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4.1-nano",
+    "choices": [
+        {
+            "index": 0,
+            "message": {"role": "assistant", "content": '{"tipo_documento": "contrato"}'},
+            "finish_reason": "stop",
+        }
+    ],
+    "usage": {"prompt_tokens": 12, "completion_tokens": 5, "total_tokens": 17},
+}
+
+
+class _CompletionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.dumps(COMPLETION).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _CompletionHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_port}/v1"
+    monkeypatch.setenv("OPENAI_BASE_URL", url)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+def test_openai_client_chat(base_url):
+    client = OpenAIClient(api_key="sk-test", model="gpt-4.1-nano", max_retries=1)
+    assert isinstance(client.client, openai.OpenAI)
+    content, usage = client.chat([{"role": "user", "content": "hola"}])
+    assert json.loads(content) == {"tipo_documento": "contrato"}
+    assert usage == {"prompt_tokens": 12, "completion_tokens": 5, "total_tokens": 17}
+
+
+def test_async_openai_client_chat(base_url):
+    client = AsyncOpenAIClient(api_key="sk-test", model="gpt-4.1-nano", max_retries=1)
+    assert isinstance(client.client, openai.AsyncOpenAI)
+    content, usage = asyncio.run(client.chat([{"role": "user", "content": "hola"}]))
+    assert json.loads(content) == {"tipo_documento": "contrato"}
+    assert usage["total_tokens"] == 17
+
+
+def test_zero_retries_still_makes_one_attempt(base_url):
+    client = OpenAIClient(api_key="sk-test", model="gpt-4.1-nano", max_retries=0)
+    content, _ = client.chat([{"role": "user", "content": "hola"}])
+    assert json.loads(content) == {"tipo_documento": "contrato"}
+    aclient = AsyncOpenAIClient(api_key="sk-test", model="gpt-4.1-nano", max_retries=0)
+    content, _ = asyncio.run(aclient.chat([{"role": "user", "content": "hola"}]))
+    assert json.loads(content) == {"tipo_documento": "contrato"}
+
+
+def test_batch_backend_builds_sdk_client():
+    backend = OpenAIBatchBackend(api_key="sk-test")
+    assert isinstance(backend.client, openai.OpenAI)
+
+
+def test_pipeline_with_stub_client_needs_no_api_key(tmp_path, monkeypatch):
+    from document_processor.config import Config
+    from document_processor.llm.fake import FakeLLMClient
+    from document_processor.pipeline import DocumentPipeline
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    config = Config(base_dir=tmp_path)
+    config.instructions = "Clasifica el documento."
+    pipeline = DocumentPipeline(config, client=FakeLLMClient())
+    assert pipeline.classifier.client.__class__ is FakeLLMClient
+    with pytest.raises(RuntimeError, match="OPENAI_API_KEY"):
+        DocumentPipeline(config)
@@ -0,0 +1,58 @@
+"""`Histogram` con reservorio acotado y agregados de `RunMetrics`."""
+
+from document_processor.metrics import Histogram, RunMetrics
+
+
+def _record(cache_hit: bool, pages=None, code=None):
+    return {
+        "metadata": {
+            "processing_time_ms": 120.0,
+            "timings_ms": {"pymupdf": 20.0, "llm": 90.0},
+            "pages_by_engine": pages or {"pymupdf": 2, "pdfplumber": 0, "ocr": 1},
+            "cache": {"text": "hit" if cache_hit else "miss"},
+            "classified_by": "llm",
+        },
+        "classification": {
+            "status": {"state": "error" if code else "ok", "error_code": code},
+            "tokens_usage": {"total_tokens": 10},
+        },
+    }
+
+
+def test_histogram_memory_is_bounded():
+    hist = Histogram(reservoir=100)
+    for i in range(10_000):
+        hist.observe(i / 10_000)
+    assert hist.count == 10_000 and len(hist.sample) == 100
+    assert sum(hist.counts) == 10_000
+    assert abs(hist.total - sum(i / 10_000 for i in range(10_000))) < 1e-6
+    assert hist.maximum == 0.9999
+    assert 0.3 < hist.quantile(0.5) < 0.7
+
+
+def test_histogram_is_exact_below_the_reservoir():
+    hist = Histogram()
+    for value in (1, 2, 3, 4):
+        hist.observe(value)
+    assert hist.summary() == {"count": 4, "sum": 10, "p50": 3, "p95": 4, "max": 4}
+
+
+def test_cached_text_does_not_count_engine_pages():
+    metrics = RunMetrics()
+    metrics.observe(_record(cache_hit=False))
+    metrics.observe(_record(cache_hit=True))
+    metrics.observe(_record(cache_hit=False, code="TIMEOUT"))
+    data = metrics.to_dict()
+    assert data["pages_by_engine"] == {"pymupdf": 4, "pdfplumber": 0, "ocr": 2}
+    assert data["documents"] == {"ok": 2, "error": 1}
+    assert data["errors"] == {"TIMEOUT": 1}
+    assert data["stages_seconds"]["total"]["count"] == 3
+
+
+def test_prometheus_histogram_lines():
+    metrics = RunMetrics()
+    metrics.observe(_record(cache_hit=False))
+    text = metrics.to_prometheus()
+    assert 'binder_pages_total{engine="ocr"} 1' in text
+    assert 'binder_stage_duration_seconds_bucket{stage="llm",le="+Inf"} 1' in text
+    assert 'binder_stage_duration_seconds_count{stage="llm"} 1' in text
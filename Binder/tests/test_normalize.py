@@ -0,0 +1,45 @@
+"""`TextNormalizer`: membretes y pies repetidos, numeración y ruido de OCR."""
+
+from document_processor.normalize import TextNormalizer
+
+
+def _normalize(pages):
+    return TextNormalizer().normalize(pages)
+
+
+def test_page_numbers_only_on_first_and_last_line():
+    result = _normalize(
+        [
+            "1\nCLÁUSULA PRIMERA\nEl plazo vence en\n2023\nsegún lo pactado.\nPágina 1 de 2",
+            "- 2 -\nCLÁUSULA SEGUNDA\nImporte total:\n1500\nPág. 2 de 2",
+        ]
+    )
+    assert result.pages[0] == "CLÁUSULA PRIMERA\nEl plazo vence en\n2023\nsegún lo pactado."
+    assert result.pages[1] == "CLÁUSULA SEGUNDA\nImporte total:\n1500"
+    assert result.removed["page_numbers"] == 4
+
+
+def test_repeated_header_and_footer_kept_once():
+    pages = [
+        f"NOTARÍA PÉREZ\nCláusula {i}: cuerpo propio.\nContrato 12/2023 - Hoja {i}"
+        for i in range(1, 4)
+    ]
+    result = _normalize(pages)
+    assert result.pages[0].startswith("NOTARÍA PÉREZ")
+    assert result.pages[0].endswith("Contrato 12/2023 - Hoja 1")
+    assert result.pages[2] == "Cláusula 3: cuerpo propio."
+    assert result.removed["repeated"] == 4
+
+
+def test_ocr_noise_and_blank_lines():
+    result = _normalize(["Primera   línea\n\n\n~ ~ .\n|\nSegunda línea"])
+    assert result.pages == ["Primera línea\n\nSegunda línea"]
+    assert result.removed["noise"] == 2
+
+
+def test_report_counts_before_and_after():
+    result = _normalize(["1\nTexto del documento\n", ""])
+    report = result.report()
+    assert report["chars_before"] > report["chars_after"] == len("Texto del documento")
+    assert report["tokens_before"] >= report["tokens_after"] > 0
+    assert result.pages == ["Texto del documento", ""]
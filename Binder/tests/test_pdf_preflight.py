@@ -0,0 +1,85 @@
+"""
+`quick_page_count` sobre PDFs escritos a mano: lee el /Count del nodo
+/Pages raíz sin abrir el documento y devuelve None cuando no puede.
+"""
+
+from document_processor.utils.pdf import quick_page_count
+
+
+def _objects(objects, start=1):
+    return b"".join(
+        b"%d 0 obj\n%s\nendobj\n" % (num, body)
+        for num, body in enumerate(objects, start=start)
+    )
+
+
+def _pdf(count: int) -> bytes:
+    kids = b" ".join(b"%d 0 R" % (3 + i) for i in range(count))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, count),
+    ] + [b"<< /Type /Page /Parent 2 0 R >>"] * count
+    return (
+        b"%PDF-1.4\n"
+        + _objects(objects)
+        + b"trailer\n<< /Size %d /Root 1 0 R >>\n%%%%EOF\n" % (len(objects) + 1)
+    )
+
+
+def test_reads_count_from_root_pages(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(_pdf(3))
+    assert quick_page_count(path) == 3
+
+
+def test_incremental_update_uses_last_definition(tmp_path):
+    path = tmp_path / "doc.pdf"
+    update = (
+        b"2 0 obj\n<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 >>\nendobj\n"
+        b"trailer\n<< /Size 5 /Root 1 0 R /Prev 9 >>\n%%EOF\n"
+    )
+    path.write_bytes(_pdf(1) + update)
+    assert quick_page_count(path) == 2
+
+
+def test_ignores_objects_with_a_longer_number(tmp_path):
+    # "12 0 obj" también aparece dentro de "112 0 obj"
+    catalog = b"1 0 obj\n<< /Type /Catalog /Pages 12 0 R >>\nendobj\n"
+    pages = b"12 0 obj\n<< /Type /Pages /Count 4 >>\nendobj\n"
+    other = b"112 0 obj\n<< /Type /Pages /Count 9 >>\nendobj\n"
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(
+        b"%PDF-1.4\n" + catalog + pages + other + b"trailer\n<< /Root 1 0 R >>\n"
+    )
+    assert quick_page_count(path) == 4
+
+
+def test_unknown_when_pages_is_in_an_object_stream(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(
+        b"%PDF-1.5\n"
+        b"1 0 obj\n<< /Type /Catalog /Pages 5 0 R >>\nendobj\n"
+        b"trailer\n<< /Root 1 0 R >>\n%%EOF\n"
+    )
+    assert quick_page_count(path) is None
+
+
+def test_unknown_when_count_is_an_indirect_reference(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(
+        b"%PDF-1.4\n"
+        b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n"
+        b"2 0 obj\n<< /Type /Pages /Kids [4 0 R] /Count 7 0 R >>\nendobj\n"
+        b"7 0 obj\n1\nendobj\n"
+        b"trailer\n<< /Root 1 0 R >>\n%%EOF\n"
+    )
+    assert quick_page_count(path) is None
+
+
+def test_empty_or_garbage_file(tmp_path):
+    empty = tmp_path / "empty.pdf"
+    empty.write_bytes(b"")
+    garbage = tmp_path / "garbage.pdf"
+    garbage.write_bytes(b"no es un pdf")
+    assert quick_page_count(empty) is None
+    assert quick_page_count(garbage) is None
@@ -0,0 +1,147 @@
+"""
+Modo multiproceso de `DocumentPipeline.run` con `FakeLLMClient`: orden de
+salida, plazo por archivo, procesos que mueren y PIDs del pool.
+"""
+
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from document_processor import pipeline as pipeline_module
+from document_processor.llm.batch import LocalBatchBackend
+from document_processor.llm.fake import FakeLLMClient
+from document_processor.pipeline import DocumentPipeline, AnalysisPool
+
+needs_fork = pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="los procesos del pool deben heredar el análisis sustituido",
+)
+
+_real_analyze = pipeline_module.analyze_in_worker
+
+
+def _misbehaving_analyze(path: Path):
+    # Se ejecuta en el proceso del pool
+    if path.name.startswith("crash"):
+        os._exit(1)
+    if path.name.startswith("slow"):
+        time.sleep(30)
+    return _real_analyze(path)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            return "\nState:\tZ" not in fh.read()
+    except FileNotFoundError:
+        return False
+
+
+def _documents(config, make_pdf, names):
+    for i, name in enumerate(names):
+        make_pdf(config.input_dir / name, f"Contrato número {i} entre las partes firmantes.")
+
+
+def test_parallel_run_keeps_order(config, make_pdf, read_output):
+    names = [f"{i:02d}.pdf" for i in range(8)]
+    _documents(config, make_pdf, names)
+    config.workers = 2
+    fake = FakeLLMClient()
+    DocumentPipeline(config, client=fake).run()
+    records = read_output()
+    assert [r["metadata"]["count"] for r in records] == list(range(1, 9))
+    assert [r["metadata"]["file"] for r in records] == names
+    assert all(r["classification"]["status"]["state"] == "ok" for r in records)
+    assert fake.calls == 8
+
+
+@needs_fork
+def test_worker_crash_is_reported_and_the_pool_rebuilt(
+    config, make_pdf, read_output, monkeypatch
+):
+    names = ["a.pdf", "b.pdf", "crash.pdf", "d.pdf", "e.pdf", "f.pdf"]
+    _documents(config, make_pdf, names)
+    config.workers = 2
+    monkeypatch.setattr(pipeline_module, "analyze_in_worker", _misbehaving_analyze)
+    DocumentPipeline(config, client=FakeLLMClient()).run()
+    records = {r["metadata"]["file"]: r for r in read_output()}
+    assert sorted(records) == names
+    crashed = records["crash.pdf"]["classification"]["status"]
+    assert crashed["error_code"] == "WORKER_CRASHED"
+    # Lo enviado después de recrear el pool se analiza con normalidad
+    assert records["f.pdf"]["classification"]["status"]["state"] == "ok"
+
+
+@needs_fork
+def test_file_timeout_is_reported_as_timeout(config, make_pdf, read_output, monkeypatch):
+    _documents(config, make_pdf, ["a.pdf", "slow.pdf", "c.pdf"])
+    config.workers = 2
+    config.file_timeout = 0.5
+    monkeypatch.setattr(pipeline_module, "analyze_in_worker", _misbehaving_analyze)
+    start = time.monotonic()
+    DocumentPipeline(config, client=FakeLLMClient()).run()
+    assert time.monotonic() - start < 20
+    statuses = {r["metadata"]["file"]: r["classification"]["status"] for r in read_output()}
+    assert statuses["slow.pdf"]["error_code"] == "TIMEOUT"
+    assert statuses["a.pdf"]["state"] == statuses["c.pdf"]["state"] == "ok"
+
+
+def test_error_code_does_not_guess_timeouts_from_words(config):
+    pipeline = DocumentPipeline(config, client=FakeLLMClient())
+    assert pipeline._error_code("Error leyendo la cláusula de tiempo compartido") == (
+        "UNKNOWN_ERROR"
+    )
+
+
+def test_terminate_kills_busy_workers():
+    pool = AnalysisPool(2, {})
+    futures = [pool.submit(time.sleep, 30) for _ in range(2)]
+    deadline = time.monotonic() + 10
+    while len(pool._pids) < 2 and time.monotonic() < deadline:
+        while not pool._announced.empty():
+            pool._pids.add(pool._announced.get())
+        time.sleep(0.05)
+    pids = set(pool._pids)
+    assert len(pids) == 2
+    pool.terminate()
+    while any(_alive(pid) for pid in pids) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(_alive(pid) for pid in pids)
+    assert all(fut.done() for fut in futures)
+
+
+class _PendingBatch(LocalBatchBackend):
+    """Lote que sigue en curso hasta marcarlo como listo."""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.ready = False
+
+    def status(self, job_id):
+        return super().status(job_id) if self.ready else "in_progress"
+
+
+def test_offline_resume_without_cache(config, make_pdf, read_output):
+    names = ["a.pdf", "b.pdf", "c.pdf"]
+    _documents(config, make_pdf, names)
+    config.llm_offline_batch = True
+    config.batch_poll_seconds = 0.01
+    config.batch_timeout = 0.05
+    backend = _PendingBatch(FakeLLMClient())
+    DocumentPipeline(config, client=FakeLLMClient(), batch_backend=backend).run()
+    assert {r["classification"]["status"]["error_code"] for r in read_output()} == {
+        "LLM_UNAVAILABLE"
+    }
+
+    # Tras el reinicio se retoma el trabajo enviado; solo se reenvía el PDF que cambió
+    make_pdf(config.input_dir / "c.pdf", "Otro contenido distinto.")
+    backend.ready = True
+    DocumentPipeline(config, client=FakeLLMClient(), batch_backend=backend).run()
+    records = read_output()[len(names) :]
+    assert [r["metadata"]["file"] for r in records] == names
+    assert all(r["classification"]["status"]["state"] == "ok" for r in records)
+    assert backend.client.calls == len(names) + 1
+    assert list(config.batch_dir.glob("*")) == []
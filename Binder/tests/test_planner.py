@@ -0,0 +1,107 @@
+"""`PagePlanner` y la fase de pdfplumber de `TextExtractor`."""
+
+import pytest
+
+from document_processor.document import PDFDocument
+from document_processor.extractor import TextExtractor
+from document_processor.planner import PagePlanner
+from document_processor.utils.pdf import load_pymupdf
+
+
+def _inline_image_pdf() -> bytes:
+    """Una página escaneada como imagen en línea (BI … ID … EI), sin XObject."""
+    pixels = bytes([0x00, 0xFF] * 32)
+    content = b"q 612 0 0 792 0 0 cm\nBI /W 8 /H 8 /CS /G /BPC 8 ID " + pixels + b"\nEI Q\n"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    return out
+
+
+def _document(tmp_path, build) -> PDFDocument:
+    pymupdf = load_pymupdf()
+    doc = pymupdf.open()
+    build(pymupdf, doc)
+    path = tmp_path / "doc.pdf"
+    doc.save(path)
+    return PDFDocument(path)
+
+
+def _lines(pymupdf, page, count):
+    for i in range(count):
+        y = 50 + i * 10
+        page.draw_line(pymupdf.Point(50, y), pymupdf.Point(500, y))
+
+
+@pytest.fixture
+def planner():
+    return PagePlanner(min_chars=30)
+
+
+def test_inline_image_page_goes_to_ocr(tmp_path, planner):
+    path = tmp_path / "scan.pdf"
+    path.write_bytes(_inline_image_pdf())
+    with PDFDocument(path) as doc:
+        assert doc.page_has_images(0) and doc.has_images
+        assert doc.page_image_coverage(0) == 1.0
+        plan = planner.plan(doc, 0)
+    assert (plan.engine, plan.reason) == ("ocr", "scanned")
+
+
+def test_text_blank_and_vector_pages(tmp_path, planner):
+    def build(pymupdf, doc):
+        doc.new_page().insert_text((72, 72), "Contrato de arrendamiento de vivienda. " * 3)
+        doc.new_page()
+        _lines(pymupdf, doc.new_page(), 30)
+        _lines(pymupdf, doc.new_page(), 3)
+        doc.new_page().insert_text((72, 72), "Hoja 2")
+
+    with _document(tmp_path, build) as doc:
+        plans = [planner.plan(doc, i) for i in range(doc.page_count)]
+        assert not doc.has_images
+    assert [(p.engine, p.reason) for p in plans] == [
+        ("pymupdf", "text_layer"),
+        ("", "blank"),
+        ("ocr", "no_text_layer"),  # texto convertido a curvas
+        ("", "blank"),  # unos pocos trazos: una línea o una firma
+        ("pdfplumber", "thin_text"),
+    ]
+
+
+def test_ocr_blank_sends_blank_pages_to_ocr(tmp_path):
+    with _document(tmp_path, lambda pymupdf, doc: doc.new_page()) as doc:
+        plan = PagePlanner(ocr_blank=True).plan(doc, 0)
+    assert (plan.engine, plan.reason) == ("ocr", "blank")
+
+
+def test_pdfplumber_failure_only_affects_its_page(tmp_path, monkeypatch):
+    def build(pymupdf, doc):
+        for i in range(3):
+            doc.new_page().insert_text((72, 72), f"Hoja {i + 1}")
+
+    def broken(*args, **kwargs):
+        raise ValueError("objeto dañado")
+
+    with _document(tmp_path, build) as doc:
+        monkeypatch.setattr(doc.plumber.pages[0], "extract_text", broken)
+        extractor = TextExtractor(ocr_workers=3)
+        extracted = list(extractor.iter_pages(doc))
+        extractor.close()
+    assert [p.engine for p in extracted[1:]] == ["pdfplumber", "pdfplumber"]
+    assert [p.text.strip() for p in extracted[1:]] == ["Hoja 2", "Hoja 3"]
+    assert extracted[0].engine != "pdfplumber"
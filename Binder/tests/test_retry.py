@@ -0,0 +1,132 @@
+"""`CircuitBreaker` y `next_delay`: reintentos y corte ante fallos del LLM."""
+
+import time
+
+import pytest
+
+openai = pytest.importorskip("openai")
+
+try:  # el SDK de OpenAI 3.x usa httpx2
+    import httpx2 as httpx
+except ImportError:  # pragma: no cover - depende de la versión del SDK
+    import httpx
+
+from document_processor.llm.errors import (  # noqa: E402
+    CircuitOpenError,
+    LLMAuthError,
+    LLMRequestError,
+    ServiceUnavailableError,
+)
+from document_processor.llm.governor import TokenGovernor  # noqa: E402
+from document_processor.llm.retry import CircuitBreaker, next_delay  # noqa: E402
+
+REQUEST = httpx.Request("POST", "http://127.0.0.1/v1/chat/completions")
+
+
+def _status_error(status: int, headers=None) -> "openai.APIStatusError":
+    response = httpx.Response(status, headers=headers or {}, request=REQUEST)
+    classes = {
+        400: openai.BadRequestError,
+        401: openai.AuthenticationError,
+        429: openai.RateLimitError,
+        503: openai.InternalServerError,
+    }
+    return classes[status]("error", response=response, body=None)
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.is_open and breaker.opened == 1
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_lets_one_probe_through_and_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()  # la llamada de prueba
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()  # las demás esperan a que termine
+    breaker.record_success()
+    assert not breaker.is_open and breaker.failures == 0
+    breaker.before_call()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.05)
+    for _ in range(3):
+        breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.is_open and breaker.opened == 2
+
+
+def test_retry_after_extends_the_open_period():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure(retry_after_s=30)
+    time.sleep(0.02)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_unknown_breaker_mode():
+    with pytest.raises(ValueError):
+        CircuitBreaker(mode="ignore")
+
+
+def test_next_delay_honours_retry_after_and_reports_429():
+    breaker = CircuitBreaker(failure_threshold=5)
+    governor = TokenGovernor()
+    exc = _status_error(429, {"retry-after": "3"})
+    assert next_delay(exc, 0, 3, 1.0, breaker=breaker, governor=governor) == 3.0
+    assert breaker.failures == 1
+    assert governor.ledger.rate_limited == 1
+
+
+@pytest.mark.parametrize("header", ["pronto", "Mon, 99 Foo 2024 25:61:00 GMT", ""])
+def test_malformed_retry_after_falls_back_to_backoff(header):
+    exc = _status_error(429, {"retry-after": header})
+    assert 0 <= next_delay(exc, 0, 3, 0.5) <= 0.5
+
+
+def test_next_delay_backoff_is_bounded():
+    exc = openai.APIConnectionError(request=REQUEST)
+    for attempt in range(3):
+        assert 0 <= next_delay(exc, attempt, 5, 0.5) <= 0.5 * 2**attempt
+
+
+def test_next_delay_gives_up_after_last_attempt():
+    breaker = CircuitBreaker(failure_threshold=5)
+    with pytest.raises(ServiceUnavailableError):
+        next_delay(_status_error(503), 2, 3, 0.01, breaker=breaker)
+    assert breaker.failures == 1
+
+
+def test_next_delay_does_not_retry_client_errors():
+    breaker = CircuitBreaker(failure_threshold=5)
+    breaker.record_failure()
+    with pytest.raises(LLMRequestError) as info:
+        next_delay(_status_error(400), 0, 3, 0.01, breaker=breaker)
+    assert not isinstance(info.value, LLMAuthError)
+    # El servicio respondió: no cuenta como fallo transitorio
+    assert breaker.failures == 0
+    with pytest.raises(LLMAuthError):
+        next_delay(_status_error(401), 0, 3, 0.01, breaker=breaker)
+
+
+def test_local_errors_are_reraised_unchanged():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()  # la llamada de prueba falla antes de salir
+    error = TypeError("argumento inesperado")
+    with pytest.raises(TypeError) as info:
+        next_delay(error, 0, 3, 0.01, breaker=breaker)
+    assert info.value is error
+    assert breaker.failures == 1
+    breaker.before_call()  # otra llamada puede hacer de prueba
@@ -0,0 +1,130 @@
+"""`ClassificationService` y su API HTTP con `FakeLLMClient`."""
+
+import http.client
+import json
+import threading
+
+import pytest
+
+from document_processor.llm.fake import FakeLLMClient
+from document_processor.pipeline import DocumentPipeline
+from document_processor.server import ClassificationService, ServiceOverloaded, create_server
+
+
+def _request(server, method, path, body=b"", headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=30)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        data = response.read()
+        return response.status, dict(response.getheaders()), data
+    finally:
+        conn.close()
+
+
+def _serve(service):
+    server = create_server(service, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def service(config, tmp_path):
+    config.max_file_bytes = 4096
+    service = ClassificationService(
+        DocumentPipeline(config, client=FakeLLMClient()),
+        queue_size=4,
+        upload_dir=tmp_path / "uploads",
+    )
+    service.start()
+    server = _serve(service)
+    yield service, server
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def _pdf_bytes(make_pdf, tmp_path, text="Contrato de compraventa entre las partes."):
+    return make_pdf(tmp_path / "src" / "doc.pdf", text).read_bytes()
+
+
+def test_upload_is_classified_and_removed(service, make_pdf, tmp_path):
+    service, server = service
+    body = _pdf_bytes(make_pdf, tmp_path)
+    status, _, data = _request(
+        server, "POST", "/classify?filename=escritura.pdf", body,
+        {"Content-Type": "application/pdf"},
+    )
+    record = json.loads(data)
+    assert status == 200
+    assert record["metadata"]["file"] == "escritura.pdf"
+    assert record["classification"]["status"]["state"] == "ok"
+    assert list(service.upload_dir.iterdir()) == []
+
+
+def test_path_inside_input_dir(service, make_pdf, config):
+    service, server = service
+    make_pdf(config.input_dir / "a.pdf", "Demanda de juicio ordinario.")
+    headers = {"Content-Type": "application/json"}
+    status, _, data = _request(server, "POST", "/classify", b'{"path": "a.pdf"}', headers)
+    assert status == 200 and json.loads(data)["metadata"]["file"] == "a.pdf"
+    status, _, _ = _request(server, "POST", "/classify", b'{"path": "../out.ndjson"}', headers)
+    assert status == 403
+    status, _, _ = _request(server, "POST", "/classify", b'{"path": "b.pdf"}', headers)
+    assert status == 400
+
+
+@pytest.mark.parametrize("name", ["..", ".", "/", "a/.."])
+def test_upload_names_that_are_not_files_are_rejected(service, name, make_pdf, tmp_path):
+    service, server = service
+    body = _pdf_bytes(make_pdf, tmp_path)
+    status, _, data = _request(
+        server, "POST", "/classify", body, {"X-Filename": name, "Content-Type": "application/pdf"}
+    )
+    assert status == 400 and "Nombre de archivo" in json.loads(data)["error"]
+    assert list(service.upload_dir.glob("*")) == []
+
+
+def test_upload_limits(service, tmp_path):
+    _, server = service
+    status, _, _ = _request(server, "POST", "/classify", b"x" * 5000)
+    assert status == 413
+    status, _, _ = _request(server, "POST", "/classify", b"")
+    assert status == 400
+    # http.client siempre envía Content-Length, así que se omite a mano
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=30)
+    conn.putrequest("POST", "/classify")
+    conn.endheaders()
+    assert conn.getresponse().status == 411
+    conn.close()
+
+
+def test_upload_dir_failure_is_a_server_error(service, make_pdf, tmp_path):
+    service, server = service
+    service.upload_dir.parent.mkdir(parents=True, exist_ok=True)
+    service.upload_dir.write_text("no es un directorio")
+    status, _, data = _request(server, "POST", "/classify", _pdf_bytes(make_pdf, tmp_path))
+    assert status == 500 and "No se pudo guardar" in json.loads(data)["error"]
+
+
+def test_full_queue_is_rejected_with_429(config, tmp_path):
+    # Sin `start()` no hay hilos que vacíen la cola
+    service = ClassificationService(
+        DocumentPipeline(config, client=FakeLLMClient()),
+        queue_size=2,
+        upload_dir=tmp_path / "uploads",
+    )
+    for _ in range(2):
+        service.submit(tmp_path / "x.pdf")
+    with pytest.raises(ServiceOverloaded):
+        service.submit(tmp_path / "x.pdf")
+    server = _serve(service)
+    try:
+        status, headers, _ = _request(server, "POST", "/classify", b"%PDF-1.4")
+        health = json.loads(_request(server, "GET", "/health")[2])
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert status == 429 and headers["Retry-After"] == "1"
+    assert health["queue"] == {"waiting": 2, "capacity": 2}
+    assert health["rejected"] == 2
@@ -0,0 +1,101 @@
+"""`DirectoryWatcher` (antirrebote y escrituras parciales) y `DocumentPipeline.watch`."""
+
+import os
+import threading
+import time
+
+from document_processor.llm.fake import FakeLLMClient
+from document_processor.pipeline import DocumentPipeline
+from document_processor.watcher import DirectoryWatcher
+
+PDF = b"%PDF-1.4\n...\n%%EOF\n"
+
+
+def _write(path, data=PDF, mtime_ns=None):
+    path.write_bytes(data)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def _names(ready):
+    return [path.name for path, _, _ in ready]
+
+
+def test_delivers_once_the_file_is_stable(tmp_path):
+    watcher = DirectoryWatcher(tmp_path, debounce=2)
+    _write(tmp_path / "a.pdf")
+    assert watcher.scan(now=0) == [] and watcher.pending == 1
+    assert watcher.scan(now=1) == []
+    ready = watcher.scan(now=2)
+    assert _names(ready) == ["a.pdf"]
+    path, arrived, signature = ready[0]
+    assert arrived == 0 and signature[0] == len(PDF)
+    assert watcher.scan(now=10) == [] and watcher.pending == 0
+
+
+def test_changes_restart_the_debounce_and_are_delivered_again(tmp_path):
+    watcher = DirectoryWatcher(tmp_path, debounce=2)
+    path = _write(tmp_path / "a.pdf", mtime_ns=1_000_000_000)
+    watcher.scan(now=0)
+    assert _names(watcher.scan(now=2)) == ["a.pdf"]
+    _write(path, PDF + b"% anexo\n%%EOF\n", mtime_ns=2_000_000_000)
+    assert watcher.scan(now=3) == []
+    assert watcher.scan(now=4) == []
+    ready = watcher.scan(now=5)
+    assert _names(ready) == ["a.pdf"] and ready[0][1] == 3
+
+
+def test_waits_for_eof_until_the_timeout(tmp_path):
+    watcher = DirectoryWatcher(tmp_path, debounce=1, incomplete_timeout=10)
+    _write(tmp_path / "a.pdf", b"%PDF-1.4\n(copia a medias")
+    watcher.scan(now=0)
+    assert watcher.scan(now=5) == [] and watcher.pending == 1
+    # Sin `%%EOF` se entrega igual tras el plazo, para registrar el error
+    assert _names(watcher.scan(now=10)) == ["a.pdf"]
+
+
+def test_ignores_hidden_and_other_files(tmp_path):
+    watcher = DirectoryWatcher(tmp_path, debounce=0)
+    for name in (".subiendo.pdf", "notas.txt", "b.pdf"):
+        _write(tmp_path / name)
+    (tmp_path / "carpeta.pdf").mkdir()
+    watcher.scan(now=0)
+    assert _names(watcher.scan(now=0)) == ["b.pdf"]
+
+
+def test_deleted_file_that_reappears_is_new(tmp_path):
+    watcher = DirectoryWatcher(tmp_path, debounce=0)
+    path = _write(tmp_path / "a.pdf", mtime_ns=1_000_000_000)
+    watcher.scan(now=0)
+    assert _names(watcher.scan(now=1)) == ["a.pdf"]
+    path.unlink()
+    assert watcher.scan(now=2) == []
+    _write(path, mtime_ns=1_000_000_000)  # misma firma que antes
+    watcher.scan(now=3)
+    assert _names(watcher.scan(now=3)) == ["a.pdf"]
+
+
+def test_pipeline_watch_processes_new_files(config, make_pdf, read_output):
+    config.workers = 2
+    config.watch_poll_seconds = 0.05
+    config.watch_debounce = 0.1
+    pipeline = DocumentPipeline(config, client=FakeLLMClient())
+    stop = threading.Event()
+    thread = threading.Thread(target=pipeline.watch, args=(stop,))
+    thread.start()
+    try:
+        make_pdf(config.input_dir / "a.pdf", "Contrato de servicios profesionales.")
+        make_pdf(config.input_dir / "b.pdf", "Escritura de constitución de sociedad.")
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if config.output_file.exists() and len(read_output()) == 2:
+                break
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        thread.join(timeout=30)
+    assert not thread.is_alive()
+    records = read_output()
+    assert sorted(r["metadata"]["file"] for r in records) == ["a.pdf", "b.pdf"]
+    assert all(r["classification"]["status"]["state"] == "ok" for r in records)